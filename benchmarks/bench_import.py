@@ -0,0 +1,80 @@
+"""Import-time benchmark for the compute modules of vesselberthing.
+
+Each module is imported in a fresh interpreter several times and the median
+wall time is reported. The run fails (exit code 1) if a compute module
+pulls in the plotting stack, or if its median import time exceeds the
+limit given with --max-ms.
+
+    python benchmarks/bench_import.py --max-ms 300
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Compute-only entry points that must import without matplotlib/scipy
+modules = ['vesselberthing.berthing_energy',
+           'vesselberthing.berthing_batch',
+           'vesselberthing.functions.fndr_curves']
+
+# Modules that must not be loaded by a compute-only import
+forbidden = ['matplotlib', 'scipy']
+
+probe = '''
+import sys, time, json
+sys.path.insert(0, {src!r})
+t = time.perf_counter()
+import {module}
+t = time.perf_counter() - t
+print(json.dumps({{"seconds": t,
+                  "loaded": [m for m in {forbidden!r} if m in sys.modules]}}))
+'''
+
+def time_import(module, repeat=5):
+    # Median import time (s) of a module in fresh interpreters, and any
+    # forbidden modules it loaded
+    times = []
+    loaded = set()
+    for i in range(repeat):
+        code = probe.format(src=os.path.abspath(SRC), module=module,
+                            forbidden=forbidden)
+        out = subprocess.run([sys.executable, '-c', code], check=True,
+                             capture_output=True, text=True).stdout
+        res = json.loads(out.strip().splitlines()[-1])
+        times.append(res['seconds'])
+        loaded.update(res['loaded'])
+    return statistics.median(times), sorted(loaded)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='fail if any median import time exceeds this')
+    parser.add_argument('--json', default=None, help='write results to file')
+    args = parser.parse_args(argv)
+
+    failed = False
+    report = {}
+    for module in modules:
+        seconds, loaded = time_import(module, args.repeat)
+        report[module] = {'median_ms': seconds * 1000, 'loaded': loaded}
+        status = 'ok'
+        if loaded:
+            status = 'FAIL: imports ' + ', '.join(loaded)
+            failed = True
+        elif args.max_ms is not None and seconds * 1000 > args.max_ms:
+            status = 'FAIL: slower than {0:.0f} ms'.format(args.max_ms)
+            failed = True
+        print('{0:45s} {1:8.1f} ms  {2}'.format(module, seconds * 1000, status))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
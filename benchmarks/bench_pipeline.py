@@ -0,0 +1,181 @@
+"""Throughput and memory benchmark of the berthing pipeline.
+
+Synthetic portfolios (see synthetic.py) are run at several scales and the
+following are timed: fender_reaction per fender type (scalar calls and the
+array form), the berth_coeff helpers, berthing_energy (loop and batch),
+print_fndr_csv and the chart functions. Each result records the best wall
+time of --repeat runs, the throughput (items/s) and the peak traced memory.
+
+    python benchmarks/bench_pipeline.py --compare benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --save my_baseline.json
+
+With --compare the run fails (exit code 1) if any throughput falls below,
+or any peak memory rises above, the baseline by more than the tolerance.
+benchmarks/baseline.json is a reference run of the default scales; its
+'meta' entry records the machine and versions it was taken on. Timings
+depend on the machine, so for regression checks save a baseline on the
+machine the checks run on (--save) and compare against that.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+if __name__ == '__main__':
+    # Run from a source checkout without installing the package
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import synthetic
+
+from vesselberthing import berthing_energy as mb
+from vesselberthing import catalog as ct
+from vesselberthing.functions import berth_coeff as bc
+from vesselberthing.functions import fndr_curves as fc
+
+default_scales = (10, 100, 1000, 10000, 100000)
+
+def measure(fn, repeat=3):
+    # Best wall time (s) of repeat calls and the peak traced memory (MB)
+    # of one extra call
+    best = np.inf
+    for i in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak / 2**20
+
+def record(report, name, items, fn, repeat):
+    seconds, peak = measure(fn, repeat)
+    report[name] = {'items': items, 'seconds': seconds,
+                    'throughput': items / seconds if seconds > 0 else np.inf,
+                    'peak_mb': peak}
+    print('{0:45s} {1:9d} {2:10.4f} s {3:14.0f} /s {4:9.2f} MB'.format(
+        name, items, seconds, report[name]['throughput'], peak))
+
+def bench_curves(report, n, repeat):
+    # fender_reaction per fender type, and the berth_coeff helpers
+    rng = np.random.default_rng(0)
+    for fndr in fc.Fenders:
+        E_max = fc.curve_inverse(fndr)[1][-1]
+        x = rng.uniform(0.0, 0.95 * E_max, n)
+        n_scalar = min(n, 2000)
+        record(report, 'fender_reaction[{0}]'.format(fndr), n_scalar,
+               lambda: [fc.fender_reaction(v, 1.0, 1.0, fndr) for v in x[:n_scalar]],
+               repeat)
+        record(report, 'fender_reaction_arr[{0}]'.format(fndr), n,
+               lambda: fc.fender_reaction_arr(x, 1.0, 1.0, fndr), repeat)
+
+    M = rng.uniform(2000.0, 60000.0, n)
+    L = rng.uniform(300.0, 700.0, n)
+    B = rng.uniform(40.0, 110.0, n)
+    D = rng.uniform(15.0, 35.0, n)
+    a = rng.uniform(0.0, 0.5, n) * L
+    wdepth = D + rng.uniform(5.0, 20.0, n)
+
+    def coeffs():
+        Cbl = bc.Cbl(M, L, B, D)
+        Ce = bc.Ce(bc.k(Cbl, L), a)
+        bc.Cm(L, B, D, Ce, wdepth)
+        bc.Cm(L, B, D, Ce, wdepth, True)
+    record(report, 'berth_coeff', n, coeffs, repeat)
+
+def bench_pipeline(report, n, repeat, workdir, loop_limit, plot_limit):
+    vessels, berths, loadcases, fender_dict, cp_e_dict, library = synthetic.portfolio(n)
+    previous = synthetic.use_library(library, os.path.join(workdir, 'catalog'))
+    try:
+        res = mb.berthing_energy(vessels, berths, loadcases, fender_dict,
+                                 cp_e_dict, None, batch=True)
+        rows = sum(len(t) for t in res.values())
+        tag = '[{0}]'.format(n)
+
+        record(report, 'berthing_energy_batch' + tag, rows,
+               lambda: mb.berthing_energy(vessels, berths, loadcases, fender_dict,
+                                          cp_e_dict, None, batch=True), repeat)
+        if n <= loop_limit:
+            record(report, 'berthing_energy' + tag, rows,
+                   lambda: mb.berthing_energy(vessels, berths, loadcases,
+                                              fender_dict, cp_e_dict, None), repeat)
+
+        output = os.path.join(workdir, 'bench.csv')
+        record(report, 'print_fndr_csv' + tag, rows,
+               lambda: mb.print_fndr_csv(res, output), repeat)
+        report['print_fndr_csv' + tag]['bytes'] = os.path.getsize(output)
+
+        if n <= plot_limit:
+            # Small portfolios may leave a fender group without rows
+            used = {g: fender_dict[g] for g in fender_dict if len(res[g])}
+            charts = 2 * len(used) + 1
+            record(report, 'plot_fndr_results' + tag, charts,
+                   lambda: mb.plot_fndr_results(vessels, used, res,
+                                                outdir=os.path.join(workdir, 'plots'),
+                                                dpi=50), 1)
+    finally:
+        ct.set_default_catalog(previous)
+
+def compare(report, baseline, tolerance):
+    # List of regressions of report against baseline
+    failed = []
+    for name, base in baseline['results'].items():
+        cur = report.get(name)
+        if cur is None or cur['items'] != base['items']:
+            continue                # not run, or run at another scale
+        if cur['throughput'] < base['throughput'] * (1.0 - tolerance):
+            failed.append('{0}: throughput {1:.0f}/s < baseline {2:.0f}/s'.format(
+                name, cur['throughput'], base['throughput']))
+        if cur['peak_mb'] > base['peak_mb'] * (1.0 + tolerance) + 0.5:
+            failed.append('{0}: peak memory {1:.1f} MB > baseline {2:.1f} MB'.format(
+                name, cur['peak_mb'], base['peak_mb']))
+    return failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=list(default_scales),
+                        help='approximate vessel/berth/load case combinations')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--loop-limit', type=int, default=10000,
+                        help='largest scale timed with the loop engine')
+    parser.add_argument('--plot-limit', type=int, default=1000,
+                        help='largest scale timed with the chart functions')
+    parser.add_argument('--save', default=None, help='write results as a baseline')
+    parser.add_argument('--compare', default=None, help='baseline file to check against')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    report = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        bench_curves(report, max(args.scales), args.repeat)
+        for n in args.scales:
+            bench_pipeline(report, n, args.repeat, workdir, args.loop_limit,
+                           args.plot_limit)
+
+    meta = {'python': platform.python_version(), 'numpy': np.__version__,
+            'machine': platform.machine(), 'system': platform.system(),
+            'cpus': os.cpu_count(), 'scales': args.scales,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'meta': meta, 'results': report}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        failed = compare(report, baseline, args.tolerance)
+        for msg in failed:
+            print('REGRESSION ' + msg)
+        return 1 if failed else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
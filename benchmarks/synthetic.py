@@ -0,0 +1,100 @@
+"""Synthetic berthing portfolios for the benchmarks.
+
+portfolio(n) returns vessels, berths, loadcases, fender_dict and cp_e_dict
+in the layout of the project scripts (see tests/11173-03 Test.py), with
+about n vessel/berth/load case combinations, and a vessel library holding
+the synthetic fleet. The fleet is made by scaling the catalog vessels, so
+the dimensions stay realistic. The same seed always gives the same
+portfolio.
+"""
+import json
+import math
+import os
+
+import numpy as np
+
+from vesselberthing import catalog as ct
+
+# Fender groups of the synthetic berths
+fender_dict = {'Typical Pneumatic':       ['pneumatic',       1339.0,     678.0,    0.6],
+               'Hydropneumatic 6.4m Sub': ['hydropneumatic',  1253.9,     1011.6,   0.4],
+               'Hydropneumatic 5.0m Sub': ['hydropneumatic',  1064.4,     844.0,    0.4],
+               'Corner Protection Fender':['MV',              441.1,      365.5,    0.575]
+               }
+
+def fleet(n_vessels, seed=0):
+    # Vessel library of n_vessels scaled copies of the catalog vessels
+    rng = np.random.default_rng(seed)
+    base = ct.Catalog().vessels
+    names = list(base)
+    library = {}
+    for i in range(n_vessels):
+        rec = dict(base[names[i % len(names)]])
+        s = rng.uniform(0.8, 1.2)
+        for f in ('Length Overall', 'CoG', 'FQp', 'RQp'):
+            if f in rec:
+                rec[f] = rec[f] * s
+        rec['Breadth'] = rec['Breadth'] * rng.uniform(0.9, 1.1)
+        rec['Draft'] = rec['Draft'] * rng.uniform(0.9, 1.1)
+        rec['Displacement'] = rec['Displacement'] * s**3
+        library['{0} #{1}'.format(names[i % len(names)], i)] = rec
+    return library
+
+def loadcase_grid(n_levels, seed=0):
+    # Load cases for every configuration, abnormal factor and water level
+    rng = np.random.default_rng(seed)
+    levels = np.sort(rng.uniform(99.0, 103.0, n_levels))
+    loadcases = {}
+    for config, Cg in (('Forward Quarter Point', 0.95), ('Rear Quarter Point', 0.95),
+                       ('Broadside', 1.0), ('Corner Protection', 1.0)):
+        for ABF in (1.0, 1.5):
+            for j, wl in enumerate(levels):
+                name = '{0}_{1}_{2}'.format(config.replace(' ', ''), ABF, j)
+                loadcases[name] = [config, ABF, Cg, float(wl)]
+    return loadcases
+
+def portfolio(n_cases, seed=0):
+    """Synthetic project with about n_cases vessel/berth/load case
+    combinations. Returns (vessels, berths, loadcases, fender_dict,
+    cp_e_dict, vessel_library)."""
+    loadcases = loadcase_grid(1 if n_cases < 100 else 2, seed)
+    n_lc = len(loadcases)
+
+    # Each vessel uses one berth and the corner protection
+    n_vessels = max(1, math.ceil(n_cases / (2 * n_lc)))
+    n_berths = max(1, min(50, n_vessels // 4))
+    rng = np.random.default_rng(seed)
+    library = fleet(n_vessels, seed)
+
+    berths = {'Corner Protection': [61.0, 'Corner Protection Fender', 'sheltered', 1.0]}
+    surface = []
+    sub = []
+    for j in range(n_berths):
+        mudline = float(rng.uniform(55.0, 67.0))
+        cond = ('sheltered', 'moderate', 'exposed')[j % 3]
+        berths['Surface Berth {0}'.format(j)] = [mudline, 'Typical Pneumatic', cond, 1.0]
+        surface.append('Surface Berth {0}'.format(j))
+        fndr = ('Hydropneumatic 6.4m Sub', 'Hydropneumatic 5.0m Sub')[j % 2]
+        berths['Submarine Berth {0}'.format(j)] = [mudline, fndr, cond, 1.0]
+        sub.append('Submarine Berth {0}'.format(j))
+
+    vessels = {}
+    cp_e_dict = {}
+    for i, name in enumerate(library):
+        is_sub = library[name]['Vessel Class'].startswith('SS')
+        berth = (sub if is_sub else surface)[i % n_berths]
+        vessels[name] = [2 if is_sub else int(rng.integers(3, 6)), is_sub,
+                         [berth, 'Corner Protection']]
+        cp_e_dict[name] = float(rng.uniform(0.0, 0.25) * library[name]['Length Overall'])
+    return vessels, berths, loadcases, dict(fender_dict), cp_e_dict, library
+
+def use_library(library, folder):
+    # Write a vessel library to folder and make it the default catalog.
+    # Returns the catalog it replaced.
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, 'Vessels.json')
+    with open(path, 'w') as f:
+        json.dump(library, f)
+    previous = ct.default_catalog()
+    ct.set_default_catalog(ct.Catalog(vessel_path=path))
+    return previous
@@ -0,0 +1,232 @@
+"""This module evaluates the berthing energies of every vessel, berth and
+load case combination as broadcast array operations. The numbers match the
+loop in berthing_energy.berthing_energy row for row, but each coefficient
+is computed once for the whole project instead of once per case.
+"""
+import numpy as np
+
+from .functions import berth_coeff as bc
+from .functions import fndr_curves as fc
+from .functions import berthvel as bv
+from . import instrument as ins
+from . import results as rs
+
+# Result columns, in the order of results.fields
+columns = ('key', 'k', 'case', 'ABF', 'config', 'ecc', 'wdepth',
+           'M', 'L', 'B', 'D', 'CG', 'nfndr',
+           'loc_fndr_key', 'fender_type',
+           'E_rating', 'R_rating', 'D_rating',
+           'V', 'Cbl', 'k_r', 'Cg', 'Cd', 'Cc', 'Ce', 'Cb',
+           'Cm', 'Eship', 'Deflection', 'Efndr',
+           'Reaction')
+
+configs = ('Broadside', 'Corner Protection',
+           'Forward Quarter Point', 'Rear Quarter Point')
+
+@ins.timed('case grid')
+def case_grid(vessels, berths, loadcases, fender_dict, cp_e_dict, vessel_library):
+    # Flatten the project definition into one array entry per valid
+    # (vessel, berth, load case) combination. Rows are ordered vessel,
+    # berth, then load case, the same as the berthing_energy loop.
+    # Definitions:
+    #   vessels, berths, loadcases, fender_dict, cp_e_dict
+    #       = Project dictionaries, as passed to berthing_energy
+    #   vessel_library = Vessel parameter library (vessels.json)
+    #   result  = Dictionary of 1-D arrays keyed by input column name
+
+    # Vessel / berth pairs
+    pair_vsl = []
+    pair_brth = []
+    for key in vessels:
+        for jtem in vessels[key][2]:
+            pair_vsl.append(key)
+            pair_brth.append(jtem)
+
+    vsl = np.array(pair_vsl, dtype=object)
+    fndr_key = np.array([berths[j][1] for j in pair_brth], dtype=object)
+    fender_type = np.array([fender_dict[f][0] for f in fndr_key], dtype=object)
+
+    def vparam(name):
+        return np.array([vessel_library[v][name] for v in pair_vsl], dtype=float)
+
+    def fparam(ind):
+        return np.array([fender_dict[f][ind] for f in fndr_key], dtype=float)
+
+    M = vparam('Displacement')
+    L = vparam('Length Overall')
+    CG = vparam('CoG')
+    vel_a, vel_b = np.array([bv.vel_coeff[berths[j][2]] for j in pair_brth],
+                            dtype=float).reshape(-1, 2).T
+
+    # Load Cases
+    lc = list(loadcases)
+    config = np.array([loadcases[k][0] for k in lc], dtype=object)
+    unknown = set(config) - set(configs)
+    if unknown:
+        raise ValueError('Unknown berthing configuration(s): '
+                         + ', '.join(sorted(unknown)))
+    ABF = np.array([loadcases[k][1] for k in lc], dtype=float)
+
+    # Define Number of Fenders and Eccentricity for each pair and load case
+    is_bs = (config == 'Broadside')[None, :]
+    is_cp = (config == 'Corner Protection')[None, :]
+    is_fq = (config == 'Forward Quarter Point')[None, :]
+    if is_cp.any():
+        cp_e_given = np.array([cp_e_dict[v] for v in pair_vsl], dtype=object)
+    else:
+        cp_e_given = np.zeros(len(pair_vsl), dtype=object)
+    cp_e = cp_e_given.astype(float)
+    nfndr_bs = np.array([vessels[v][0] for v in pair_vsl], dtype=float)
+
+    nfndr = np.where(is_bs, nfndr_bs[:, None], 1.0)
+    a = np.where(is_bs, 0.0,
+        np.where(is_cp, cp_e[:, None],
+        np.where(is_fq, abs(CG-L/4)[:, None], abs(3*L/4-CG)[:, None])))
+
+    # Eccentricity as given for the results, as the berthing_energy loop
+    # stores it: the integer 0 for broadside, the cp_e_dict value for
+    # corner protection and the computed float otherwise
+    ecc = np.where(is_bs, 0, np.where(is_cp, cp_e_given[:, None], a.astype(object)))
+
+    # Corner Protection cases apply to MV fenders only, and MV fenders
+    # are not checked for any other configuration
+    mask = is_cp == (fender_type == 'MV')[:, None]
+    ip, ik = np.nonzero(mask)
+
+    wl = np.array([loadcases[k][3] for k in lc], dtype=float)
+    mudline = np.array([berths[j][0] for j in pair_brth], dtype=float)
+
+    result = {'key': vsl[ip],
+              'k': np.array(lc, dtype=object)[ik],
+              'case': np.where(ABF == 1, 'Operational', 'Accidental').astype(object)[ik],
+              'ABF': ABF[ik],
+              'config': config[ik],
+              'a': a[ip, ik],
+              'ecc': ecc[ip, ik],
+              'wdepth': wl[ik] - mudline[ip],
+              'M': M[ip],
+              'L': L[ip],
+              'B': vparam('Breadth')[ip],
+              'D': vparam('Draft')[ip],
+              'CG': CG[ip],
+              'nfndr': nfndr[ip, ik],
+              'loc_fndr_key': fndr_key[ip],
+              'fender_type': fender_type[ip],
+              'E_rating': fparam(1)[ip],
+              'R_rating': fparam(2)[ip],
+              'D_rating': fparam(3)[ip],
+              'Cg': np.array([loadcases[k][2] for k in lc], dtype=float)[ik],
+              'Cd': vparam('C_d')[ip],
+              'Cc': np.array([berths[j][3] for j in pair_brth], dtype=float)[ip],
+              'sub': np.array([bool(vessels[v][1]) for v in pair_vsl])[ip],
+              'vel_a': vel_a[ip],
+              'vel_b': vel_b[ip],
+              'berth': np.array(pair_brth, dtype=object)[ip],
+              'wl': wl[ik],
+              'mudline': mudline[ip]}
+    return result
+
+def case_energy(grid, V=None):
+    # Evaluate the berthing coefficients and fender energy for every row
+    # of a case grid. All operations broadcast, so grid entries may carry
+    # extra trailing dimensions (e.g. samples or sweep axes).
+    # Definitions:
+    #   grid    = Case grid from case_grid
+    #   V       = Berthing velocity, defaults to the curve fit for each
+    #             row's displacement and berthing condition
+    #   result  = Dictionary of computed columns
+
+    M, L, B, D = grid['M'], grid['L'], grid['B'], grid['D']
+
+    if V is None:
+        V = grid['vel_a'] * M**grid['vel_b']    # Berthing Velocity
+    Cbl = bc.Cbl(M, L, B, D)                # Block Factor
+    k_r = bc.k(Cbl, L)                      # Radius of Gyration
+    Eship = 0.5 * M * 2.240 * V**2 / 32.2   # Ship Energy
+    Ce = bc.Ce(k_r, grid['a'])              # Eccentricity Coefficient
+    Cb = Ce * grid['Cg'] * grid['Cd'] * grid['Cc']
+
+    # Virtual Mass Coefficient
+    Cm = np.where(grid['sub'], bc.Cm(L, B, D, Cb, grid['wdepth'], True),
+                               bc.Cm(L, B, D, Cb, grid['wdepth'], False))
+
+    # Calculate Fender Energy (includes 10% increase for uncertainty)
+    Efndr = grid['ABF'] * Cm * Cb * Eship / grid['nfndr'] * 1.1
+
+    return {'V': V, 'Cbl': Cbl, 'k_r': k_r, 'Ce': Ce, 'Cb': Cb,
+            'Cm': Cm, 'Eship': Eship, 'Efndr': Efndr}
+
+def evaluate_cases(grid):
+    # Evaluate the berthing coefficients, energies and fender reactions
+    # for every row of a case grid. The grid is updated in place with the
+    # computed columns and returned.
+
+    with ins.stage('coefficients'):
+        grid.update(case_energy(grid))
+    Efndr = grid['Efndr']
+
+    Deflection = np.empty_like(Efndr)
+    Reaction = np.empty_like(Efndr)
+    with ins.stage('fender solve'):
+        for fndr in set(grid['fender_type']):
+            sel = grid['fender_type'] == fndr
+            Rfndr = fc.fender_reaction_arr(Efndr[sel], grid['E_rating'][sel],
+                                           grid['R_rating'][sel], fndr)
+            Deflection[sel] = Rfndr[0]
+            Reaction[sel] = Rfndr[1]
+
+    grid.update({'Deflection': Deflection, 'Reaction': Reaction})
+    ins.count('cases', len(Efndr))
+    return grid
+
+def result_table(grid):
+    # Convert an evaluated case grid into a ResultTable
+    return rs.ResultTable.from_columns(
+        {name: grid[col] for (name, _), col in zip(rs.fields, columns)})
+
+def berthing_energy_batch(vessels, berths, loadcases, fender_dict, cp_e_dict,
+                          vessel_library):
+    """Array implementation of berthing_energy. Returns the same dictionary
+    of ResultTables keyed by fender."""
+    grid = evaluate_cases(case_grid(vessels, berths, loadcases, fender_dict,
+                                    cp_e_dict, vessel_library))
+
+    table = result_table(grid)
+    results = {}
+    for i in fender_dict.keys():
+        results[i] = table[grid['loc_fndr_key'] == i]
+    return results
+
+def iter_berthing_energy_batch(vessels, berths, loadcases, fender_dict,
+                               cp_e_dict, vessel_library, chunk_size=100000):
+    # Yield the results of berthing_energy_batch in blocks of about
+    # chunk_size rows. Blocks follow the vessel, berth, load case order;
+    # each one is a dictionary of ResultTables keyed by fender.
+
+    lc = list(loadcases)
+    lc_step = max(1, min(len(lc), chunk_size))
+    pair_step = max(1, chunk_size // max(len(lc), 1))
+
+    pairs = [(key, jtem) for key in vessels for jtem in vessels[key][2]]
+    for p0 in range(0, len(pairs), pair_step):
+        block = pairs[p0:p0 + pair_step]
+        sub_vessels = {}
+        for key, jtem in block:
+            if key not in sub_vessels:
+                sub_vessels[key] = [vessels[key][0], vessels[key][1], []]
+            sub_vessels[key][2].append(jtem)
+
+        for k0 in range(0, len(lc), lc_step):
+            sub_lc = {k: loadcases[k] for k in lc[k0:k0 + lc_step]}
+            grid = evaluate_cases(case_grid(sub_vessels, berths, sub_lc,
+                                            fender_dict, cp_e_dict,
+                                            vessel_library))
+            if len(grid['key']) == 0:
+                continue
+            table = result_table(grid)
+            chunk = {}
+            for i in fender_dict.keys():
+                sel = grid['loc_fndr_key'] == i
+                if sel.any():
+                    chunk[i] = table[sel]
+            yield chunk
@@ -2,41 +2,85 @@
 plot these energies on fender reaction curves, and generate the resulting
 reactions.
 """
-import csv
-import json
-import os
-
 from .functions import berth_coeff as bc
 from .functions import fndr_curves as fc
-from .functions import fndr_plot as plt
 from .functions import berthvel as bv
-
-const_path = os.path.abspath(os.path.join(os.path.dirname(__file__),'.\\constants'))
-
-# Load Vessel Parameters 
-f = open(const_path + '\\vessels.json','r')
-vessel_library = json.load(f)
-f.close()
-
-# Load Fender Parameters
-f = open(const_path + '\\fenders.json','r')
-fender_library = json.load(f)
-f.close()
-
-def berthing_energy(vessels, berths, loadcases, fender_dict, cp_e_dict, output):
+from . import berthing_batch
+from . import results as rs
+from . import writers as wr
+from . import catalog as ct
+from . import render as rd
+from . import instrument as ins
+
+def __getattr__(name):
+    # vessel_library and fender_library are loaded from the catalog on
+    # first use rather than at import
+    match name:
+        case 'vessel_library':
+            return ct.default_catalog().vessels
+        case 'fender_library':
+            return ct.default_catalog().fenders
+    raise AttributeError('module ' + repr(__name__) + ' has no attribute ' + repr(name))
+
+@ins.timed('berthing_energy')
+def berthing_energy(vessels, berths, loadcases, fender_dict, cp_e_dict, output,
+                    batch=False, cache=None, lines=None, sensitivity=False,
+                    bounds=None):
     """Determine berthing energies using UFC 4-152-01 based on guidance from
-    PIANC 2002.  Output units are (kip, ft)"""
+    PIANC 2002.  Output units are (kip, ft)
+
+    Returns a dictionary of results.ResultTable keyed by fender.
+
+    With batch=True every case is evaluated at once as array operations
+    (see berthing_batch), giving the same rows as the loop below. Passing a
+    cache.ResultCache evaluates with the array engine and reuses result
+    blocks computed by earlier runs. lines gives fender lines by berth
+    ([spacing, yaw, ...], see fender_array) whose energy is shared between
+    the fenders of the line. With sensitivity=True the tables also hold
+    the derivative of Energy, Deflection and Reaction with respect to each
+    input as 'dOutput/dInput' columns (see sensitivity). bounds adds the
+    min/max deflection and reaction for fender performance factors, given
+    as factor tables by fender type or True for the default tolerance
+    (see bounds). cache, lines, sensitivity and bounds each select a
+    different evaluation and cannot be combined; passing more than one
+    raises ValueError. batch may be given with any of them, as they all
+    evaluate with the array engine."""
+    options = [name for name, given in (('cache', cache is not None),
+                                        ('lines', lines is not None),
+                                        ('sensitivity', bool(sensitivity)),
+                                        ('bounds', bounds is not None and bounds is not False))
+               if given]
+    if len(options) > 1:
+        raise ValueError('berthing_energy cannot combine the ' + ', '.join(options)
+                         + ' options; run them separately')
+
+    vessel_library = ct.default_catalog().vessels
+    if bounds is not None and bounds is not False:
+        from .bounds import berthing_bounds
+        return berthing_bounds(vessels, berths, loadcases, fender_dict, cp_e_dict,
+                               None if bounds is True else bounds, vessel_library)
+    if sensitivity:
+        from .sensitivity import berthing_sensitivity
+        return berthing_sensitivity(vessels, berths, loadcases, fender_dict,
+                                    cp_e_dict, vessel_library)
+    if lines is not None:
+        from .fender_array import berthing_energy_lines
+        return berthing_energy_lines(vessels, berths, loadcases, fender_dict,
+                                     cp_e_dict, lines, vessel_library)
+    if cache is not None:
+        from .cache import cached_berthing_energy
+        return cached_berthing_energy(vessels, berths, loadcases, fender_dict,
+                                      cp_e_dict, vessel_library, cache)
+    if batch:
+        return berthing_batch.berthing_energy_batch(vessels, berths, loadcases,
+                                                    fender_dict, cp_e_dict,
+                                                    vessel_library)
+
     # Initialize Dictionaries
-    Eberth_arr = {}
-    Rberth_arr = {}
-    Dberth_arr = {}
     results = {}
 
     for i in fender_dict.keys():
         results[i] = []
-        Eberth_arr[i] = []
-        Rberth_arr[i] = []
-        Dberth_arr[i] = []
 
     for i, key in enumerate(vessels):
         # Assign variables for the current vessel
@@ -108,9 +152,6 @@ def berthing_energy(vessels, berths, loadcases, fender_dict, cp_e_dict, output):
                 if ((config == 'Corner Protection' and fender_dict[loc_fndr_key][0] == 'MV')
                         or (config != 'Corner Protection' and fender_dict[loc_fndr_key][0] !='MV')):
                     Rfndr = fc.fender_reaction(Efndr,E_rating,R_rating,fender_type)
-                    Eberth_arr[loc_fndr_key].append([Efndr])
-                    Rberth_arr[loc_fndr_key].append([Rfndr[1]])
-                    Dberth_arr[loc_fndr_key].append([Rfndr[0]])
 
                     results[loc_fndr_key].append([key, k, case, ABF, config, a, wdepth, 
                                                 M, L, B, D, CG, nfndr, 
@@ -119,56 +160,45 @@ def berthing_energy(vessels, berths, loadcases, fender_dict, cp_e_dict, output):
                                                 V, Cbl, k_r, Cg, Cd, Cc, Ce, Cb,
                                                 Cm, Eship, Rfndr[0], Efndr, 
                                                 Rfndr[1]])
-    return results
-
-def plot_fndr_results(vessels,fender_dict,fndr_results):
 
-    for i in fender_dict.keys():
-        Eberth_arr = []
-        Rberth_arr = []
-        Dberth_arr = []
-
-        for j in fndr_results[i]:
-            Eberth_arr.append(j[29])
-            Rberth_arr.append(j[30])
-            Dberth_arr.append(j[28])
-
-        # Generate Fender Curves
-        fender_type = fender_dict[i][0]
-        E_rating = fender_dict[i][1]
-        R_rating = fender_dict[i][2]
-        D_curve = fender_dict[i][3]
-        E_curve = fc.Fenders[fender_type][0]*E_rating
-        R_curve = fc.Fenders[fender_type][1]*R_rating
-
-        plt.ER_demand_curve(Dberth_arr,Eberth_arr,Rberth_arr,D_curve,
-                            E_curve,R_curve,cht_title= i + ' Fender Demand Curves')
-        plt.ER_curve(D_curve, E_curve,R_curve, cht_title= i + ' Fender Curves')
-
-    data=[]
-    for i, key in enumerate(vessels):
-        data.append([key,vessel_library[key]['Displacement'],bv.velocity(vessel_library[key]['Displacement'],'sheltered')])
-    plt.vel_plt(data,'Approach Velocity Perpendicular to Berth')
-
-    return
+    for i in results:
+        results[i] = rs.ResultTable.from_rows(results[i])
+    if ins.enabled:
+        ins.count('cases', sum(len(t) for t in results.values()))
+    return results
 
+def iter_berthing_energy(vessels, berths, loadcases, fender_dict, cp_e_dict,
+                         chunk_size=100000):
+    """Generator form of berthing_energy. Cases are evaluated in blocks of
+    about chunk_size rows with the array engine and each block is yielded as
+    a dictionary of ResultTables keyed by fender, so memory stays bounded
+    however many cases are run. Pair with writers.write_results to stream
+    the rows to disk."""
+    return berthing_batch.iter_berthing_energy_batch(vessels, berths, loadcases,
+                                                     fender_dict, cp_e_dict,
+                                                     ct.default_catalog().vessels,
+                                                     chunk_size)
+
+@ins.timed('plot_fndr_results')
+def plot_fndr_results(vessels,fender_dict,fndr_results,outdir='.',fmt='png',
+                      dpi=300,workers=1,skip_unchanged=False,cache=None):
+    """Draw the demand and fender curves of each fender and the vessel
+    approach velocity chart. Charts are rendered by render.render_charts:
+    fmt='pdf' collects them in one document, workers > 1 renders them in
+    a process pool and skip_unchanged=True only redraws charts whose data
+    changed. A cache.ResultCache supplies charts drawn by earlier runs.
+    Returns the written and skipped file paths."""
+    jobs = rd.chart_jobs(vessels, fender_dict, fndr_results,
+                         ct.default_catalog().vessels)
+    return rd.render_charts(jobs, outdir=outdir, fmt=fmt, dpi=dpi,
+                            workers=workers, skip_unchanged=skip_unchanged,
+                            cache=cache)
+
+@ins.timed('print_fndr_csv')
 def print_fndr_csv(results,output='Berthing Energy.csv'):
+    # Write a results dictionary (or an iterable of result chunks from
+    # iter_berthing_energy) to CSV in buffered blocks.
 
-    # Field names used for CSV output
-    fldnms = ['Vessel', 'Load Case','Berthing Condition','Acc. Factor', 'Berthing Configuration', 'Eccentricity',
-            'Water Depth', 'Displacement','Length','Beam','Draft','CoG',
-            'No. Fenders','Fender Name','Fender Type',
-            'Rated Energy', 'Rated Reaction', 'Rated Deflection','Vel', 'Cbl', 
-            'k_r', 'Cg', 'Cd', 'Cc', 'Ce', 'Cb', 'Cm','Eship', 'Deflection', 
-            'Energy', 'Reaction']
-
-    f = open(output,'w',newline='')
-    writer = csv.writer(f)
-
-    writer.writerow(fldnms)
-    for key in results:
-        for row in results[key]:
-            writer.writerow(row)
-
-    f.close()
-        
+    if isinstance(results, dict):
+        results = [results]
+    wr.write_results(results, output)
@@ -0,0 +1,136 @@
+"""This module bounds the fender deflection and reaction for variations in
+fender performance. The curves in fndr_curves are nominal; manufacturing
+tolerance, temperature and velocity (rate) factors scale the energy and
+reaction a real fender develops. Factor tables give the range of each
+factor per fender type,
+
+    factors = {'pneumatic': {'tolerance':   (0.9, 1.1),
+                             'temperature': (0.95, 1.05)},
+               'unit fender': {'tolerance': (0.9, 1.1),
+                               'velocity': {'energy': (1.0, 1.05),
+                                            'reaction': (1.0, 1.25)}}}
+
+and every case is bounded in one array pass:
+
+  * Deflection Max / Min use the softest / stiffest energy curve (the
+    rated energy times the product of the smallest / largest energy
+    factors).
+  * Reaction Max / Min are the largest / smallest reaction of the curve
+    over that deflection range, times the largest / smallest product of
+    the reaction factors. Curve extrema within the range (e.g. buckling)
+    are included.
+
+Energy and reaction factors are bounded independently, which is
+conservative. Fender types without a table use default_factors.
+Demands beyond the softest curve have NaN bounds.
+
+    results = berthing_energy(vessels, berths, loadcases, fender_dict,
+                              cp_e_dict, None, bounds=factors)
+"""
+import numpy as np
+
+from . import berthing_batch
+from . import catalog as ct
+from .functions import fndr_curves as fc
+
+# Performance variation of fenders without a factor table (the ±10% of
+# the fender curves)
+default_factors = {'tolerance': (0.9, 1.1)}
+
+bound_fields = ('Deflection Min', 'Deflection Max', 'Reaction Min', 'Reaction Max')
+
+def factor_range(table):
+    # Combined (min, max) energy and reaction factors of a factor table
+    # Definitions:
+    #   table   = Dictionary of factor name: (min, max), or of factor
+    #             name: {'energy': (min, max), 'reaction': (min, max)}
+    #   result  = [(E_min, E_max), (R_min, R_max)]
+    E = np.array([1.0, 1.0])
+    R = np.array([1.0, 1.0])
+    for name, rng in table.items():
+        if isinstance(rng, dict):
+            e, r = rng.get('energy', (1.0, 1.0)), rng.get('reaction', (1.0, 1.0))
+        else:
+            e = r = rng
+        if e[0] > e[1] or r[0] > r[1] or min(e[0], r[0]) <= 0:
+            raise ValueError('Factor ' + repr(name) + ' needs positive (min, max) values')
+        E = E * np.asarray(e, dtype=float)
+        R = R * np.asarray(r, dtype=float)
+    return [tuple(E), tuple(R)]
+
+_extrema_cache = {}
+
+def reaction_extrema(fndr):
+    # Normalized deflections where the reaction curve of a fender type can
+    # have a local extreme: the real roots of the slope of a polynomial
+    # curve, or the points of a tabulated (monotone piecewise) curve
+    R_curve = fc.Fenders[fndr][1]
+    cached = _extrema_cache.get(fndr)
+    if cached is not None and cached[0] is R_curve:
+        return cached[1]
+    if hasattr(R_curve, 'coef'):
+        roots = R_curve.deriv().roots()
+        D = np.sort(roots[np.abs(roots.imag) < 1e-12].real)
+    elif hasattr(R_curve, 'x'):
+        D = np.asarray(R_curve.x, dtype=float)
+    else:
+        D = np.linspace(0, fc.D_limit, 257)
+    D = D[(D >= 0) & (D <= fc.D_limit)]
+    _extrema_cache[fndr] = (R_curve, D)
+    return D
+
+def curve_range(fndr, D_lo, D_hi):
+    # Smallest and largest normalized reaction of a fender type over the
+    # deflection ranges [D_lo, D_hi]
+    R_curve = fc.Fenders[fndr][1]
+    D_x = reaction_extrema(fndr)
+    inside = (D_x >= D_lo[..., None]) & (D_x <= D_hi[..., None])
+    R_x = R_curve(D_x)
+    R_lo = R_curve(D_lo)
+    R_hi = R_curve(D_hi)
+    R_min = np.minimum(np.minimum(R_lo, R_hi), np.where(inside, R_x, np.inf).min(axis=-1, initial=np.inf))
+    R_max = np.maximum(np.maximum(R_lo, R_hi), np.where(inside, R_x, -np.inf).max(axis=-1, initial=-np.inf))
+    return [R_min, R_max]
+
+def bound_cases(grid, factors=None):
+    # Bounded deflection and reaction of every row of an evaluated case
+    # grid (berthing_batch.evaluate_cases)
+    # Definitions:
+    #   grid    = Evaluated case grid
+    #   factors = Factor tables by fender type (see module docstring)
+    #   result  = Dictionary of the bound_fields columns
+    factors = factors or {}
+    Efndr = grid['Efndr']
+    out = {name: np.full(len(Efndr), np.nan) for name in bound_fields}
+    for fndr in set(grid['fender_type']):
+        sel = grid['fender_type'] == fndr
+        (E_min, E_max), (R_min, R_max) = factor_range(factors.get(fndr, default_factors))
+        E_n = Efndr[sel] / grid['E_rating'][sel]
+        top = fc.curve_inverse(fndr)[1][-1]
+
+        # Softest and stiffest energy curves
+        D_hi = fc.fender_deflection(E_n / E_min, fndr, clip=True)
+        D_lo = fc.fender_deflection(E_n / E_max, fndr, clip=True)
+        R_lo, R_hi = curve_range(fndr, D_lo, D_hi)
+        ok = E_n / E_min <= top
+        R_r = grid['R_rating'][sel]
+        out['Deflection Min'][sel] = np.where(E_n / E_max <= top, D_lo, np.nan)
+        out['Deflection Max'][sel] = np.where(ok, D_hi, np.nan)
+        out['Reaction Min'][sel] = np.where(ok, R_lo * R_r * R_min, np.nan)
+        out['Reaction Max'][sel] = np.where(ok, R_hi * R_r * R_max, np.nan)
+    return out
+
+def berthing_bounds(vessels, berths, loadcases, fender_dict, cp_e_dict,
+                    factors=None, vessel_library=None):
+    """berthing_energy results with the nominal values and the bound_fields
+    columns. Returns the same dictionary of ResultTables keyed by
+    fender."""
+    if vessel_library is None:
+        vessel_library = ct.default_catalog().vessels
+    grid = berthing_batch.evaluate_cases(berthing_batch.case_grid(
+        vessels, berths, loadcases, fender_dict, cp_e_dict, vessel_library))
+    table = berthing_batch.result_table(grid).with_fields(**bound_cases(grid, factors))
+    results = {}
+    for i in fender_dict.keys():
+        results[i] = table[grid['loc_fndr_key'] == i]
+    return results
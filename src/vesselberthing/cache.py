@@ -0,0 +1,302 @@
+"""This module provides an opt-in on-disk cache for berthing results and
+rendered charts. Entries are addressed by a SHA-256 hash of everything that
+determines them: for result blocks, the vessel library entry, vessel row,
+berth row, berthing velocity curve, load cases, fender ratings and curve,
+corner protection eccentricity and the package version; for charts, the chart data, title,
+resolution and format.
+
+Results are cached per (vessel, berth) block, so the same vessel at the same
+berth is reused across projects and reruns. Files are written atomically
+(temporary file + rename), so several worker processes can share one cache
+folder; the folder is kept under max_bytes by evicting the least recently
+used entries.
+
+Entries are plain data: result blocks are stored as .npy arrays read with
+allow_pickle=False and charts as the image file bytes, so reading a cache
+never executes code from it. Anyone who can write to the folder can still
+change the cached results and charts, so share a cache folder only between
+users who trust each other.
+
+    cache = ResultCache('~/.cache/vesselberthing', max_bytes=2**30)
+    results = mb.berthing_energy(..., cache=cache)
+    cache.stats()
+"""
+import hashlib
+import io
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+from . import berthing_batch
+from . import instrument as ins
+from . import results as rs
+from .functions import berthvel as bv
+from .functions import fndr_curves as fc
+
+default_path = os.path.join('~', '.cache', 'vesselberthing')
+
+# Source files whose contents are part of every key, so a code change
+# invalidates the cache even without a version bump. Files that are not
+# installed (e.g. a bytecode-only install) are skipped, and the key then
+# depends on the package version alone.
+_code_files = ('berthing_batch.py', 'results.py', 'functions/berth_coeff.py',
+               'functions/berthvel.py', 'functions/fndr_curves.py',
+               'functions/fndr_tables.py', 'functions/fndr_plot.py')
+_version = None
+
+def package_version():
+    # Installed package version and a hash of the computational source
+    global _version
+    if _version is None:
+        try:
+            from importlib.metadata import version, PackageNotFoundError
+            try:
+                ver = version('vesselberthing-AFortier')
+            except PackageNotFoundError:
+                ver = 'unknown'
+        except ImportError:
+            ver = 'unknown'
+        h = hashlib.sha256()
+        root = os.path.dirname(os.path.abspath(__file__))
+        for name in _code_files:
+            try:
+                with open(os.path.join(root, name), 'rb') as f:
+                    h.update(f.read())
+            except OSError:
+                continue
+        _version = ver + '+' + h.hexdigest()[:16]
+    return _version
+
+def curve_signature(fndr):
+    # Data defining the energy and reaction curves of a fender type
+    sig = []
+    for curve in fc.Fenders[fndr]:
+        if hasattr(curve, 'coef'):
+            sig.append(['poly', list(map(float, curve.coef))])
+        elif hasattr(curve, 'x') and hasattr(curve, 'y'):
+            sig.append(['table', list(map(float, curve.x)), list(map(float, curve.y))])
+        else:
+            sig.append(['other', repr(curve)])
+    return sig
+
+def make_key(*parts):
+    # SHA-256 hex digest of JSON-serializable parts and the package version
+    text = json.dumps([package_version()] + list(parts), sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+class ResultCache:
+    """Size-bounded, content-addressed cache folder shared between
+    processes. Keys are hex digests (see make_key); values are bytes."""
+
+    def __init__(self, path=None, max_bytes=1 << 30):
+        if path is None:
+            path = os.environ.get('VESSELBERTHING_CACHE', default_path)
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.max_bytes = max_bytes
+        self._size = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def get(self, key):
+        # Return the cached bytes for key, or None on a miss
+        path = self._file(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)          # mark as recently used
+        except OSError:
+            self.misses += 1
+            ins.count('cache misses')
+            return None
+        self.hits += 1
+        ins.count('cache hits')
+        return data
+
+    def put(self, key, data):
+        # Store bytes under key, atomically
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = '{0}.{1}.tmp'.format(path, uuid.uuid4().hex)
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.writes += 1
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += len(data)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        # (last use, size, path) of every entry
+        entries = []
+        for sub in os.scandir(self.path):
+            if not sub.is_dir():
+                continue
+            for e in os.scandir(sub.path):
+                if e.name.endswith('.tmp'):
+                    continue
+                try:
+                    st = e.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, e.path))
+        return entries
+
+    def size(self):
+        # Total size of the cache folder (bytes)
+        return sum(e[1] for e in self._entries())
+
+    def evict(self, target=None):
+        # Remove least recently used entries until the cache is below
+        # target bytes (default 90% of max_bytes)
+        if target is None:
+            target = 0.9 * self.max_bytes
+        entries = sorted(self._entries())
+        total = sum(e[1] for e in entries)
+        for mtime, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except OSError:
+                pass                # already removed by another process
+            total -= size
+        self._size = total
+
+    def clear(self):
+        for sub in os.scandir(self.path):
+            if sub.is_dir():
+                shutil.rmtree(sub.path, ignore_errors=True)
+        self._size = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'writes': self.writes, 'evictions': self.evictions,
+                'bytes': self._size if self._size is not None else self.size()}
+
+def block_key(key, jtem, vessels, berths, loadcases, fender_dict, cp_e_dict,
+              vessel_library):
+    # Key of the result block of one vessel at one berth. The velocity
+    # curve coefficients are part of the key, not only the berthing
+    # condition name, since calibrated curves can replace them.
+    fndr = berths[jtem][1]
+    return make_key('results', key, dict(vessel_library[key]), list(vessels[key][:2]),
+                    jtem, list(berths[jtem]),
+                    [float(c) for c in bv.vel_coeff[berths[jtem][2]]],
+                    [[k, list(loadcases[k])] for k in loadcases],
+                    fndr, list(fender_dict[fndr]),
+                    curve_signature(fender_dict[fndr][0]),
+                    cp_e_dict.get(key))
+
+def dump_block(block):
+    # .npy bytes of a result block, with the text columns stored as
+    # fixed-width unicode and the numbers kept as given (results.
+    # numeric_objects) as their repr in bytes, so no pickling is needed
+    dt = []
+    cols = {}
+    for name in block.dtype.names:
+        col = block[name]
+        if col.dtype == object:
+            vals = col.tolist()
+            kind = 'U'
+            if name in rs.numeric_objects:
+                vals = [repr(v).encode('ascii') for v in vals]
+                kind = 'S'
+            width = max([len(v) for v in vals] + [1])
+            dt.append((name, kind + str(width)))
+            cols[name] = vals
+        else:
+            dt.append((name, col.dtype))
+            cols[name] = col
+    arr = np.empty(len(block), dtype=dt)
+    for name in block.dtype.names:
+        arr[name] = cols[name]
+    buf = io.BytesIO()
+    np.save(buf, arr, allow_pickle=False)
+    return buf.getvalue()
+
+def load_block(data):
+    # Result block from dump_block bytes, or None if the bytes are not a
+    # result block with the result fields
+    try:
+        arr = np.load(io.BytesIO(data), allow_pickle=False)
+    except (ValueError, OSError, EOFError):
+        return None
+    if arr.dtype.names != rs.result_dtype.names:
+        return None
+    block = np.zeros(len(arr), dtype=rs.result_dtype)
+    for name in rs.result_dtype.names:
+        match arr[name].dtype.kind:
+            case 'U':
+                block[name] = arr[name].tolist()
+            case 'S':
+                try:
+                    block[name] = [_number(v.decode('ascii')) for v in arr[name].tolist()]
+                except (ValueError, UnicodeDecodeError):
+                    return None
+            case _:
+                block[name] = arr[name]
+    return block
+
+def _number(text):
+    # int or float from its repr, as written by dump_block
+    if any(c in text for c in '.eEn'):
+        return float(text)
+    return int(text)
+
+def cached_berthing_energy(vessels, berths, loadcases, fender_dict, cp_e_dict,
+                           vessel_library, cache):
+    """berthing_energy_batch with (vessel, berth) result blocks read from and
+    written to cache. Only the blocks missing from the cache are evaluated
+    (in one batch). Returns the same dictionary of ResultTables."""
+    pairs = [(key, jtem) for key in vessels for jtem in vessels[key][2]]
+    keys = {}
+    blocks = {}
+    missing = []
+    for pair in pairs:
+        if pair in keys:
+            continue
+        keys[pair] = block_key(pair[0], pair[1], vessels, berths, loadcases,
+                               fender_dict, cp_e_dict, vessel_library)
+        data = cache.get(keys[pair])
+        block = None if data is None else load_block(data)
+        if block is None:
+            missing.append(pair)
+        else:
+            blocks[pair] = block
+
+    if missing:
+        sub_vessels = {}
+        for key, jtem in missing:
+            sub_vessels.setdefault(key, [vessels[key][0], vessels[key][1], []])
+            sub_vessels[key][2].append(jtem)
+        grid = berthing_batch.evaluate_cases(berthing_batch.case_grid(
+            sub_vessels, berths, loadcases, fender_dict, cp_e_dict, vessel_library))
+        table = berthing_batch.result_table(grid)
+        vsl = grid['key']
+        brth = grid['berth']
+        for pair in missing:
+            sel = (vsl == pair[0]) & (brth == pair[1])
+            blocks[pair] = table.data[sel]
+            cache.put(keys[pair], dump_block(blocks[pair]))
+
+    results = {}
+    for i in fender_dict.keys():
+        parts = [blocks[p] for p in pairs if berths[p[1]][1] == i]
+        results[i] = (rs.ResultTable(np.concatenate(parts)) if parts
+                      else rs.ResultTable())
+    return results
@@ -0,0 +1,260 @@
+"""This module provides the vessel and fender catalog used by the berthing
+calculations. The JSON libraries in the constants folder are read on first
+use rather than at import, and indexes by vessel class, displacement and
+fender type are built as needed.
+
+A catalog can also be compiled to NumPy structured arrays (.npy). The
+compiled files are memory-mapped when loaded, so many worker processes can
+share one copy of a large fleet library without each parsing the JSON.
+Set the VESSELBERTHING_CATALOG environment variable to a compiled catalog
+folder to make it the default in every process.
+"""
+import json
+import os
+from collections.abc import Mapping
+
+import numpy as np
+
+from . import instrument as ins
+
+const_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'constants')
+vessel_file = os.path.join(const_path, 'Vessels.json')
+fender_file = os.path.join(const_path, 'fenders.json')
+
+# Fender curve (fndr_curves.Fenders) used by each fenders.json group
+fender_groups = {'MV Fenders':          'MV',
+                 'Pneumatic Fenders':   'pneumatic'}
+
+# fenders.json key holding tabulated fender curves, keyed by fender type:
+#   "Curves": {"<fender type>": {"Deflection": [...], "Energy": [...],
+#                                "Reaction": [...]}}
+# with energy and reaction normalized by the rated values
+curve_key = 'Curves'
+
+# Stored for a missing value of an integer field (NaN marks missing floats)
+missing_int = np.iinfo(np.int64).min
+
+def _is_int(v):
+    return isinstance(v, int) and not isinstance(v, bool)
+
+def _table(records, first):
+    # Convert a list of flat records into a structured array. Fields whose
+    # values are all integers are stored as int64, other numeric fields as
+    # floats and the rest as fixed-width strings. The fields named in first
+    # are placed first.
+    fields = list(first)
+    for rec in records:
+        for f in rec:
+            if f not in fields:
+                fields.append(f)
+
+    dtype = []
+    for f in fields:
+        vals = [rec.get(f) for rec in records]
+        if (f not in first and any(v is not None for v in vals)
+                and all(_is_int(v) or v is None for v in vals)):
+            dtype.append((f, np.int64))
+        elif f not in first and all(isinstance(v, (int, float)) or v is None
+                                    for v in vals):
+            dtype.append((f, float))
+        else:
+            width = max([len(str(v)) for v in vals if v is not None] + [1])
+            dtype.append((f, 'U{0}'.format(width)))
+
+    table = np.zeros(len(records), dtype=dtype)
+    for f, t in dtype:
+        vals = [rec.get(f) for rec in records]
+        if t is np.int64:
+            table[f] = [missing_int if v is None else v for v in vals]
+        elif t is float:
+            table[f] = [np.nan if v is None else v for v in vals]
+        else:
+            table[f] = ['' if v is None else str(v) for v in vals]
+    return table
+
+def _record(row, names):
+    # Plain dictionary of a structured array row, leaving out missing values
+    rec = {}
+    for f in names:
+        val = row[f]
+        match row.dtype[f].kind:
+            case 'f':
+                if not np.isnan(val):
+                    rec[f] = float(val)
+            case 'i':
+                if val != missing_int:
+                    rec[f] = int(val)
+            case _:
+                if val != '':
+                    rec[f] = str(val)
+    return rec
+
+class _RecordMap(Mapping):
+    # Read-only dictionary view of a structured array, keyed by one field.
+    # Records are returned as plain dictionaries, matching the JSON layout
+    # (fields missing from a record are left out).
+
+    def __init__(self, table, key_field):
+        self.table = table
+        self.key_field = key_field
+        self.index = {str(n): i for i, n in enumerate(table[key_field])}
+        self._cache = {}
+
+    def __getitem__(self, key):
+        if key in self._cache:
+            return self._cache[key]
+        row = self.table[self.index[key]]
+        rec = _record(row, [f for f in self.table.dtype.names if f != self.key_field])
+        self._cache[key] = rec
+        return rec
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+class Catalog:
+    """Vessel and fender catalog, loaded lazily from JSON or from a compiled
+    (memory-mapped) folder."""
+
+    def __init__(self, vessel_path=vessel_file, fender_path=fender_file,
+                 compiled=None):
+        self.vessel_path = vessel_path
+        self.fender_path = fender_path
+        self.compiled = compiled
+        self._vessels = None
+        self._fenders = None
+        self._vessel_table = None
+        self._fender_table = None
+        self._curves = None
+        self._class_index = None
+        self._disp_order = None
+
+    @classmethod
+    def from_compiled(cls, path):
+        # Open a catalog folder written by Catalog.compile
+        return cls(compiled=path)
+
+    # Libraries, in the original JSON layout
+    @property
+    def vessels(self):
+        if self._vessels is None:
+            if self.compiled:
+                self._vessels = _RecordMap(self.vessel_table, 'Vessel')
+            else:
+                with ins.stage('catalog load'), open(self.vessel_path, 'r') as f:
+                    self._vessels = json.load(f)
+        return self._vessels
+
+    @property
+    def fenders(self):
+        if self._fenders is None:
+            if self.compiled:
+                lib = {}
+                names = self.fender_table.dtype.names[2:]
+                for row in self.fender_table:
+                    rec = _record(row, names)
+                    lib.setdefault(str(row['Group']), {})[str(row['Name'])] = rec
+                self._fenders = lib
+            else:
+                with ins.stage('catalog load'), open(self.fender_path, 'r') as f:
+                    self._fenders = json.load(f)
+        return self._fenders
+
+    @property
+    def curves(self):
+        # Tabulated fender curve points keyed by fender type
+        if self._curves is None:
+            if self.compiled:
+                path = os.path.join(self.compiled, 'curves.json')
+                curves = {}
+                if os.path.exists(path):
+                    with open(path, 'r') as f:
+                        curves = json.load(f)
+            else:
+                curves = self.fenders.get(curve_key, {})
+            self._curves = curves
+        return self._curves
+
+    # Structured array forms
+    @property
+    def vessel_table(self):
+        if self._vessel_table is None:
+            if self.compiled:
+                self._vessel_table = np.load(os.path.join(self.compiled, 'vessels.npy'),
+                                             mmap_mode='r')
+            else:
+                self._vessel_table = _table(
+                    [dict(rec, Vessel=name) for name, rec in self.vessels.items()],
+                    ('Vessel',))
+        return self._vessel_table
+
+    @property
+    def fender_table(self):
+        if self._fender_table is None:
+            if self.compiled:
+                self._fender_table = np.load(os.path.join(self.compiled, 'fenders.npy'),
+                                             mmap_mode='r')
+            else:
+                self._fender_table = _table(
+                    [dict(rec, Group=group, Name=name)
+                     for group, items in self.fenders.items()
+                     if group in fender_groups
+                     for name, rec in items.items()],
+                    ('Group', 'Name'))
+        return self._fender_table
+
+    # Indexes
+    def by_class(self, vessel_class):
+        # Vessels whose 'Vessel Class' matches
+        if self._class_index is None:
+            index = {}
+            table = self.vessel_table
+            for name, cls in zip(table['Vessel'], table['Vessel Class']):
+                index.setdefault(str(cls), []).append(str(name))
+            self._class_index = index
+        return list(self._class_index.get(vessel_class, []))
+
+    def by_displacement(self, low=0.0, high=np.inf):
+        # Vessels with low <= displacement <= high (LT), lightest first
+        table = self.vessel_table
+        if self._disp_order is None:
+            order = np.argsort(table['Displacement'], kind='stable')
+            self._disp_order = (order, np.asarray(table['Displacement'])[order])
+        order, disp = self._disp_order
+        i0 = np.searchsorted(disp, low, side='left')
+        i1 = np.searchsorted(disp, high, side='right')
+        return [str(n) for n in table['Vessel'][order[i0:i1]]]
+
+    def by_fender_type(self, fndr):
+        # Catalog fenders for a fender curve type (e.g. 'MV', 'pneumatic')
+        # as structured array rows
+        groups = [g for g, t in fender_groups.items() if t == fndr]
+        table = self.fender_table
+        return table[np.isin(table['Group'], groups)]
+
+    def compile(self, path):
+        # Write the catalog as memory-mappable .npy files to a folder
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'vessels.npy'), np.asarray(self.vessel_table))
+        np.save(os.path.join(path, 'fenders.npy'), np.asarray(self.fender_table))
+        with open(os.path.join(path, 'curves.json'), 'w') as f:
+            json.dump(self.curves, f)
+        return path
+
+_default = None
+
+def default_catalog():
+    # Return the shared catalog, creating it on first use
+    global _default
+    if _default is None:
+        compiled = os.environ.get('VESSELBERTHING_CATALOG')
+        _default = Catalog(compiled=compiled) if compiled else Catalog()
+    return _default
+
+def set_default_catalog(catalog):
+    # Replace the shared catalog (e.g. with a compiled fleet library)
+    global _default
+    _default = catalog
+    return catalog
@@ -0,0 +1,218 @@
+"""Command line runner for berthing projects.
+
+Each project is a declarative TOML or JSON file holding the dictionaries
+used by berthing_energy:
+
+    name = "11173-03"                       # optional, default file name
+    [vessels]   "T-AKE" = [5, false, ["Surface Berth 1", "Corner Protection"]]
+    [berths]    "Surface Berth 1" = [66.0, "Typical Pneumatic", "sheltered", 1.0]
+    [loadcases] "Op_LAT_FQp" = ["Forward Quarter Point", 1.0, 0.95, 99.49]
+    [fenders]   "Typical Pneumatic" = ["pneumatic", 1339.0, 678.0, 0.6]
+    [cp_e]      "T-AKE" = 164.5
+    [velocity]  "site sheltered" = [1.93, -0.25]    # optional, [a, b]
+    [output]    csv = "Berthing Energy.csv", charts = "png", dpi = 300
+
+The optional [velocity] table adds berthing conditions with the velocity
+curve vel = a * disp**b (e.g. VelocityCalibration.curves), for the run of
+that project only.
+
+Projects are run concurrently in a process pool. The vessel and fender
+catalog is compiled once and memory-mapped by every worker. Results go to
+<outdir>/<project name>/ and a summary of failures and timings is printed
+at the end; the exit code is 1 if any project failed.
+
+    vesselberthing wharf_w1.toml wharf_w3.json --outdir results --workers 4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from . import catalog as ct
+from .functions import berthvel as bv
+
+# Project file keys and the berthing_energy argument each one holds
+project_keys = {'vessels':      'vessels',
+                'berths':       'berths',
+                'loadcases':    'loadcases',
+                'fenders':      'fender_dict',
+                'cp_e':         'cp_e_dict'}
+
+default_output = {'csv': 'Berthing Energy.csv', 'charts': 'png', 'dpi': 300}
+
+def load_project(path):
+    """Read a TOML or JSON project file. Returns a dictionary with the
+    project 'name', the berthing_energy arguments, the added 'velocity'
+    curves and the 'output' options."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.toml':
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError as err:
+                raise ImportError('TOML project files require Python 3.11 '
+                                  'or the tomli package') from err
+        with open(path, 'rb') as f:
+            data = tomllib.load(f)
+    else:
+        with open(path, 'r') as f:
+            data = json.load(f)
+
+    missing = [k for k in project_keys if k not in data]
+    if missing:
+        raise ValueError(path + ' is missing ' + ', '.join(missing))
+    project = {arg: data[key] for key, arg in project_keys.items()}
+    project['name'] = str(data.get('name', os.path.splitext(os.path.basename(path))[0]))
+    project['output'] = dict(default_output, **data.get('output', {}))
+
+    velocity = data.get('velocity', {})
+    bad = [k for k, v in velocity.items()
+           if not isinstance(v, (list, tuple)) or len(v) != 2]
+    if bad:
+        raise ValueError(path + ' velocity curve(s) ' + ', '.join(bad)
+                         + ' must be [a, b]')
+    project['velocity'] = {k: (float(v[0]), float(v[1])) for k, v in velocity.items()}
+    return project
+
+def run_project(path, outdir, charts=True, cache=None):
+    """Run one project file into outdir/<project name>, reusing results and
+    charts from the cache folder if given. Returns a summary dictionary;
+    errors are caught and reported in it."""
+    from . import berthing_energy as mb
+    if cache is not None:
+        from .cache import ResultCache
+        cache = ResultCache(cache)
+
+    summary = {'path': path, 'name': None, 'ok': False, 'rows': 0,
+               'files': [], 'seconds': {}, 'error': None}
+    t0 = time.perf_counter()
+    try:
+        project = load_project(path)
+        summary['name'] = project['name']
+        out = project['output']
+        folder = os.path.join(outdir, project['name'])
+        os.makedirs(folder, exist_ok=True)
+
+        # The project's velocity curves are registered for its own run and
+        # removed again, so they do not leak into the next project of a
+        # worker
+        t = time.perf_counter()
+        saved = dict(bv.vel_coeff)
+        try:
+            bv.load_vel_coeff(project['velocity'])
+            results = mb.berthing_energy(project['vessels'], project['berths'],
+                                         project['loadcases'], project['fender_dict'],
+                                         project['cp_e_dict'], None, batch=True,
+                                         cache=cache)
+        finally:
+            bv.vel_coeff.clear()
+            bv.vel_coeff.update(saved)
+        summary['seconds']['energy'] = time.perf_counter() - t
+        summary['rows'] = sum(len(table) for table in results.values())
+
+        if out.get('csv'):
+            t = time.perf_counter()
+            path_csv = os.path.join(folder, out['csv'])
+            mb.print_fndr_csv(results, path_csv)
+            summary['files'].append(path_csv)
+            summary['seconds']['csv'] = time.perf_counter() - t
+
+        if charts and out.get('charts'):
+            t = time.perf_counter()
+            written = mb.plot_fndr_results(project['vessels'], project['fender_dict'],
+                                           results, outdir=folder, fmt=out['charts'],
+                                           dpi=out['dpi'], skip_unchanged=True,
+                                           cache=cache)
+            summary['files'].extend(written['written'])
+            summary['seconds']['charts'] = time.perf_counter() - t
+        if cache is not None:
+            summary['cache'] = cache.stats()
+        summary['ok'] = True
+    except Exception:
+        summary['error'] = traceback.format_exc()
+    summary['seconds']['total'] = time.perf_counter() - t0
+    return summary
+
+def _init_worker(catalog_path):
+    # Share the compiled catalog across the pool
+    if catalog_path:
+        ct.set_default_catalog(ct.Catalog.from_compiled(catalog_path))
+
+def _run(args):
+    return run_project(*args)
+
+def run_projects(paths, outdir='.', workers=None, charts=True, catalog=None,
+                 cache=None):
+    """Run project files in a process pool (workers=None for every CPU).
+    catalog is a compiled catalog folder (Catalog.compile); by default the
+    current catalog is compiled to a temporary folder for the run. Returns
+    the list of project summaries, in the order of paths. cache is an
+    optional result cache folder shared by the workers."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(paths)))
+    with tempfile.TemporaryDirectory() as tmp:
+        if catalog is None and workers > 1:
+            catalog = ct.default_catalog().compile(os.path.join(tmp, 'catalog'))
+        jobs = [(p, outdir, charts, cache) for p in paths]
+        if workers > 1:
+            with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                     initargs=(catalog,)) as pool:
+                return list(pool.map(_run, jobs))
+        _init_worker(catalog)
+        return [_run(job) for job in jobs]
+
+def print_summary(summaries, wall, file=None):
+    # Print one line per project and the failures (to stdout by default)
+    if file is None:
+        file = sys.stdout
+    print('{0:30s} {1:>6s} {2:>9s} {3:>9s} {4:>9s} {5:>9s}'.format(
+        'Project', 'Status', 'Rows', 'Energy', 'Charts', 'Total'), file=file)
+    for s in summaries:
+        sec = s['seconds']
+        print('{0:30s} {1:>6s} {2:9d} {3:9.2f} {4:9.2f} {5:9.2f}'.format(
+            (s['name'] or os.path.basename(s['path']))[:30],
+            'ok' if s['ok'] else 'FAILED', s['rows'], sec.get('energy', 0.0),
+            sec.get('charts', 0.0), sec.get('total', 0.0)), file=file)
+    failed = [s for s in summaries if not s['ok']]
+    print('{0} projects, {1} failed, {2:.2f} s'.format(len(summaries), len(failed), wall),
+          file=file)
+    for s in failed:
+        print('\n' + s['path'] + ':\n' + s['error'], file=file)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='vesselberthing',
+        description='Run berthing energy projects from TOML/JSON files.')
+    parser.add_argument('projects', nargs='+', help='project files (.toml or .json)')
+    parser.add_argument('-o', '--outdir', default='.',
+                        help='output folder; each project writes to a subfolder')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='worker processes (default: every CPU)')
+    parser.add_argument('--catalog', default=None,
+                        help='compiled catalog folder to use (Catalog.compile)')
+    parser.add_argument('--no-charts', action='store_true', help='skip the charts')
+    parser.add_argument('--cache', default=None,
+                        help='result and chart cache folder shared across runs')
+    parser.add_argument('--summary', default=None,
+                        help='also write the run summary to this JSON file')
+    args = parser.parse_args(argv)
+
+    t = time.perf_counter()
+    summaries = run_projects(args.projects, args.outdir, args.workers,
+                             not args.no_charts, args.catalog, args.cache)
+    wall = time.perf_counter() - t
+    print_summary(summaries, wall)
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump({'seconds': wall, 'projects': summaries}, f, indent=2)
+    return 0 if all(s['ok'] for s in summaries) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
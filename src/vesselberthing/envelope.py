@@ -0,0 +1,149 @@
+"""This module reduces berthing results to their governing cases. An Envelope
+keeps, for every fender group, the k largest rows of each metric (Energy,
+Reaction, Deflection by default) as cases are evaluated, so the full result
+table is never held in memory: storage is fenders x metrics x k rows
+however many cases are run. Envelopes built from separate parts of a
+project (e.g. in worker processes) are combined with merge().
+
+    env = berthing_envelope(vessels, berths, loadcases, fender_dict,
+                            cp_e_dict, k=3)
+    env.governing()['Typical Pneumatic']['Reaction']['Vessel']
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import berthing_batch
+from . import catalog as ct
+from . import results as rs
+
+metrics = ('Energy', 'Reaction', 'Deflection')
+
+def _top(table, metric, k):
+    # The k rows of a table with the largest metric, largest first. Ties
+    # keep table order, also at the k-th row, so the envelope does not
+    # depend on how the rows were chunked; NaN values rank last.
+    vals = np.nan_to_num(table[metric].astype(float), nan=-np.inf)
+    return table[np.lexsort((np.arange(len(vals)), -vals))[:k]]
+
+class Envelope:
+    """Running top-k envelope of berthing results per fender group."""
+
+    def __init__(self, k=1, metrics=metrics):
+        if k < 1:
+            raise ValueError('Envelope size k must be at least 1')
+        self.k = k
+        self.metrics = tuple(metrics)
+        self.tables = {}        # fender -> metric -> ResultTable (<= k rows)
+        self.cases = {}         # fender -> number of cases reduced
+
+    def update(self, results):
+        """Fold a results dictionary (berthing_energy output or one chunk of
+        iter_berthing_energy) into the envelope. Returns self."""
+        for fender, table in results.items():
+            env = self.tables.setdefault(fender, {})
+            self.cases[fender] = self.cases.get(fender, 0) + len(table)
+            for m in self.metrics:
+                top = _top(table, m, self.k)
+                if m in env:
+                    top = _top(rs.concat([env[m], top]), m, self.k)
+                env[m] = top
+        return self
+
+    def merge(self, other):
+        """Combine another envelope (e.g. from a worker) into this one. On
+        equal values the rows already held here rank first. Returns self."""
+        if other.k != self.k or other.metrics != self.metrics:
+            raise ValueError('Cannot merge envelopes with different k or metrics')
+        for fender, env in other.tables.items():
+            mine = self.tables.setdefault(fender, {})
+            self.cases[fender] = self.cases.get(fender, 0) + other.cases[fender]
+            for m, table in env.items():
+                if m in mine:
+                    table = _top(rs.concat([mine[m], table]), m, self.k)
+                mine[m] = table
+        return self
+
+    def __getitem__(self, fender):
+        # Dictionary of ResultTables (largest first) by metric
+        return self.tables[fender]
+
+    def governing(self):
+        """Return the governing case of every fender group and metric as
+        {fender: {metric: {'value', 'Vessel', 'Load Case',
+        'Berthing Configuration', 'Acc. Factor'}}}."""
+        gov = {}
+        for fender, env in self.tables.items():
+            gov[fender] = {}
+            for m, table in env.items():
+                if len(table) == 0:
+                    gov[fender][m] = None
+                    continue
+                row = table.data[0]
+                gov[fender][m] = {'value': float(row[m]),
+                                  'Vessel': row['Vessel'],
+                                  'Load Case': row['Load Case'],
+                                  'Berthing Configuration': row['Berthing Configuration'],
+                                  'Acc. Factor': float(row['Acc. Factor'])}
+        return gov
+
+    def results(self):
+        # Governing rows as a berthing_energy style dictionary: for each
+        # fender, the distinct envelope rows in metric order
+        res = {}
+        for fender, env in self.tables.items():
+            table = rs.concat(env.values())
+            seen = set()
+            keep = []
+            for i, row in enumerate(table.rows()):
+                if row not in seen:
+                    seen.add(row)
+                    keep.append(i)
+            res[fender] = table[np.array(keep, dtype=int)]
+        return res
+
+def _envelope_part(args):
+    # Envelope of one group of vessels, for the process pool
+    (vessels, berths, loadcases, fender_dict, cp_e_dict, vessel_library,
+     k, metrics, chunk_size) = args
+    env = Envelope(k, metrics)
+    for chunk in berthing_batch.iter_berthing_energy_batch(
+            vessels, berths, loadcases, fender_dict, cp_e_dict,
+            vessel_library, chunk_size):
+        env.update(chunk)
+    return env
+
+def berthing_envelope(vessels, berths, loadcases, fender_dict, cp_e_dict,
+                      k=1, metrics=metrics, vessel_library=None,
+                      chunk_size=100000, workers=1):
+    """Evaluate every case of a project and keep only the top-k envelope of
+    each metric per fender group (see Envelope). Cases are evaluated in
+    blocks of about chunk_size rows; with workers > 1 (None for every CPU)
+    the vessels are split across a process pool and the partial envelopes
+    merged in vessel order."""
+    if vessel_library is None:
+        vessel_library = ct.default_catalog().vessels
+    env = Envelope(k, metrics)
+    for fender in fender_dict:
+        env.tables[fender] = {m: rs.ResultTable() for m in env.metrics}
+        env.cases[fender] = 0
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(vessels)))
+    names = list(vessels)
+    groups = [names[i * len(names) // workers:(i + 1) * len(names) // workers]
+              for i in range(workers)]
+    args = [({v: vessels[v] for v in g}, berths, loadcases, fender_dict,
+             cp_e_dict, {v: vessel_library[v] for v in g}, k, metrics,
+             chunk_size) for g in groups]
+
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            parts = list(pool.map(_envelope_part, args))
+    else:
+        parts = [_envelope_part(a) for a in args]
+    for part in parts:
+        env.merge(part)
+    return env
@@ -0,0 +1,243 @@
+"""This module shares the broadside berthing energy between the fenders of
+a fender line. The standard calculation divides the broadside energy
+evenly over the number of fenders given for the vessel. Here the hull is a
+rigid line approaching the fender line at a yaw angle: fender j is
+compressed once the hull has moved past its initial gap g_j, and the hull
+advance u at which the fenders together absorb the berthing energy is
+solved for every case at once,
+
+    sum_j E_j(u - g_j) = Efndr x nfndr
+
+with each fender's nonlinear stiffness taken from its energy curve. The
+gaps come from the fender spacing, the yaw and the hull shape, a parallel
+middle body that curves in to the bow and stern.
+
+Fender lines are given per berth:
+
+    lines = {'Surface Berth 1': [60.0, 2.0],        # spacing (ft), yaw (deg)
+             'Surface Berth 2': [45.0, 0.0, 0.6]}   # + parallel body / L
+
+    results = berthing_energy(vessels, berths, loadcases, fender_dict,
+                              cp_e_dict, None, lines=lines)
+
+Broadside rows of berths with a fender line report the most loaded fender
+(Energy, Deflection) and the largest fender reaction, with 'Fenders in
+Contact' and 'Line Reaction' (sum of the fender reactions) columns added.
+They use the vessel's number of fenders centred on the CoG. With no yaw
+and the fenders on the parallel body the energy is shared evenly, as in
+the standard calculation.
+
+Quarter point and Corner Protection rows, and berths without a line, keep
+the single fender model: an eccentric impact is a point contact, and its
+rotation is already accounted for by the eccentricity coefficient Ce.
+Sharing it along the line would reduce the energy a second time.
+"""
+import numpy as np
+
+from . import berthing_batch
+from . import catalog as ct
+from . import impact
+from . import instrument as ins
+from .functions import fndr_curves as fc
+
+parallel_body = 0.5     # Default parallel middle body length / L
+
+def hull_offset(x, L, B, parallel=parallel_body):
+    # Offset of the hull side from the parallel middle body, curving in
+    # parabolically to half the beam at the bow and stern
+    # Definitions:
+    #   x       = Station along the hull, from the same end as the CoG (ft)
+    #   L, B    = Vessel length and beam (ft)
+    #   parallel= Parallel middle body length / L
+    #   result  = Offset (ft)
+    half = np.maximum((1 - parallel) * L / 2, 1e-12)
+    d = np.maximum(np.abs(x - L / 2) - parallel * L / 2, 0.0)
+    return B / 2 * (d / half)**2
+
+def line_gaps(grid, lines, rows):
+    # Initial gap between the hull and every fender of the line for the
+    # selected broadside rows of a case grid. Fenders beyond the hull have
+    # an infinite gap; the first fender touched has a zero gap.
+    # Definitions:
+    #   grid    = Evaluated case grid (berthing_batch)
+    #   lines   = Fender lines by berth, [spacing (ft), yaw (deg),
+    #             parallel body / L (optional)]
+    #   rows    = Indices of the broadside grid rows to lay out
+    #   result  = Array of gaps (ft), shape (rows, fenders)
+    berth = grid['berth'][rows]
+    line = [list(lines[b]) + [parallel_body] * (3 - len(lines[b])) for b in berth]
+    s, yaw, parallel = np.array(line, dtype=float).reshape(-1, 3).T
+    L, B, CG = grid['L'][rows], grid['B'][rows], grid['CG'][rows]
+
+    # The vessel's fenders, centred on the CoG
+    n = grid['nfndr'][rows].astype(int)
+    j = np.arange(n.max(initial=1))[None, :]
+    x = CG[:, None] + (j - (n[:, None] - 1) / 2) * s[:, None]
+    on_hull = (j < n[:, None]) & (x >= 0) & (x <= L[:, None])
+
+    # The hull end nearer the CoG leads by the yaw angle
+    lead = np.where((CG <= L / 2)[:, None], x, L[:, None] - x)
+    gaps = (hull_offset(x, L[:, None], B[:, None], parallel[:, None])
+            + lead * np.tan(np.radians(yaw))[:, None])
+    gaps = np.where(on_hull, gaps, np.inf)
+    return gaps - gaps.min(axis=1, keepdims=True)
+
+def share_energy(fndr, E_total, gaps, E_rated, R_rated, height, tol=1e-12,
+                 max_iter=100):
+    """Solve the energy sharing of many fender lines of one fender type.
+
+    Definitions:
+        fndr    = Fender Type (str)
+        E_total = Energy absorbed by each line (kip-ft)
+        gaps    = Initial hull gap of each fender (ft), shape (cases,
+                  fenders), inf where there is no fender
+        E_rated, R_rated = Fender ratings (kip-ft, kip)
+        height  = Fender height (ft)
+
+    Returns a dictionary of 'Deflection' (normalized), 'Energy' (kip-ft)
+    and 'Reaction' (kip) arrays of shape (cases, fenders), zero for the
+    fenders not reached, and the hull advance 'u' (ft) of each case.
+    Raises ValueError if a case has not converged after max_iter
+    iterations."""
+    E_total = np.asarray(E_total, dtype=float)
+    E_r = np.broadcast_to(np.asarray(E_rated, dtype=float), E_total.shape)[:, None]
+    R_r = np.broadcast_to(np.asarray(R_rated, dtype=float), E_total.shape)[:, None]
+    H = np.broadcast_to(np.asarray(height, dtype=float), E_total.shape)[:, None]
+
+    E_curve, R_curve = fc.Fenders[fndr]
+    dE_curve = E_curve.deriv()
+    D0 = fc.fender_deflection(0.0, fndr)
+    D_tab, E_tab = fc.curve_inverse(fndr)
+
+    def state(u):
+        # Fender deflections, energies and the line energy and its slope
+        # (the total fender force) at hull advance u
+        contact = u[:, None] > gaps
+        D = D0 + np.maximum(u[:, None] - gaps, 0.0) / H
+        E = np.where(contact, E_r * E_curve(D), 0.0)
+        F = np.where(contact, E_r * dE_curve(D) / H, 0.0)
+        return D, E, E.sum(axis=1) - E_total, F.sum(axis=1)
+
+    # The first fender alone bounds the advance from above; the line is
+    # overloaded if even that advance, at the end of the curve, falls short
+    hi = (fc.fender_deflection(E_total / E_r[:, 0], fndr, clip=True) - D0) * H[:, 0]
+    f_hi = state(hi)[2]
+    over = f_hi < -tol * np.maximum(E_total, 1.0)
+    if np.any(over):
+        raise ValueError('Berthing energy of {0:.3f} x rated energy exceeds the '
+                         '{1} fender line (every fender at {2:.1%} deflection)'
+                         .format((E_total / E_r[:, 0])[over].max(), fndr, D_tab[-1]))
+    lo = np.zeros_like(hi)
+    u = hi.copy()
+
+    # Newton on the advance, falling back to bisection when a step leaves
+    # the bracket (the line stiffens abruptly as each fender is reached)
+    for i in range(max_iter):
+        D, E, f, F = state(u)
+        done = np.abs(f) <= tol * np.maximum(E_total, 1.0)
+        if np.all(done):
+            break
+        lo = np.where(f < 0, u, lo)
+        hi = np.where(f > 0, u, hi)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = u - f / F
+        bad = ~((step > lo) & (step < hi))
+        u = np.where(done, u, np.where(bad, (lo + hi) / 2, step))
+    else:
+        D, E, f, F = state(u)
+        done = np.abs(f) <= tol * np.maximum(E_total, 1.0)
+        if not np.all(done):
+            raise ValueError('The {0} fender line energy sharing did not converge '
+                             'in {1} iterations for {2} case(s) (largest residual '
+                             '{3:.3g} kip-ft)'.format(fndr, max_iter,
+                                                       int(np.count_nonzero(~done)),
+                                                       np.abs(f[~done]).max()))
+
+    if ins.enabled:
+        ins.count('line solves', E_total.size)
+        ins.count('line iterations', i + 1)
+    R = np.where(E > 0, R_r * R_curve(D), 0.0)
+    return {'Deflection': np.where(E > 0, D, 0.0), 'Energy': E, 'Reaction': R, 'u': u}
+
+def evaluate_lines(grid, lines, height=None):
+    # Evaluate a case grid like berthing_batch.evaluate_cases, sharing the
+    # energy of broadside rows at berths with a fender line. Adds the
+    # 'contact' and 'line_reaction' columns and returns the grid.
+    # Definitions:
+    #   grid    = Case grid from berthing_batch.case_grid
+    #   lines   = Fender lines by berth (see module docstring)
+    #   height  = Optional fender heights (ft) by fender name, else from
+    #             the ratings (impact.fender_height)
+    height = height or {}
+    with ins.stage('coefficients'):
+        grid.update(berthing_batch.case_energy(grid))
+    Efndr = grid['Efndr'].copy()
+    n = len(Efndr)
+    Deflection = np.empty(n)
+    Reaction = np.empty(n)
+    contact = np.ones(n)
+    line_reaction = np.empty(n)
+
+    # Broadside rows share the energy; eccentric impacts are point contacts
+    in_line = (np.array([b in lines for b in grid['berth']], dtype=bool)
+               & (grid['config'] == 'Broadside'))
+    with ins.stage('fender solve'):
+        for fndr in set(grid['fender_type']):
+            sel = grid['fender_type'] == fndr
+            single = np.nonzero(sel & ~in_line)[0]
+            if len(single):
+                Rfndr = fc.fender_reaction_arr(Efndr[single], grid['E_rating'][single],
+                                               grid['R_rating'][single], fndr)
+                Deflection[single] = Rfndr[0]
+                Reaction[single] = Rfndr[1]
+                line_reaction[single] = Rfndr[1]
+
+            rows = np.nonzero(sel & in_line)[0]
+            if len(rows) == 0:
+                continue
+            E_r = grid['E_rating'][rows]
+            R_r = grid['R_rating'][rows]
+            H = np.empty(len(rows))
+            named = np.array([k in height for k in grid['loc_fndr_key'][rows]], dtype=bool)
+            H[named] = [float(height[k]) for k in grid['loc_fndr_key'][rows][named]]
+            if not named.all():
+                ratings, inv = np.unique(np.stack([E_r, R_r, grid['D_rating'][rows]])[:, ~named],
+                                         axis=1, return_inverse=True)
+                H[~named] = np.array([impact.fender_height(fndr, *r)
+                                      for r in ratings.T])[inv.ravel()]
+
+            with ins.stage('line contact'):
+                gaps = line_gaps(grid, lines, rows)
+                res = share_energy(fndr, Efndr[rows] * grid['nfndr'][rows], gaps,
+                                   E_r, R_r, H)
+            gov = np.argmax(res['Energy'], axis=1)
+            pick = np.arange(len(rows))
+            Efndr[rows] = res['Energy'][pick, gov]
+            Deflection[rows] = res['Deflection'][pick, gov]
+            Reaction[rows] = res['Reaction'].max(axis=1)
+            contact[rows] = np.count_nonzero(res['Energy'] > 0, axis=1)
+            line_reaction[rows] = res['Reaction'].sum(axis=1)
+
+    grid.update({'Efndr': Efndr, 'Deflection': Deflection, 'Reaction': Reaction,
+                 'contact': contact, 'line_reaction': line_reaction})
+    ins.count('cases', n)
+    return grid
+
+def berthing_energy_lines(vessels, berths, loadcases, fender_dict, cp_e_dict,
+                          lines, vessel_library=None, height=None):
+    """berthing_energy with the broadside energy of berths in lines shared
+    along the fender line. Returns the same dictionary of ResultTables keyed by
+    fender, with 'Fenders in Contact' and 'Line Reaction' columns."""
+    if vessel_library is None:
+        vessel_library = ct.default_catalog().vessels
+    grid = evaluate_lines(berthing_batch.case_grid(vessels, berths, loadcases,
+                                                   fender_dict, cp_e_dict,
+                                                   vessel_library),
+                          lines, height)
+    table = berthing_batch.result_table(grid).with_fields(
+        **{'Fenders in Contact': grid['contact'],
+           'Line Reaction': grid['line_reaction']})
+    results = {}
+    for i in fender_dict.keys():
+        results[i] = table[grid['loc_fndr_key'] == i]
+    return results
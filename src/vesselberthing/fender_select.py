@@ -0,0 +1,127 @@
+"""This module selects fender sizes from a catalog of candidates. The fender
+energies of every vessel, berth and load case are computed once, since they
+do not depend on the fender rating, and each candidate is then checked
+against those demands as array operations. Candidates that are dominated
+(no cheaper, no more energy capacity and no lower rated reaction than
+another candidate) are pruned before the check.
+"""
+import numpy as np
+
+from . import berthing_batch
+from . import catalog as ct
+from .functions import fndr_curves as fc
+
+def fender_demands(vessels, berths, loadcases, fender_dict, cp_e_dict,
+                   vessel_library=None):
+    # Fender energy of every case, grouped by fender name. Only the fender
+    # type in fender_dict matters here (for the Corner Protection / MV
+    # rule); the ratings are not used.
+    if vessel_library is None:
+        vessel_library = ct.default_catalog().vessels
+    grid = berthing_batch.case_grid(vessels, berths, loadcases, fender_dict,
+                                    cp_e_dict, vessel_library)
+    Efndr = berthing_batch.case_energy(grid)['Efndr']
+    return {g: Efndr[grid['loc_fndr_key'] == g] for g in fender_dict}
+
+def _candidate_arrays(candidates, cost):
+    # Names, ratings and cost of the candidates as arrays. Candidates are
+    # structured array rows (e.g. Catalog.by_fender_type) or dictionaries
+    # with 'Name', 'E_rated', 'R_rated' and 'D_rated' entries.
+    if isinstance(candidates, np.ndarray):
+        records = [{f: candidates[f][i] for f in candidates.dtype.names}
+                   for i in range(len(candidates))]
+    else:
+        records = list(candidates)
+    names = np.array([str(r['Name']) for r in records], dtype=object)
+    E = np.array([r['E_rated'] for r in records], dtype=float)
+    R = np.array([r['R_rated'] for r in records], dtype=float)
+    D = np.array([r['D_rated'] for r in records], dtype=float)
+    if callable(cost):
+        c = np.array([cost(r) for r in records], dtype=float)
+    else:
+        c = np.array([r[cost] for r in records], dtype=float)
+    return names, E, R, D, c
+
+def pareto(E, R, c):
+    # Mask of candidates not dominated by another candidate with lower or
+    # equal cost, higher or equal energy and lower or equal reaction
+    # rating (better in at least one).
+    ge = ((c[:, None] <= c[None, :]) & (E[:, None] >= E[None, :])
+          & (R[:, None] <= R[None, :]))
+    gt = ((c[:, None] < c[None, :]) | (E[:, None] > E[None, :])
+          | (R[:, None] < R[None, :]))
+    dominated = np.any(ge & gt, axis=0)
+    return ~dominated
+
+def select_fenders(vessels, berths, loadcases, fender_dict, cp_e_dict,
+                   candidates=None, cost='E_rated', R_allow=None,
+                   groups=None, vessel_library=None):
+    """Select the lowest cost catalog fender for each fender group.
+
+    A candidate is adequate when its rated energy covers the largest
+    fender energy of the group and, if R_allow is given (scalar or dict by
+    group), the reaction at every demand stays within it. Candidates are
+    taken from the catalog for the group's fender type unless given
+    (list, or dict by group). cost is a candidate field name or a function
+    of the candidate record; the default selects the smallest rated
+    energy.
+
+    Returns a dictionary by group with the selected 'Name', ratings,
+    'cost', governing 'Energy', 'Reaction' and 'Deflection', and the
+    number of candidates checked, or None if no candidate is adequate."""
+    demands = fender_demands(vessels, berths, loadcases, fender_dict,
+                             cp_e_dict, vessel_library)
+    if groups is None:
+        groups = list(fender_dict)
+
+    selection = {}
+    for g in groups:
+        fndr = fender_dict[g][0]
+        if isinstance(candidates, dict):
+            cand = candidates[g]
+        elif candidates is not None:
+            cand = candidates
+        else:
+            cand = ct.default_catalog().by_fender_type(fndr)
+        names, E, R, D, c = _candidate_arrays(cand, cost)
+
+        Efndr = np.unique(demands[g])
+        if len(Efndr) == 0 or len(names) == 0:
+            selection[g] = None
+            continue
+        E_max = Efndr[-1]
+        limit = R_allow.get(g) if isinstance(R_allow, dict) else R_allow
+
+        # Prune dominated candidates, then check the rest cheapest first
+        keep = np.nonzero(pareto(E, R, c) & (E >= E_max))[0]
+        keep = keep[np.argsort(c[keep], kind='stable')]
+
+        # Deflection and reaction for every demand and candidate at once
+        E_n = Efndr[:, None] / E[keep][None, :]
+        Defl = fc.fender_deflection(E_n, fndr, clip=True)
+        React = fc.Fenders[fndr][1](Defl) * R[keep][None, :]
+        R_max = React.max(axis=0)
+        ok = np.ones(len(keep), dtype=bool) if limit is None else R_max <= limit
+
+        if not ok.any():
+            selection[g] = None
+            continue
+        i = np.argmax(ok)
+        k = keep[i]
+        selection[g] = {'Name': names[k], 'Fender Type': fndr,
+                        'E_rated': float(E[k]), 'R_rated': float(R[k]),
+                        'D_rated': float(D[k]), 'cost': float(c[k]),
+                        'Energy': float(E_max), 'Reaction': float(R_max[i]),
+                        'Deflection': float(Defl[-1, i]),
+                        'candidates': len(names), 'checked': len(keep)}
+    return selection
+
+def selected_fender_dict(fender_dict, selection):
+    # Return a copy of fender_dict with the selected ratings substituted,
+    # ready to pass to berthing_energy
+    new = dict(fender_dict)
+    for g, sel in selection.items():
+        if sel is not None:
+            new[g] = [fender_dict[g][0], sel['E_rated'], sel['R_rated'],
+                      sel['D_rated']]
+    return new
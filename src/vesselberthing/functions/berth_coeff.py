@@ -1,3 +1,5 @@
+import numpy as np
+
 def Cbl(M, L, B, D, rho=64):
     # Determine block coefficient for vessel
     # per UFC 4-152-01 §5-2.1.1
@@ -41,10 +43,8 @@ def Cm(L, B, D, Cb, Wdepth, subflg = False):
     if subflg:
         result = 2.36 + 1.74 * (D/Wdepth)**3.5
     else:
-        if Cb < 0.6:
-            F = 1.5 * Cb
-        else:
-            F = 0.9
+        # F = 1.5 x Cb, limited to 0.9 for Cb >= 0.6
+        F = np.minimum(1.5 * Cb, 0.9)
 
         Cm0 = 1.3 + 1.5 * (D/B)
         Cm1 = F * (12.4 * (D/B)**0.3 - 50*(D/L))
@@ -3,18 +3,28 @@
 # The Equations below represent a power curve fit of the charts
 # provided in UFC 4-152-01
 
+# Power curve coefficients for each berthing condition:
+#   vel = a * disp**b
+#           Condition       a           b
+vel_coeff = {"sheltered":  (4.1172,    -0.289),
+             "moderate":   (8.9392,    -0.302),
+             "exposed":    (10.9182,   -0.2802)}
+
 def velocity(disp, cond):
     # Determine berthing velocity:
     # Definition:
-    #   disp    = Vessel displacement (LT)
+    #   disp    = Vessel displacement (LT), scalar or array
     #   cond    = Berthing condition
     #       sheltered, moderate, or exposed
 
-    match cond:
-        case "sheltered":
-            vel = 4.1172 * disp**(-0.289)
-        case "moderate":
-            vel = 8.9392 * disp**(-0.302)
-        case "exposed":
-            vel = 10.9182 * disp**(-0.2802)
+    a, b = vel_coeff[cond]
+    vel = a * disp**b
     return vel
+
+def load_vel_coeff(coeffs):
+    # Register power curve coefficients for additional berthing
+    # conditions, e.g. curves calibrated to site records
+    # Definition:
+    #   coeffs  = Dictionary of (a, b) keyed by berthing condition
+    for cond, (a, b) in coeffs.items():
+        vel_coeff[cond] = (float(a), float(b))
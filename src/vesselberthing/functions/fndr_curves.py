@@ -3,7 +3,12 @@
     as much as ± 10% from the actual fender performance.
 """
 
+from bisect import bisect_left
+
 import numpy as np
+
+from .. import instrument as ins
+from . import fndr_tables as ft
 # Pneumatic Fender Curve
     # The performance curves described below are generalized curves
     # for pneumatic rubber fenders with an internal pressure of 50kPa.
@@ -32,18 +37,166 @@ MV_R = np.polynomial.Polynomial([0,6.5991,-5.4105,-32.671,47.616])
 
 # Unit Leg Fender Curve
     # The performance curve described below is taken from the Trelleborg
-    # Fender Design Manual for the Unit Leg Fender
+    # Fender Design Manual for the Unit Leg Fender. Rows are normalized
+    # deflection, energy and reaction; the reaction buckles (dips) between
+    # 30% and 50% deflection, so the table is used as a tabular curve.
 Unit_Element_curve = [[0.000, 0.050, 0.100, 0.150, 0.200, 0.250, 0.300, 0.350, 0.400, 0.450, 0.500, 0.550, 0.575, 0.625],
                      [0.000, 0.010, 0.050, 0.120, 0.210, 0.320, 0.430, 0.540, 0.650, 0.750, 0.840, 0.950, 1.000, 1.130],
                      [0.000, 0.230, 0.470, 0.690, 0.870, 0.970, 1.000, 0.970, 0.900, 0.850, 0.840, 0.920, 1.000, 1.210]]
 
+class _CurveRegistry(dict):
+    # Dictionary of fender curves. A name that is not registered here is
+    # looked up once in the 'Curves' of the default catalog (fenders.json).
+
+    def __missing__(self, fndr):
+        if not getattr(self, '_catalog_loaded', False):
+            self._catalog_loaded = True
+            from .. import catalog as ct
+            for name, points in ct.default_catalog().curves.items():
+                self.setdefault(name, ft.curve_pair(points))
+            if fndr in self:
+                return self[fndr]
+        raise KeyError(fndr)
+
 # Define Dictionary of all fender Curves:
-Fenders = {"pneumatic"      :[pneumatic_E, pneumatic_R],
+Fenders = _CurveRegistry({"pneumatic"      :[pneumatic_E, pneumatic_R],
             "hydropneumatic"  :[hydropneumatic_E, hydropneumatic_R],
             "MV"              :[MV_E, MV_R],
-            "unit fender"     :Unit_Element_curve}
+            "unit fender"     :ft.curve_pair(Unit_Element_curve)})
+
+def load_curves(curves):
+    # Register tabulated fender curves, e.g. manufacturer tables
+    # Definitions:
+    #   curves  = Dictionary keyed by fender type of point tables, as
+    #             [deflection, energy, reaction] lists or dictionaries with
+    #             'Deflection', 'Energy' and 'Reaction' lists (normalized)
+    for name, points in curves.items():
+        Fenders[name] = ft.curve_pair(points)
+
+# Inverse Energy Curves
+    # Each energy curve is inverted once over its rising branch, from the
+    # point where the curve crosses zero energy up to the deflection limit
+    # below (or the end of a tabulated curve), and stored as a dense table. Demands are located in the table
+    # and polished with a few Newton steps on the curve itself, so the
+    # result matches a direct root solve to machine precision.
+D_limit = 1.0       # Maximum normalized deflection of the fender curves
+n_table = 4097      # Number of points in each inverse table
+_inverse_cache = {}
+
+def curve_inverse(fndr):
+    # Return the cached inverse table (deflection, energy) of a fender
+    # type, building it on first use or when the curve has been replaced.
+    # Definitions:
+    #   fndr    = Fender Type (str)
+    #   result  = [D_tab, E_tab], normalized deflection and energy with
+    #             E_tab strictly increasing
+
+    E_curve = Fenders[fndr][0]
+    cached = _inverse_cache.get(fndr)
+    if cached is not None and cached[0] is E_curve:
+        return cached[1]
+
+    with ins.stage('curve inverse'):
+        D_tab = np.linspace(0, min(getattr(E_curve, 'x_max', D_limit), D_limit), n_table)
+        E_tab = E_curve(D_tab)
+
+    # Start the table at the last point at or below zero energy
+    start = np.nonzero(E_tab <= 0)[0]
+    start = start[-1] if len(start) else 0
+    D_tab = D_tab[start:]
+    E_tab = E_tab[start:]
+    if np.any(np.diff(E_tab) <= 0):
+        raise ValueError('The ' + fndr + ' energy curve is not monotone '
+                         'between zero energy and D_limit')
+
+    table = [D_tab, E_tab]
+    _inverse_cache[fndr] = (E_curve, table)
+    return table
+
+def fender_deflection(E_n, fndr, clip=False, tol=1e-14, max_iter=8):
+    # Determine the normalized deflection for normalized energy demands
+    # Definitions:
+    #   E_n     = Normalized Energy Demand(s) (x / E)
+    #   fndr    = Fender Type (str)
+    #   clip    = Limit demands above the curve to D_limit instead of
+    #             raising an error
+    #   result  = Normalized Deflection(s), same shape as E_n
+
+    E_n = np.asarray(E_n, dtype=float)
+    D_tab, E_tab = curve_inverse(fndr)
+
+    if np.any(E_n < 0):
+        raise ValueError('Negative berthing energy demand on ' + fndr
+                         + ' fender')
+    over = E_n > E_tab[-1]
+    if clip:
+        E_n = np.minimum(E_n, E_tab[-1])
+    elif np.any(over):
+        raise ValueError('Berthing energy demand of {0:.3f} x rated energy '
+                         'exceeds the {1} fender curve (maximum {2:.3f} x '
+                         'rated energy at {3:.1%} deflection)'
+                         .format(E_n[over].max(), fndr, E_tab[-1], D_tab[-1]))
 
-def fender_reaction(x,E,R,fndr):
+    # Bracket each demand in the table and interpolate a first estimate
+    ind = np.clip(np.searchsorted(E_tab, E_n), 1, len(E_tab) - 1)
+    D_lo = D_tab[ind - 1]
+    D_hi = D_tab[ind]
+    E_lo = E_tab[ind - 1]
+    Deflection_N = D_lo + (E_n - E_lo) * (D_hi - D_lo) / (E_tab[ind] - E_lo)
+
+    # Newton refinement, kept within the bracketing table segment. Each
+    # demand stops at its own convergence so its result does not depend on
+    # the other demands solved alongside it
+    E_curve = Fenders[fndr][0]
+    dE_curve = E_curve.deriv()
+    done = np.zeros(E_n.shape, dtype=bool)
+    for i in range(max_iter):
+        slope = dE_curve(Deflection_N)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = np.where(slope != 0, (E_curve(Deflection_N) - E_n) / slope, 0.0)
+        step = np.where(done, 0.0, step)
+        Deflection_N = np.clip(Deflection_N - step, D_lo, D_hi)
+        done |= np.abs(step) <= tol
+        if np.all(done):
+            break
+
+    if ins.enabled:
+        ins.count('deflection solves', E_n.size)
+        ins.count('newton iterations', i + 1)
+        ins.count('demands over curve', int(np.count_nonzero(over)))
+    return Deflection_N
+
+def _scalar_curve(curve):
+    # Float evaluator of a fender curve: Horner's rule on the coefficients
+    # of a polynomial, otherwise the curve itself
+    if hasattr(curve, 'coef'):
+        coef = [float(c) for c in curve.coef[::-1]]
+
+        def f(d):
+            y = 0.0
+            for c in coef:
+                y = y * d + c
+            return y
+        return f
+    return lambda d: float(curve(d))
+
+_scalar_cache = {}
+
+def scalar_inverse(fndr):
+    # Return the inverse table of a fender type as Python lists, with float
+    # evaluators of the energy curve, its slope and the reaction curve, for
+    # single demands (see fender_reaction)
+    E_curve, R_curve = Fenders[fndr]
+    cached = _scalar_cache.get(fndr)
+    if cached is not None and cached[0] is E_curve and cached[1] is R_curve:
+        return cached[2]
+    D_tab, E_tab = curve_inverse(fndr)
+    table = (D_tab.tolist(), E_tab.tolist(), _scalar_curve(E_curve),
+             _scalar_curve(E_curve.deriv()), _scalar_curve(R_curve))
+    _scalar_cache[fndr] = (E_curve, R_curve, table)
+    return table
+
+def fender_reaction(x,E,R,fndr,tol=1e-14,max_iter=8):
 
     #     
     # Definitions:
@@ -53,24 +206,56 @@ def fender_reaction(x,E,R,fndr):
     #   fndr= Fender Type (str)
     #       "pneumatic" = pneumatic fender curve
     #       "MV"        = MV Fender Curve
-    #       "unit"   = Unit Element Curve
+    #       "unit fender" = Unit Element Curve
 
-    curve = Fenders[fndr]
-    
-    # Normalize Input Energy
+    if not all(isinstance(v, (int, float)) for v in (x, E, R)):
+        Deflection_N, Reaction = fender_reaction_arr(x,E,R,fndr)
+        return [float(Deflection_N), float(Reaction)]
+
+    # Single demand: bisect the inverse table and polish with Newton steps
+    # on floats, as fender_deflection does for arrays
+    D_tab, E_tab, E_curve, dE_curve, R_curve = scalar_inverse(fndr)
     E_n = x/E
+    if E_n < 0:
+        raise ValueError('Negative berthing energy demand on ' + fndr
+                         + ' fender')
+    if E_n > E_tab[-1]:
+        raise ValueError('Berthing energy demand of {0:.3f} x rated energy '
+                         'exceeds the {1} fender curve (maximum {2:.3f} x '
+                         'rated energy at {3:.1%} deflection)'
+                         .format(E_n, fndr, E_tab[-1], D_tab[-1]))
+
+    ind = min(max(bisect_left(E_tab, E_n), 1), len(E_tab) - 1)
+    D_lo = D_tab[ind - 1]
+    D_hi = D_tab[ind]
+    E_lo = E_tab[ind - 1]
+    Deflection_N = D_lo + (E_n - E_lo) * (D_hi - D_lo) / (E_tab[ind] - E_lo)
+    for i in range(max_iter):
+        slope = dE_curve(Deflection_N)
+        step = (E_curve(Deflection_N) - E_n) / slope if slope != 0 else 0.0
+        Deflection_N = min(max(Deflection_N - step, D_lo), D_hi)
+        if abs(step) <= tol:
+            break
+
+    if ins.enabled:
+        ins.count('deflection solves')
+        ins.count('newton iterations', i + 1)
+    return [Deflection_N, R_curve(Deflection_N) * R]
+
+def fender_reaction_arr(x,E,R,fndr):
 
-    E_curve = curve[0]-E_n
-    R_curve = curve[1]
-    # Root Counter
-    ctr = 0
-    
-    for i in E_curve.roots():
-        if (i.imag == 0) and (i.real >= 0):
-            Deflection_N = i.real
-            ctr += 1
+    # Array form of fender_reaction. All demands are resolved in one call
+    # against the cached inverse of the fender energy curve.
+    # Definitions:
+    #   x   = Array of Berthing Energies to Fender
+    #   E   = Energy Absorption at 60% Deflection (scalar or array)
+    #   R   = Fender Reaction at 60% Deflection (scalar or array)
+    #   fndr= Fender Type (str)
+
+    # Normalize Input Energy
+    E_n = np.asarray(x, dtype=float)/E
 
-    Reaction    = R_curve(Deflection_N) * R
+    Deflection_N = fender_deflection(E_n, fndr)
+    Reaction    = Fenders[fndr][1](Deflection_N) * R
 
-    # Interpolate the fender reaction
     return [Deflection_N, Reaction]
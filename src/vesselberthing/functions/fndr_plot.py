@@ -1,17 +1,60 @@
 # This module will generate various berthing plots
+#   Charts are written to file, so the headless Agg backend is selected
+#   unless a backend has been chosen (MPLBACKEND) or pyplot is already in use.
+import os
 import sys
 import matplotlib as mpl
+if 'MPLBACKEND' not in os.environ and 'matplotlib.pyplot' not in sys.modules:
+    mpl.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
 import math 
-from scipy import interpolate
 from ..functions import berthvel as bv
-
-
-def ER_demand_curve(D_d,E_d,R_d,Dplt_max,Eplt_data,Rplt_data, cht_title='Fender Demand Curves'):
+from .. import instrument as ins
+
+# Figure Templates
+    # With reuse=True a chart is drawn on a figure template that is created
+    # once per chart type and process, then cleared for the next chart,
+    # rather than building (and tearing down) a new figure every time.
+_templates = {}
+
+def template(kind):
+    # Return a cleared (fig, axes) template
+    #   kind = 'twin'   energy and reaction axes sharing the deflection axis
+    #          'single' one set of axes
+    if kind not in _templates:
+        fig, ax1 = plt.subplots()
+        axes = (ax1, ax1.twinx()) if kind == 'twin' else (ax1,)
+        _templates[kind] = (fig, axes)
+    fig, axes = _templates[kind]
+    for ax in axes:
+        ax.cla()
+    if kind == 'twin':
+        axes[1].yaxis.tick_right()
+        axes[1].yaxis.set_label_position('right')
+        axes[1].patch.set_visible(False)
+    return fig, axes
+
+def save_chart(fig, output, dpi, reuse=False):
+    # Save a chart to a file name or to an open PdfPages document. The
+    # figure is closed unless it is a reusable template.
+    with ins.stage('figure save'):
+        if hasattr(output, 'savefig'):
+            output.savefig(fig)
+        else:
+            fig.savefig(output, dpi=dpi)
+    ins.count('figures')
+    if not reuse:
+        plt.close(fig)
+
+def ER_demand_curve(D_d,E_d,R_d,Dplt_max,Eplt_data,Rplt_data, cht_title='Fender Demand Curves',
+                    output=None, dpi=300, reuse=False):
     #Initialize plot
-    fig, ax1 = plt.subplots()
-    ax2 = ax1.twinx()
+    if reuse:
+        fig, (ax1, ax2) = template('twin')
+    else:
+        fig, ax1 = plt.subplots()
+        ax2 = ax1.twinx()
 
     xmax_lin = Dplt_max
 
@@ -61,19 +104,15 @@ def ER_demand_curve(D_d,E_d,R_d,Dplt_max,Eplt_data,Rplt_data, cht_title='Fender
     ax1.scatter(D_arr,E_arr, c = 'orange', s = 50, label = 'Energy Demands', marker='+', zorder=3)
     ax2.scatter(D_arr,R_arr, c = 'darkgreen', s = 50, label = 'Reaction Demands', marker='x', zorder=3)
 
-    E_max = 0
-    D_max = 0
-    R_max = 0
-    for i,item in enumerate(E_arr):
-        if item > E_max:
-            E_max = item
-            D_max = D_arr[i]
-            R_max = R_arr[i]
+    i_max = np.argmax(E_arr)
+    E_max = max(E_arr[i_max], 0)
+    D_max = D_arr[i_max] if E_arr[i_max] > 0 else 0
+    R_max = R_arr[i_max] if E_arr[i_max] > 0 else 0
     ax1.text(D_max,E_max,"{0:.3f} kip-ft".format(E_max),backgroundcolor='white', zorder = 2)
     ax2.text(D_max,R_max,"{0:.3f} kip".format(R_max),backgroundcolor = 'white', zorder = 2)
 
     fig.figure.set_tight_layout(True)
-    fig.figure.set_dpi(300)
+    fig.figure.set_dpi(dpi)
     fig.figure.set_figheight(6.5)
     fig.figure.set_figwidth(6.5)
 
@@ -89,13 +128,16 @@ def ER_demand_curve(D_d,E_d,R_d,Dplt_max,Eplt_data,Rplt_data, cht_title='Fender
     ax1.grid(visible=True)
     ax2.set(ylabel = 'Fender Reaction (Kip)', ylim = (0,y2max), yticks=y2tickarr)
     
-    fig.savefig(cht_title+'.png')
-    plt.close()
+    save_chart(fig, output or cht_title+'.png', dpi, reuse)
 
-def ER_curve(Dplt_max,Eplt_data,Rplt_data, cht_title='Fender Reaction Curves'):
+def ER_curve(Dplt_max,Eplt_data,Rplt_data, cht_title='Fender Reaction Curves',
+             output=None, dpi=300, reuse=False):
     #Initialize plot
-    fig, ax1 = plt.subplots()
-    ax2 = ax1.twinx()
+    if reuse:
+        fig, (ax1, ax2) = template('twin')
+    else:
+        fig, ax1 = plt.subplots()
+        ax2 = ax1.twinx()
     
     xmax_lin = Dplt_max
 
@@ -114,8 +156,6 @@ def ER_curve(Dplt_max,Eplt_data,Rplt_data, cht_title='Fender Reaction Curves'):
     y1numtick = 10
     y1tickinc = y1max/y1numtick
     y1 = Eplt_data(x_linspace)
-    E_int = np.polynomial.Polynomial.integ(Rplt_data,1,[0])*10.827
-    y3 = E_int(x_linspace)
     
     y2max = max(Rplt_data(xmax_lin),0)*1.7
     y2order = math.floor(math.log(y2max, 10))-1
@@ -134,12 +174,11 @@ def ER_curve(Dplt_max,Eplt_data,Rplt_data, cht_title='Fender Reaction Curves'):
 
     #Draw Energy Curve
     ax1.plot(x_linspace,y1,'b', label = 'Energy Absorption Curve', zorder=1)
-    # ax1.plot(x_linspace,y3,'g', label = 'Energy Absorption Curve', zorder=1)
     ax2.plot(x_linspace,y2,'r', label = 'Reaction Curve', zorder=1)
 
 
     fig.figure.set_tight_layout(True)
-    fig.figure.set_dpi(300)
+    fig.figure.set_dpi(dpi)
     fig.figure.set_figheight(6.5)
     fig.figure.set_figwidth(6.5)
 
@@ -156,43 +195,30 @@ def ER_curve(Dplt_max,Eplt_data,Rplt_data, cht_title='Fender Reaction Curves'):
     ax1.grid(visible=True)
     ax2.set(ylabel = 'Fender Reaction (Kip)', ylim = (0,y2max), yticks=y2tickarr)
     
-    fig.savefig(cht_title+'.png')
-    plt.close()
+    save_chart(fig, output or cht_title+'.png', dpi, reuse)
 
-def vel_plt(data,cht_title='Vessel Berthing Velocity'):
+def vel_plt(data,cht_title='Vessel Berthing Velocity', output=None, dpi=300,
+            reuse=False):
     #Initialize plot
-    fig, ax = plt.subplots()
+    if reuse:
+        fig, (ax,) = template('single')
+    else:
+        fig, ax = plt.subplots()
 
     # Marker arrays
     mkrs = ['+','x','*','1','3','s','o','.','p']
     base_colors=['b','g','r','c','m','y','k']
-    color = []
-    for i in data:
-        ind=(math.floor(np.random.random(1)*len(base_colors)))
-        color.append(base_colors[ind])
+    color = [base_colors[i % len(base_colors)] for i in range(len(data))]
 
     data_t = list(map(list,zip(*data)))
     disp_d = np.array(data_t[1])
     vel_d = np.array(data_t[2])
-    y1 = []
-    y2 = []
-    y3 = []
 
+    # Velocity curves evaluated directly from the curve fits
     x  = np.linspace(1000,100000,100)
-    for i in x:
-        y1.append(bv.velocity(i,'sheltered'))
-        y2.append(bv.velocity(i,'moderate'))
-        y3.append(bv.velocity(i,'exposed'))
-    y1arr = np.array(y1)
-    y2arr = np.array(y2)
-    y3arr = np.array(y3)
-    y1spline = interpolate.make_interp_spline(x,y1arr)
-    y2spline = interpolate.make_interp_spline(x,y2arr)
-    y3spline = interpolate.make_interp_spline(x,y3arr)
-
-    y1sp = y1spline(x)
-    y2sp = y2spline(x)
-    y3sp = y3spline(x)
+    y1sp = bv.velocity(x,'sheltered')
+    y2sp = bv.velocity(x,'moderate')
+    y3sp = bv.velocity(x,'exposed')
 
     xtickinc = 5000
     xmax = math.ceil(max(disp_d)*1.1/10**4)*10**4
@@ -213,12 +239,12 @@ def vel_plt(data,cht_title='Vessel Berthing Velocity'):
     ax.plot(x,y3sp,'r', label = 'Exposed Condition', zorder=1)
 
     for i, key in enumerate(data_t[0]):
-        ax.scatter(disp_d[i],vel_d[i], c = color[i], label = key, s = 50, marker=mkrs[i], zorder=2)
+        ax.scatter(disp_d[i],vel_d[i], c = color[i], label = key, s = 50, marker=mkrs[i % len(mkrs)], zorder=2)
         if (vel_d[i] == max(vel_d)) or (vel_d[i] == min(vel_d)):
             ax.text(disp_d[i],vel_d[i],'v = {0:.2f} ft/s'.format(vel_d[i]))
 
     fig.figure.set_tight_layout(True)
-    fig.figure.set_dpi(300)
+    fig.figure.set_dpi(dpi)
     fig.figure.set_figheight(6.5)
     fig.figure.set_figwidth(6.5)
 
@@ -228,6 +254,5 @@ def vel_plt(data,cht_title='Vessel Berthing Velocity'):
 
     ax.grid(visible=True)
     ax.legend()
-    plt.tight_layout()
-    fig.savefig(cht_title+'.png')
-    plt.close()
\ No newline at end of file
+    fig.tight_layout()
+    save_chart(fig, output or cht_title+'.png', dpi, reuse)
\ No newline at end of file
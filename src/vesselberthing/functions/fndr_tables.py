@@ -0,0 +1,142 @@
+""" This module provides tabulated (piecewise) fender performance curves for
+    fenders whose manufacturer data is given as a table of points rather
+    than a fitted polynomial. Points are joined with a monotone piecewise
+    cubic (PCHIP, Fritsch-Carlson), which passes through every point and
+    does not overshoot between them, so rising, falling and buckling
+    branches of a reaction curve are all kept as tabulated.
+"""
+
+import numpy as np
+
+def pchip_slopes(x, y):
+    # Determine the PCHIP slopes at the tabulated points
+    # Definitions:
+    #   x   = Tabulated deflections, strictly increasing
+    #   y   = Tabulated values
+    #   result = Slope of the curve at each point
+
+    h = np.diff(x)
+    delta = np.diff(y) / h
+    if len(x) == 2:
+        return np.array([delta[0], delta[0]])
+
+    # Interior points: weighted harmonic mean of the adjacent secants, or
+    # zero at a local extremum
+    m = np.zeros(len(x))
+    d0 = delta[:-1]
+    d1 = delta[1:]
+    w1 = 2 * h[1:] + h[:-1]
+    w2 = h[1:] + 2 * h[:-1]
+    same = d0 * d1 > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        m[1:-1] = np.where(same, (w1 + w2) / (w1 / d0 + w2 / d1), 0.0)
+
+    # End points: one-sided three point estimate, limited to keep the
+    # end interval monotone
+    def end(h0, h1, d0, d1):
+        s = ((2 * h0 + h1) * d0 - h0 * d1) / (h0 + h1)
+        if np.sign(s) != np.sign(d0):
+            return 0.0
+        if np.sign(d0) != np.sign(d1) and abs(s) > abs(3 * d0):
+            return 3 * d0
+        return s
+
+    m[0] = end(h[0], h[1], delta[0], delta[1])
+    m[-1] = end(h[-1], h[-2], delta[-1], delta[-2])
+    return m
+
+class TabularCurve:
+    """Monotone piecewise cubic curve through tabulated (x, y) points.
+
+    Behaves like the numpy Polynomial curves used in fndr_curves: it can be
+    called with a scalar or array, scaled by a rating (curve * E_rated) and
+    differentiated with deriv(). Beyond the table the curve is extended
+    along the end slopes. Instances are plain data and can be pickled."""
+
+    def __init__(self, x, y, slopes=None):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if x.ndim != 1 or x.shape != y.shape or len(x) < 2:
+            raise ValueError('A tabular curve needs matching 1-D x and y '
+                             'with at least two points')
+        if np.any(np.diff(x) <= 0):
+            raise ValueError('Tabular curve deflections must be strictly '
+                             'increasing')
+        self.x = x
+        self.y = y
+        self.m = pchip_slopes(x, y) if slopes is None else np.asarray(slopes, dtype=float)
+
+    @property
+    def x_max(self):
+        # Largest tabulated deflection
+        return self.x[-1]
+
+    def _locate(self, d):
+        # Interval index, interval width and local coordinate of each d
+        d = np.asarray(d, dtype=float)
+        i = np.clip(np.searchsorted(self.x, d, side='right') - 1, 0, len(self.x) - 2)
+        h = self.x[i + 1] - self.x[i]
+        t = (d - self.x[i]) / h
+        return d, i, h, t
+
+    def __call__(self, d):
+        d, i, h, t = self._locate(d)
+        y0, y1 = self.y[i], self.y[i + 1]
+        m0, m1 = self.m[i] * h, self.m[i + 1] * h
+        t2 = t * t
+        t3 = t2 * t
+        val = ((2 * t3 - 3 * t2 + 1) * y0 + (t3 - 2 * t2 + t) * m0
+               + (-2 * t3 + 3 * t2) * y1 + (t3 - t2) * m1)
+
+        # Linear extension outside the table
+        val = np.where(d < self.x[0], self.y[0] + self.m[0] * (d - self.x[0]), val)
+        val = np.where(d > self.x[-1], self.y[-1] + self.m[-1] * (d - self.x[-1]), val)
+        return val[()] if val.ndim == 0 else val
+
+    def deriv(self):
+        # Return the first derivative as a callable curve
+        return TabularSlope(self)
+
+    def __mul__(self, scale):
+        return TabularCurve(self.x, self.y * scale, self.m * scale)
+
+    __rmul__ = __mul__
+
+    def __repr__(self):
+        return 'TabularCurve({0} points, x = {1:g} to {2:g})'.format(
+            len(self.x), self.x[0], self.x[-1])
+
+class TabularSlope:
+    """First derivative of a TabularCurve."""
+
+    def __init__(self, curve):
+        self.curve = curve
+
+    def __call__(self, d):
+        c = self.curve
+        d, i, h, t = c._locate(d)
+        y0, y1 = c.y[i], c.y[i + 1]
+        m0, m1 = c.m[i] * h, c.m[i + 1] * h
+        t2 = t * t
+        val = ((6 * t2 - 6 * t) * y0 + (3 * t2 - 4 * t + 1) * m0
+               + (-6 * t2 + 6 * t) * y1 + (3 * t2 - 2 * t) * m1) / h
+
+        val = np.where(d < c.x[0], c.m[0], val)
+        val = np.where(d > c.x[-1], c.m[-1], val)
+        return val[()] if val.ndim == 0 else val
+
+    def __mul__(self, scale):
+        return TabularSlope(self.curve * scale)
+
+    __rmul__ = __mul__
+
+def curve_pair(points):
+    # Build the [energy, reaction] curves of a fender from a table of
+    # points, given either as [deflection, energy, reaction] lists or as a
+    # dictionary with 'Deflection', 'Energy' and 'Reaction' lists
+    # (normalized by the rated values, as in fenders.json 'Curves').
+    if isinstance(points, dict):
+        D, E, R = points['Deflection'], points['Energy'], points['Reaction']
+    else:
+        D, E, R = points
+    return [TabularCurve(D, E), TabularCurve(D, R)]
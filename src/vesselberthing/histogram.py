@@ -0,0 +1,38 @@
+"""This module holds the fixed-bin histograms used to reduce large sample
+sets (Monte Carlo results, berthing velocity logs) in bounded memory.
+Counts on the same edges are added to merge chunks, files or workers, and
+percentiles are interpolated from the counts.
+"""
+import numpy as np
+
+def bin_counts(x, edges):
+    # Histogram on fixed edges with one trailing overflow bin. NaN samples
+    # and samples below the first edge have no bin and raise ValueError.
+    # Definitions:
+    #   x       = Samples (any shape)
+    #   edges   = Increasing bin edges
+    #   result  = Counts, len(edges): one per bin and the overflow count
+    x = np.ravel(x)
+    bad = np.isnan(x) | (x < edges[0])
+    if bad.any():
+        raise ValueError('{0} samples are NaN or below {1:g} and cannot be '
+                         'binned'.format(int(np.count_nonzero(bad)), edges[0]))
+    ind = np.searchsorted(edges, x, side='right') - 1
+    return np.bincount(np.minimum(ind, len(edges) - 1), minlength=len(edges))
+
+def percentile(edges, counts, q, vmax):
+    # Interpolate a percentile from bin_counts counts
+    # Definitions:
+    #   edges   = Bin edges of the counts
+    #   counts  = Counts from bin_counts
+    #   q       = Percentile (0 to 100)
+    #   vmax    = Value returned when the percentile is in the overflow bin
+    n = counts.sum()
+    cum = np.cumsum(counts[:-1])
+    target = q / 100 * n
+    i = np.searchsorted(cum, target)
+    if i >= len(cum):
+        return vmax
+    lo = cum[i - 1] if i > 0 else 0
+    frac = (target - lo) / counts[i] if counts[i] else 0.0
+    return float(edges[i] + frac * (edges[i + 1] - edges[i]))
@@ -0,0 +1,181 @@
+"""This module simulates the berthing impact in the time domain. Each case is
+modelled as a single mass striking the nonlinear fender: the effective mass
+is the vessel mass with the added mass (Cm), berthing factors (Cb) and
+abnormal factor applied, i.e. the mass whose kinetic energy at the approach
+velocity equals the fender energy of the static method,
+
+    m = 2 Efndr / V²        (kip-s²/ft)
+
+The fender resists with the slope of its energy curve, F = dE/dx, plus an
+optional viscous term for rate effects, and all cases are integrated
+together with a velocity Verlet step until the vessel leaves the fender.
+Without damping the peak deflection matches the static engine; the peak
+reaction is the largest reaction along the loading path, which exceeds the
+static (end of stroke) value when the reaction curve buckles before the
+peak deflection. The simulation also gives the contact duration, time
+histories and the effect of damping.
+
+The fender curves are normalized by rated deflection, so a fender height is
+needed to turn them into force-displacement curves. Unless given, it is
+taken as the height for which the rated reaction curve absorbs the rated
+energy at the rated deflection.
+"""
+import numpy as np
+
+from .functions import fndr_curves as fc
+
+def fender_height(fndr, E_rated, R_rated, D_rated, n=2001):
+    # Implied fender height (ft): rated energy divided by the work of the
+    # normalized reaction curve up to the rated deflection
+    # Definitions:
+    #   fndr    = Fender Type (str)
+    #   E_rated, R_rated, D_rated = Fender ratings (kip-ft, kip, fraction)
+    D0 = fc.fender_deflection(0.0, fndr)
+    D = np.linspace(D0, D_rated, n)
+    R = fc.Fenders[fndr][1](D)
+    work = np.sum((R[1:] + R[:-1]) * np.diff(D)) / 2
+    return E_rated * (fc.Fenders[fndr][0](D_rated) - fc.Fenders[fndr][0](D0)) / (R_rated * work)
+
+def simulate_impact(fndr, mass, V, E_rated, R_rated, height, zeta=0.0,
+                    steps=200, max_steps=None, history=False):
+    """Integrate the impacts of many cases on one fender type at once.
+
+    Definitions:
+        fndr    = Fender Type (str)
+        mass    = Effective mass of each case (kip-s²/ft)
+        V       = Approach velocity of each case (ft/s)
+        E_rated, R_rated = Fender ratings (kip-ft, kip)
+        height  = Fender height (ft)
+        zeta    = Viscous damping as a fraction of critical, based on the
+                  secant stiffness at the end of the fender curve (rate
+                  effects)
+        steps   = Time steps to the peak deflection of the equivalent
+                  linear spring
+
+    Array arguments broadcast together. Returns a dictionary of arrays:
+    'Peak Deflection' (normalized), 'Peak Reaction' (kip), 'Contact
+    Duration' (s) and 'Time to Peak' (s). With history=True it also holds
+    't', 'Deflection' and 'Reaction' histories of shape (time step, case),
+    NaN once a case has left the fender."""
+    args = np.broadcast_arrays(*[np.asarray(a, dtype=float) for a in
+                                 (mass, V, E_rated, R_rated, height, zeta)])
+    shape = args[0].shape
+    mass, V, E_rated, R_rated, H, zeta = (a.ravel() for a in args)
+    n = mass.size
+
+    E_curve, R_curve = fc.Fenders[fndr]
+    dE_curve = E_curve.deriv()
+    D_end = fc.curve_inverse(fndr)[0][-1]
+    x0 = fc.fender_deflection(0.0, fndr) * H     # contact at zero energy
+    c = 2 * zeta * np.sqrt(R_rated / (D_end * H) * mass)
+
+    def force(i, x, v):
+        # Force resisting the vessel, from the slope of the energy curve,
+        # and the fender reaction from the reaction curve (kip)
+        D = x / H[i]
+        damper = c[i] * v
+        F = E_rated[i] * np.maximum(dE_curve(D), 0.0) / H[i] + damper
+        return F, R_curve(D) * R_rated[i] + damper
+
+    # Time step: the shorter of a quarter period of the equivalent linear
+    # spring (pi/2 x peak deflection / velocity) and of the tangent
+    # stiffness at the static peak, so the stiff end of the curve is
+    # resolved as well as the soft start
+    D_static = fc.fender_deflection(0.5 * mass * V**2 / E_rated, fndr)
+    x_peak = np.maximum(D_static * H - x0, 1e-12)
+    h = 1e-6
+    k_peak = E_rated * (dE_curve(D_static + h) - dE_curve(D_static - h)) / (2 * h * H**2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_quarter = np.fmin(np.pi / 2 * x_peak / V,
+                            np.where(k_peak > 0, np.pi / 2 * np.sqrt(mass / k_peak), np.inf))
+    dt = t_quarter / steps
+
+    everyone = np.arange(n)
+    x = x0.copy()
+    v = V.copy()
+    a = -force(everyone, x, v)[0] / mass
+    t = np.zeros(n)
+    peak_x = x.copy()
+    peak_R = np.zeros(n)
+    t_peak = np.zeros(n)
+    duration = np.full(n, np.nan)
+    active = np.ones(n, dtype=bool)
+    if max_steps is None:
+        max_steps = 20 * steps
+    hist_t, hist_D, hist_R = [], [], []
+
+    for it in range(max_steps):
+        i = np.nonzero(active)[0]
+        if len(i) == 0:
+            break
+        # Velocity Verlet step; the damping force uses the half step
+        # velocity
+        vh = v[i] + 0.5 * dt[i] * a[i]
+        xi = x[i] + dt[i] * vh
+        F, R = force(i, xi, vh)
+        ai = -F / mass[i]
+        vi = vh + 0.5 * dt[i] * ai
+        ti = t[i] + dt[i]
+
+        rising = xi > peak_x[i]
+        peak_x[i] = np.where(rising, xi, peak_x[i])
+        t_peak[i] = np.where(rising, ti, t_peak[i])
+        peak_R[i] = np.maximum(peak_R[i], R)
+
+        # Contact ends when the vessel is back at the undeflected fender;
+        # the crossing is interpolated within the step
+        out = (xi <= x0[i]) & (vi < 0)
+        frac = np.clip((x[i] - x0[i]) / np.maximum(x[i] - xi, 1e-300), 0.0, 1.0)
+        duration[i[out]] = t[i[out]] + frac[out] * dt[i[out]]
+
+        if history:
+            for store, val in ((hist_t, ti), (hist_D, xi / H[i]), (hist_R, R)):
+                row = np.full(n, np.nan)
+                row[i[~out]] = val[~out]
+                store.append(row)
+
+        x[i], v[i], a[i], t[i] = xi, vi, ai, ti
+        active[i[out]] = False
+
+    res = {'Peak Deflection': (peak_x / H).reshape(shape),
+           'Peak Reaction': peak_R.reshape(shape),
+           'Contact Duration': duration.reshape(shape),
+           'Time to Peak': t_peak.reshape(shape)}
+    if history:
+        res['t'] = np.array(hist_t).reshape((-1,) + shape)
+        res['Deflection'] = np.array(hist_D).reshape((-1,) + shape)
+        res['Reaction'] = np.array(hist_R).reshape((-1,) + shape)
+    return res
+
+def impact_results(fndr_results, zeta=0.0, height=None, steps=200):
+    """Run the impact simulation for every row of berthing_energy results.
+
+    height optionally gives the fender height (ft) by fender name; other
+    fenders use fender_height. Returns the results dictionary with
+    'Dyn Deflection', 'Dyn Reaction', 'Contact Duration' and 'Time to
+    Peak' columns added to each ResultTable."""
+    height = height or {}
+    out = {}
+    for name, table in fndr_results.items():
+        cols = {f: np.full(len(table), np.nan) for f in
+                ('Dyn Deflection', 'Dyn Reaction', 'Contact Duration', 'Time to Peak')}
+        for fndr in set(table['Fender Type']):
+            sel = table['Fender Type'] == fndr
+            E_r = table['Rated Energy'][sel]
+            R_r = table['Rated Reaction'][sel]
+            D_r = table['Rated Deflection'][sel]
+            if name in height:
+                H = np.full(len(E_r), float(height[name]))
+            else:
+                ratings, inv = np.unique(np.stack([E_r, R_r, D_r]), axis=1,
+                                         return_inverse=True)
+                H = np.array([fender_height(fndr, *r) for r in ratings.T])[inv.ravel()]
+            V = table['Vel'][sel]
+            mass = 2 * table['Energy'][sel] / V**2
+            res = simulate_impact(fndr, mass, V, E_r, R_r, H, zeta, steps)
+            cols['Dyn Deflection'][sel] = res['Peak Deflection']
+            cols['Dyn Reaction'][sel] = res['Peak Reaction']
+            cols['Contact Duration'][sel] = res['Contact Duration']
+            cols['Time to Peak'][sel] = res['Time to Peak']
+        out[name] = table.with_fields(**cols)
+    return out
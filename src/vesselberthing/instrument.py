@@ -0,0 +1,126 @@
+"""This module records where the time goes in a berthing run. It is off by
+default; while disabled, stage() returns a shared no-op context manager and
+count() returns at once, so the instrumented code pays only a flag check.
+
+Stages are timed with the wall clock and may nest (an outer stage includes
+the time of the stages inside it). Counters record the number of cases
+evaluated, deflection solves, Newton iterations, demands beyond the fender
+curve, figures saved and bytes written. Work done in worker processes
+(e.g. plot_fndr_results with workers > 1) is not collected.
+
+    from vesselberthing import instrument
+    with instrument.profile() as report:
+        fndr_results = mb.berthing_energy(...)
+    report['stages']['berthing_energy']['seconds']
+
+Hooks are called as hook(kind, name, value) for every stage ('stage',
+seconds) and counter ('count', increment), for forwarding to a metrics
+system.
+"""
+import contextlib
+import functools
+import time
+
+enabled = False
+
+_stages = {}        # name -> [seconds, calls]
+_counters = {}      # name -> total
+_hooks = []
+
+class _Stage:
+    __slots__ = ('name', 't0')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        dt = time.perf_counter() - self.t0
+        rec = _stages.get(self.name)
+        if rec is None:
+            _stages[self.name] = [dt, 1]
+        else:
+            rec[0] += dt
+            rec[1] += 1
+        for hook in _hooks:
+            hook('stage', self.name, dt)
+        return False
+
+_null = contextlib.nullcontext()
+
+def stage(name):
+    # Context manager timing a named stage
+    if not enabled:
+        return _null
+    return _Stage(name)
+
+def timed(name):
+    # Decorator timing every call of a function as a stage
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            with _Stage(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def count(name, n=1):
+    # Add n to a named counter
+    if not enabled:
+        return
+    _counters[name] = _counters.get(name, 0) + n
+    for hook in _hooks:
+        hook('count', name, n)
+
+def enable(hook=None):
+    global enabled
+    if hook is not None:
+        add_hook(hook)
+    enabled = True
+
+def disable():
+    global enabled
+    enabled = False
+
+def reset():
+    _stages.clear()
+    _counters.clear()
+
+def add_hook(hook):
+    if hook not in _hooks:
+        _hooks.append(hook)
+
+def remove_hook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+def report():
+    """Return the recorded stages and counters as a dictionary:
+    {'stages': {name: {'seconds': s, 'calls': n}}, 'counters': {name: n}}"""
+    return {'stages': {name: {'seconds': rec[0], 'calls': rec[1]}
+                       for name, rec in _stages.items()},
+            'counters': dict(_counters)}
+
+@contextlib.contextmanager
+def profile(hook=None):
+    # Record a block of code from a clean slate. The yielded dictionary is
+    # filled with the report when the block exits.
+    global enabled
+    previous = enabled
+    reset()
+    if hook is not None:
+        add_hook(hook)
+    enabled = True
+    rep = {}
+    try:
+        yield rep
+    finally:
+        enabled = previous
+        if hook is not None:
+            remove_hook(hook)
+        rep.update(report())
@@ -0,0 +1,194 @@
+"""This module runs a probabilistic (Monte Carlo) version of the berthing
+energy calculation. Approach velocity, displacement, water level and fender
+performance are drawn from configurable distributions and every sample is
+evaluated with the array engine in berthing_batch. Samples are processed in
+chunks across a process pool and reduced into fixed-bin histograms, so only
+the per-fender exceedance curves are kept in memory.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import berthing_batch
+from . import catalog as ct
+from . import histogram as hg
+from .functions import fndr_curves as fc
+
+# Sampled variables and their default distributions. Each entry is a tuple
+# of (distribution, parameters...):
+#   ('fixed', value)
+#   ('normal', mean, std)
+#   ('lognormal', median, cov)
+#   ('uniform', low, high)
+#   ('triangular', low, mode, high)
+# 'velocity', 'displacement', 'Cc', 'Cg' and 'tolerance' are factors on the
+# nominal value; 'water_level' is an offset (ft) on the load case level.
+default_dists = {'velocity':        ('lognormal', 1.0, 0.25),
+                 'displacement':    ('uniform', 0.9, 1.0),
+                 'water_level':     ('fixed', 0.0),
+                 'Cc':              ('fixed', 1.0),
+                 'Cg':              ('fixed', 1.0),
+                 'tolerance':       ('uniform', 0.9, 1.1)}
+
+metrics = ('Energy', 'Deflection', 'Reaction')
+
+def sample(rng, dist, size):
+    # Draw samples from one distribution definition
+    # Definitions:
+    #   rng     = numpy Generator
+    #   dist    = Distribution tuple (see default_dists)
+    #   size    = Output shape
+
+    match dist[0]:
+        case 'fixed':
+            return np.full(size, float(dist[1]))
+        case 'normal':
+            return rng.normal(dist[1], dist[2], size)
+        case 'lognormal':
+            sigma = np.sqrt(np.log(1 + dist[2]**2))
+            return dist[1] * np.exp(rng.normal(0, sigma, size))
+        case 'uniform':
+            return rng.uniform(dist[1], dist[2], size)
+        case 'triangular':
+            return rng.triangular(dist[1], dist[2], dist[3], size)
+    raise ValueError('Unknown distribution: ' + str(dist[0]))
+
+def _run_chunk(grid, groups, dists, edges, n, seed):
+    # Evaluate n samples of every case row and reduce them to histograms
+    rng = np.random.default_rng(seed)
+    rows = len(grid['M'])
+    draw = {name: sample(rng, dists[name], (rows, n)) for name in dists}
+
+    sgrid = {}
+    for key, val in grid.items():
+        sgrid[key] = val[:, None] if val.dtype != object else val
+    sgrid['M'] = sgrid['M'] * draw['displacement']
+    sgrid['wdepth'] = sgrid['wdepth'] + draw['water_level']
+    sgrid['Cc'] = sgrid['Cc'] * draw['Cc']
+    sgrid['Cg'] = sgrid['Cg'] * draw['Cg']
+    V = sgrid['vel_a'] * sgrid['M']**sgrid['vel_b'] * draw['velocity']
+    with np.errstate(invalid='ignore'):
+        Efndr = berthing_batch.case_energy(sgrid, V)['Efndr']
+
+    counts = {}
+    for fkey, (ind, fndr) in groups.items():
+        tol = draw['tolerance'][ind]
+        E = Efndr[ind]
+        # Samples without a finite, non-negative energy (e.g. a sampled
+        # water level at or below the mudline) are counted, not evaluated
+        valid = np.isfinite(E) & (E >= 0)
+        with np.errstate(invalid='ignore'):
+            E_n = np.where(valid, E / (grid['E_rating'][ind][:, None] * tol), 0.0)
+        D = fc.fender_deflection(E_n, fndr, clip=True)
+        R = fc.Fenders[fndr][1](D) * grid['R_rating'][ind][:, None] * tol
+        vals = {'Energy': E[valid], 'Deflection': D[valid], 'Reaction': R[valid]}
+        n = int(np.count_nonzero(valid))
+        counts[fkey] = {'n': n, 'invalid': E.size - n,
+                        'over_capacity': int(np.sum(E_n > fc.curve_inverse(fndr)[1][-1]))}
+        for m in metrics:
+            counts[fkey][m] = hg.bin_counts(vals[m], edges[fkey][m])
+            counts[fkey][m + ' max'] = float(vals[m].max()) if n else 0.0
+    return counts
+
+# Worker process state, set once per worker by _init_worker
+_worker_args = None
+
+def _init_worker(grid, groups, dists, edges):
+    global _worker_args
+    _worker_args = (grid, groups, dists, edges)
+
+def _worker_chunk(n, seed):
+    return _run_chunk(*_worker_args, n, seed)
+
+def _merge(acc, part):
+    # Add the histograms of one chunk into the running totals
+    if acc is None:
+        return part
+    for fkey, c in part.items():
+        a = acc[fkey]
+        a['n'] += c['n']
+        a['invalid'] += c['invalid']
+        a['over_capacity'] += c['over_capacity']
+        for m in metrics:
+            a[m] += c[m]
+            a[m + ' max'] = max(a[m + ' max'], c[m + ' max'])
+    return acc
+
+def berthing_montecarlo(vessels, berths, loadcases, fender_dict, cp_e_dict,
+                        vessel_library=None, n_samples=10000, dists=None,
+                        seed=None, workers=None, chunk_size=1000000,
+                        n_bins=2000, range_factor=4.0,
+                        percentiles=(50, 90, 95, 99, 99.9)):
+    """Sample the berthing energy of every vessel, berth and load case
+    combination and return per-fender exceedance curves and percentiles.
+
+    n_samples is the number of samples drawn for each case row. The work is
+    split into chunks of about chunk_size evaluations, each seeded from its
+    own child of SeedSequence(seed) so results are reproducible for a given
+    seed and chunk_size regardless of the number of workers. workers=1
+    runs in the calling process.
+
+    The returned dictionary is keyed by fender and holds, for each of
+    'Energy', 'Deflection' and 'Reaction', the bin edges ('x'), the
+    probability of exceeding each edge ('exceedance'), the requested
+    'percentiles' and the sample 'max'. 'over_capacity' counts samples
+    whose energy exceeded the fender curve (deflection clipped to
+    fndr_curves.D_limit). 'invalid' counts samples without a finite,
+    non-negative energy (e.g. a sampled water level at or below the
+    mudline, or a negative sampled factor); they are left out of
+    'samples' and the distributions."""
+    if vessel_library is None:
+        vessel_library = ct.default_catalog().vessels
+
+    dists = {**default_dists, **(dists or {})}
+    grid = berthing_batch.case_grid(vessels, berths, loadcases, fender_dict,
+                                    cp_e_dict, vessel_library)
+    nominal = berthing_batch.evaluate_cases(dict(grid))
+
+    # Fender groups and histogram edges from the nominal results
+    groups = {}
+    edges = {}
+    for fkey in fender_dict:
+        ind = np.nonzero(grid['loc_fndr_key'] == fkey)[0]
+        if len(ind) == 0:
+            continue
+        groups[fkey] = (ind, fender_dict[fkey][0])
+        edges[fkey] = {
+            'Energy': np.linspace(0, nominal['Efndr'][ind].max() * range_factor, n_bins + 1),
+            'Deflection': np.linspace(0, fc.D_limit, n_bins + 1),
+            'Reaction': np.linspace(0, nominal['Reaction'][ind].max() * range_factor, n_bins + 1)}
+
+    # Split the samples into chunks
+    rows = len(grid['M'])
+    per_chunk = max(1, chunk_size // max(rows, 1))
+    sizes = [per_chunk] * (n_samples // per_chunk)
+    if n_samples % per_chunk:
+        sizes.append(n_samples % per_chunk)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    acc = None
+    if workers == 1 or len(sizes) == 1:
+        for n, s in zip(sizes, seeds):
+            acc = _merge(acc, _run_chunk(grid, groups, dists, edges, n, s))
+    else:
+        workers = min(workers or os.cpu_count() or 1, len(sizes))
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(grid, groups, dists, edges)) as pool:
+            for part in pool.map(_worker_chunk, sizes, seeds):
+                acc = _merge(acc, part)
+
+    results = {}
+    for fkey, c in (acc or {}).items():
+        results[fkey] = {'samples': c['n'], 'invalid': c['invalid'],
+                         'over_capacity': c['over_capacity']}
+        for m in metrics:
+            x = edges[fkey][m]
+            exceed = 1 - np.cumsum(c[m][:-1]) / max(c['n'], 1)
+            results[fkey][m] = {
+                'x': x,
+                'exceedance': np.concatenate([[1.0], exceed]),
+                'percentiles': {q: hg.percentile(x, c[m], q, c[m + ' max'])
+                                for q in percentiles},
+                'max': c[m + ' max']}
+    return results
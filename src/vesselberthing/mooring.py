@@ -0,0 +1,208 @@
+"""This module determines the static wind and current loads on moored
+vessels following the simplified procedures of UFC 4-159-03 (Design:
+Moorings), which are based on NAVFAC DM-26.5. Forces are evaluated for
+every vessel, berth, heading, wind speed, current speed and water level as
+broadcast array operations, and returned as a labeled result cube of shape
+(vessel, berth, heading, wind, current, water level). Output units are
+(kip, ft).
+
+    res = mooring_loads(vessels, berths, loadcases, wind_speeds=[35, 50, 64],
+                        current_speeds=[1.0, 2.0])
+    Fy, heading = governing_heading(res, 'Fy')
+
+Headings are the direction the wind and current come from, relative to the
+bow (0 = head on, 90 = beam on), and both act along the same heading. Fx is
+the longitudinal force (positive aft), Fy the transverse force and Mxy the
+yaw moment about midships. Windage areas are read from the vessel library
+('Lateral Windage', 'Frontal Windage', ft²) where given, otherwise they are
+estimated from the length, beam and draft.
+"""
+import numpy as np
+
+from . import catalog as ct
+from .sweep import SweepResult
+
+rho_air = 0.00237       # Mass density of air (slug/ft³)
+rho_water = 1.99        # Mass density of sea water (slug/ft³)
+nu_water = 1.4e-5       # Kinematic viscosity of sea water (ft²/s)
+knot = 1.68781          # ft/s per knot
+
+# Coefficients:
+#   C_yw        = Transverse wind force drag coefficient
+#   C_xw        = Longitudinal wind force drag coefficient
+#   e_w         = Eccentricity / L of the transverse wind force, forward
+#                 of midships, times cos(heading)
+#   C_1, k      = Transverse current coefficient at wd/T = 1 and exponent
+#   C_xcb       = Longitudinal current form drag coefficient
+#   C_m         = Midship section coefficient
+#   e_c         = Eccentricity / L of the transverse current force
+#   h_w         = Windage height / draft of surface vessels, when the
+#                 windage areas are not in the vessel library
+#   h_w_sub     = Windage height / draft of submarines
+default_params = {'C_yw': 0.92, 'C_xw': 0.7, 'e_w': 0.1,
+                  'C_1': 3.2, 'k': 2.0, 'C_xcb': 0.1, 'C_m': 0.98, 'e_c': 0.1,
+                  'h_w': 1.5, 'h_w_sub': 0.4}
+
+outputs = ('Fx Wind', 'Fy Wind', 'Mxy Wind',
+           'Fx Current', 'Fy Current', 'Mxy Current',
+           'Fx', 'Fy', 'Mxy')
+
+def wind_shape(theta):
+    # Shape functions of the wind forces (UFC 4-159-03)
+    # Definitions:
+    #   theta   = Heading (rad)
+    #   result  = [f_xw, f_yw]
+    f_yw = (np.sin(theta) - np.sin(5 * theta) / 20) / (1 - 1 / 20)
+    return [np.cos(theta), f_yw]
+
+def current_coeff(L, B, T, M, wdepth, params=default_params):
+    # Transverse current force drag coefficient for the water depth,
+    # between the deep water value C_0 and C_1 when the keel touches the
+    # mudline (UFC 4-159-03)
+    # Definitions:
+    #   L, B, T = Vessel length, beam and draft (ft)
+    #   M       = Displacement (LT)
+    #   wdepth  = Water depth (ft)
+    volume = M * 2240 / 64                  # Displaced volume (ft³)
+    chi = L**2 * B * T * params['C_m'] / (B * volume)
+    C_0 = 0.22 * np.sqrt(chi)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.clip(T / wdepth, 0.0, 1.0)
+    ratio = np.where(wdepth > 0, ratio, 1.0)
+    return C_0 + (params['C_1'] - C_0) * ratio**params['k']
+
+def wind_loads(theta, V_w, L, A_x, A_y, params=default_params):
+    # Wind forces (kip) and yaw moment (kip-ft)
+    # Definitions:
+    #   theta   = Heading (rad)
+    #   V_w     = Wind speed (knots)
+    #   L       = Vessel length (ft)
+    #   A_x, A_y= Frontal and lateral windage areas (ft²)
+    q = 0.5 * rho_air * (V_w * knot)**2 / 1000
+    f_xw, f_yw = wind_shape(theta)
+    Fx = q * A_x * params['C_xw'] * f_xw
+    Fy = q * A_y * params['C_yw'] * f_yw
+    return [Fx, Fy, Fy * L * params['e_w'] * np.cos(theta)]
+
+def current_loads(theta, V_c, L, B, T, M, wdepth, params=default_params):
+    # Current forces (kip) and yaw moment (kip-ft)
+    # Definitions:
+    #   theta   = Heading (rad)
+    #   V_c     = Current speed (knots)
+    #   L, B, T = Vessel length, beam and draft (ft)
+    #   M       = Displacement (LT)
+    #   wdepth  = Water depth (ft)
+    V = V_c * knot
+    Fy = (0.5 * rho_water * V**2 * L * T
+          * current_coeff(L, B, T, M, wdepth, params) * np.sin(theta) / 1000)
+
+    # Longitudinal: form drag and skin friction on the wetted surface
+    V_x = V * np.cos(theta)
+    S = 1.7 * T * L + M * 2240 / 64 / T     # Wetted surface (ft²)
+    Re = np.maximum(np.abs(V_x) * L / nu_water, 1e5)
+    C_f = 0.075 / (np.log10(Re) - 2)**2
+    Fx = 0.5 * rho_water * V_x * np.abs(V_x) * (params['C_xcb'] * B * T + C_f * S) / 1000
+    return [Fx, Fy, Fy * L * params['e_c'] * np.cos(theta)]
+
+def mooring_loads(vessels, berths, water_levels, wind_speeds, current_speeds=(0.0,),
+                  headings=np.arange(0.0, 360.0, 10.0), vessel_library=None,
+                  params=None):
+    """Evaluate the wind and current loads of every vessel at each of its
+    berths (vessels and berths as passed to berthing_energy).
+
+    Definitions:
+        water_levels    = Water levels (ft), or a loadcases dictionary
+                          whose distinct water levels are used
+        wind_speeds     = Design wind speeds (knots)
+        current_speeds  = Design current speeds (knots)
+        headings        = Headings (degrees from the bow)
+        params          = Coefficients replacing default_params entries
+
+    Returns a sweep.SweepResult with dims ('vessel', 'berth', 'heading',
+    'wind', 'current', 'water_level') and the outputs listed in outputs;
+    vessels not using a berth are NaN."""
+    if vessel_library is None:
+        vessel_library = ct.default_catalog().vessels
+    params = dict(default_params, **(params or {}))
+    if isinstance(water_levels, dict):
+        water_levels = sorted(set(float(lc[3]) for lc in water_levels.values()))
+
+    # Vessel / berth pairs
+    pair_vsl = []
+    pair_brth = []
+    for key in vessels:
+        for jtem in vessels[key][2]:
+            pair_vsl.append(key)
+            pair_brth.append(jtem)
+
+    def vparam(name):
+        return np.array([vessel_library[v][name] for v in pair_vsl], dtype=float)
+
+    def windage(name, width):
+        # Library windage area, or the width times the estimated windage
+        # height
+        ratio = np.array([params['h_w_sub'] if vessels[v][1] else params['h_w']
+                          for v in pair_vsl], dtype=float)
+        est = width * ratio * T
+        given = np.array([vessel_library[v].get(name, np.nan) for v in pair_vsl],
+                         dtype=float)
+        return np.where(np.isnan(given), est, given)
+
+    L = vparam('Length Overall')
+    B = vparam('Breadth')
+    T = vparam('Draft')
+    M = vparam('Displacement')
+    A_y = windage('Lateral Windage', L)
+    A_x = windage('Frontal Windage', B)
+    mudline = np.array([berths[j][0] for j in pair_brth], dtype=float)
+
+    # Axes: pair, heading, wind, current, water level
+    def axis(values, i):
+        shape = [1] * 5
+        shape[i] = len(values)
+        return np.asarray(values, dtype=float).reshape(shape)
+
+    def row(x):
+        return x.reshape(-1, 1, 1, 1, 1)
+
+    theta = np.radians(axis(headings, 1))
+    V_w = axis(wind_speeds, 2)
+    V_c = axis(current_speeds, 3)
+    wdepth = axis(water_levels, 4) - row(mudline)
+
+    wind = wind_loads(theta, V_w, row(L), row(A_x), row(A_y), params)
+    current = current_loads(theta, V_c, row(L), row(B), row(T), row(M), wdepth, params)
+
+    dims = ('vessel', 'berth', 'heading', 'wind', 'current', 'water_level')
+    coords = {'vessel': list(vessels), 'berth': list(berths),
+              'heading': np.asarray(headings, dtype=float),
+              'wind': np.asarray(wind_speeds, dtype=float),
+              'current': np.asarray(current_speeds, dtype=float),
+              'water_level': np.asarray(water_levels, dtype=float)}
+    pair_shape = (len(pair_vsl),) + tuple(len(coords[d]) for d in dims[2:])
+    index = (np.array([coords['vessel'].index(v) for v in pair_vsl], dtype=int),
+             np.array([coords['berth'].index(b) for b in pair_brth], dtype=int))
+    cube_shape = tuple(len(coords[d]) for d in dims)
+
+    data = {}
+    values = wind + current + [w + c for w, c in zip(wind, current)]
+    for name, vals in zip(outputs, values):
+        cube = np.full(cube_shape, np.nan)
+        cube[index] = np.broadcast_to(vals, pair_shape)
+        data[name] = cube
+    return SweepResult(dims, coords, data)
+
+def governing_heading(result, name):
+    # Largest magnitude of an output over the headings, keeping its sign,
+    # and the heading at which it occurs
+    # Definitions:
+    #   result  = SweepResult from mooring_loads
+    #   name    = Output name, e.g. 'Fy' or 'Mxy'
+    #   result  = [values, headings], each with the heading axis removed
+    axis = result.dims.index('heading')
+    vals = result[name]
+    mag = np.where(np.isnan(vals), -np.inf, np.abs(vals))
+    i = np.expand_dims(np.argmax(mag, axis=axis), axis)
+    gov = np.take_along_axis(vals, i, axis).squeeze(axis)
+    heading = np.asarray(result.coords['heading'])[i.squeeze(axis)]
+    return [gov, np.where(np.isnan(gov), np.nan, heading)]
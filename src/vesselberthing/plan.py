@@ -0,0 +1,230 @@
+"""This module compiles a project definition into a reusable scenario plan.
+compile_plan validates the project dictionaries once, resolves vessel,
+berth, load case and fender names to integer indices and builds the case
+grid with the Corner Protection / MV rule applied. The nominal cases are
+evaluated once at compile time, so a run only re-evaluates the
+coefficients when columns are replaced, and only solves the fender curves
+of the rows whose fender energy or rating changed:
+
+    plan = compile_plan(vessels, berths, loadcases, fender_dict, cp_e_dict)
+    results = plan.run()                                # berthing_energy
+    results = plan.run(Cc=0.9, wl=plan.expand('loadcase', levels))
+
+A ScenarioPlan is immutable (its mappings are read-only proxies and its
+arrays are read-only) and can be pickled to worker processes.
+"""
+from types import MappingProxyType
+
+import numpy as np
+
+from . import berthing_batch
+from . import catalog as ct
+from . import instrument as ins
+from . import results as rs
+from .functions import berthvel as bv
+from .functions import fndr_curves as fc
+
+dims = ('vessel', 'berth', 'loadcase', 'fender')
+
+# Result fields of the case grid columns, and the computed columns that
+# cannot be replaced in run
+field_of = {col: name for (name, _), col in zip(rs.fields, berthing_batch.columns)}
+computed = ('V', 'Cbl', 'k_r', 'Ce', 'Cb', 'Cm', 'Eship', 'Efndr',
+            'Deflection', 'Reaction')
+
+def validate(vessels, berths, loadcases, fender_dict, cp_e_dict, vessel_library):
+    # Check a project definition and return the list of problems found
+    errors = []
+
+    def shape(kind, name, entry, n):
+        if not isinstance(entry, (list, tuple)) or len(entry) != n:
+            errors.append('{0} {1!r} must be a list of {2} values'.format(kind, name, n))
+            return False
+        return True
+
+    for name, entry in fender_dict.items():
+        if shape('Fender', name, entry, 4):
+            try:
+                fc.Fenders[entry[0]]
+            except KeyError:
+                errors.append('Fender {0!r} has unknown fender type {1!r}'
+                              .format(name, entry[0]))
+    for name, entry in berths.items():
+        if shape('Berth', name, entry, 4):
+            if entry[1] not in fender_dict:
+                errors.append('Berth {0!r} uses undefined fender {1!r}'.format(name, entry[1]))
+            if entry[2] not in bv.vel_coeff:
+                errors.append('Berth {0!r} has unknown berthing condition {1!r}'
+                              .format(name, entry[2]))
+    for name, entry in loadcases.items():
+        if shape('Load case', name, entry, 4):
+            if entry[0] not in berthing_batch.configs:
+                errors.append('Load case {0!r} has unknown berthing configuration {1!r}'
+                              .format(name, entry[0]))
+
+    has_cp = any(lc[0] == 'Corner Protection' for lc in loadcases.values()
+                 if isinstance(lc, (list, tuple)) and len(lc) == 4)
+    for name, entry in vessels.items():
+        if not shape('Vessel', name, entry, 3):
+            continue
+        if name not in vessel_library:
+            errors.append('Vessel {0!r} is not in the vessel library'.format(name))
+        if not entry[0] or entry[0] < 1:
+            errors.append('Vessel {0!r} needs at least one broadside fender'.format(name))
+        for jtem in entry[2]:
+            if jtem not in berths:
+                errors.append('Vessel {0!r} uses undefined berth {1!r}'.format(name, jtem))
+        if has_cp and name not in cp_e_dict:
+            errors.append('Vessel {0!r} has no Corner Protection eccentricity'
+                          .format(name))
+    return errors
+
+def _frozen(arr):
+    arr = np.asarray(arr)
+    arr.flags.writeable = False
+    return arr
+
+class ScenarioPlan:
+    """Compiled, immutable project definition (see compile_plan).
+
+    Attributes: labels (names along each of dims), index (integer label
+    index of every case row along each dim), grid (case grid columns,
+    including the nominal computed columns), groups (row indices of each
+    fender group), types (row indices of each fender type) and blocks (the
+    nominal result columns of each fender group). All are read-only
+    mappings of read-only arrays or tuples."""
+
+    __slots__ = ('labels', 'index', 'grid', 'groups', 'types', 'blocks')
+
+    def __init__(self, labels, index, grid, groups, types, blocks):
+        frozen = {'labels': {k: tuple(v) for k, v in labels.items()}}
+        for name, val in (('index', index), ('grid', grid), ('groups', groups),
+                          ('types', types)):
+            frozen[name] = {k: _frozen(v) for k, v in val.items()}
+        frozen['blocks'] = {f: MappingProxyType({k: _frozen(v) for k, v in b.items()})
+                            for f, b in blocks.items()}
+        for name, val in frozen.items():
+            object.__setattr__(self, name, MappingProxyType(val))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ScenarioPlan is immutable')
+
+    def __getstate__(self):
+        # Mapping proxies cannot be pickled; __init__ freezes the copies again
+        state = {name: dict(getattr(self, name)) for name in self.__slots__}
+        state['blocks'] = {f: dict(b) for f, b in state['blocks'].items()}
+        return state
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __len__(self):
+        return len(self.grid['key'])
+
+    def __repr__(self):
+        return 'ScenarioPlan({0} cases, {1} vessels, {2} berths, {3} load cases)'.format(
+            len(self), len(self.labels['vessel']), len(self.labels['berth']),
+            len(self.labels['loadcase']))
+
+    def expand(self, dim, values):
+        # Per-row array from one value per label along dim, given as a
+        # dictionary keyed by label or a sequence in label order
+        if isinstance(values, dict):
+            values = [values[label] for label in self.labels[dim]]
+        return np.asarray(values)[self.index[dim]]
+
+    @ins.timed('plan run')
+    def run(self, V=None, **columns):
+        """Evaluate every case. Numeric case grid columns (e.g. 'M', 'Cc',
+        'Cg', 'ABF', 'wl', 'mudline', 'E_rating') may be replaced by a
+        scalar or a per-row array; V replaces the berthing velocity. The
+        eccentricity 'a' is not recomputed from replaced 'CG' or 'L'.
+        Returns the dictionary of ResultTables keyed by fender, as
+        berthing_energy."""
+        grid = dict(self.grid)
+        for name, val in columns.items():
+            if name not in grid or name in computed or grid[name].dtype == object:
+                raise ValueError('Cannot replace case column ' + repr(name))
+            grid[name] = np.broadcast_to(np.asarray(val, dtype=grid[name].dtype), len(self))
+        if 'wl' in columns or 'mudline' in columns:
+            grid['wdepth'] = grid['wl'] - grid['mudline']
+            columns['wdepth'] = grid['wdepth']
+        if 'a' in columns:
+            grid['ecc'] = grid['a'].astype(object)
+            columns['ecc'] = grid['ecc']
+        if 'ABF' in columns:
+            # The case label follows the accidental berthing factor
+            grid['case'] = np.where(grid['ABF'] == 1, 'Operational', 'Accidental').astype(object)
+            columns['case'] = grid['case']
+
+        # The nominal cases were evaluated by compile_plan; only replaced
+        # columns are re-evaluated, and only rows whose fender energy or
+        # rating moved are solved again
+        changed = set(columns)
+        if V is not None:
+            V = np.broadcast_to(np.asarray(V, dtype=float), len(self))
+        if V is not None or changed:
+            with ins.stage('coefficients'):
+                grid.update(berthing_batch.case_energy(grid, V))
+            changed.update(computed)
+            Efndr = grid['Efndr']
+            moved = ((Efndr != self.grid['Efndr'])
+                     | (grid['E_rating'] != self.grid['E_rating'])
+                     | (grid['R_rating'] != self.grid['R_rating']))
+            Deflection = self.grid['Deflection'].copy()
+            Reaction = self.grid['Reaction'].copy()
+            with ins.stage('fender solve'):
+                for fndr, sel in self.types.items():
+                    sel = sel[moved[sel]]
+                    if len(sel):
+                        Rfndr = fc.fender_reaction_arr(Efndr[sel], grid['E_rating'][sel],
+                                                       grid['R_rating'][sel], fndr)
+                        Deflection[sel] = Rfndr[0]
+                        Reaction[sel] = Rfndr[1]
+            grid['Deflection'] = Deflection
+            grid['Reaction'] = Reaction
+            ins.count('solved', int(moved.sum()))
+        ins.count('cases', len(self))
+
+        # Build each fender group from its nominal columns and the fields
+        # that changed
+        changed = {field_of[col]: grid[col] for col in changed if col in field_of}
+        results = {}
+        for fender, sel in self.groups.items():
+            block = dict(self.blocks[fender])
+            block.update((name, col[sel]) for name, col in changed.items())
+            results[fender] = rs.ResultTable.from_columns(block)
+        return results
+
+def compile_plan(vessels, berths, loadcases, fender_dict, cp_e_dict,
+                 vessel_library=None):
+    """Validate a project definition (the berthing_energy dictionaries)
+    and compile it into a ScenarioPlan. Every problem found is reported in
+    one ValueError."""
+    if vessel_library is None:
+        vessel_library = ct.default_catalog().vessels
+    errors = validate(vessels, berths, loadcases, fender_dict, cp_e_dict, vessel_library)
+    if errors:
+        raise ValueError('Invalid project:\n  ' + '\n  '.join(errors))
+
+    grid = berthing_batch.case_grid(vessels, berths, loadcases, fender_dict,
+                                    cp_e_dict, vessel_library)
+    labels = {'vessel': list(vessels), 'berth': list(berths),
+              'loadcase': list(loadcases), 'fender': list(fender_dict)}
+    index = {}
+    for dim, col in zip(dims, ('key', 'berth', 'k', 'loc_fndr_key')):
+        lookup = {label: i for i, label in enumerate(labels[dim])}
+        index[dim] = np.array([lookup[v] for v in grid[col]], dtype=np.intp)
+
+    groups = {f: np.nonzero(index['fender'] == i)[0]
+              for i, f in enumerate(labels['fender'])}
+    types = {t: np.nonzero(grid['fender_type'] == t)[0]
+             for t in dict.fromkeys(grid['fender_type'].tolist())}
+
+    # Nominal result columns, split by fender group; run() replaces the
+    # ones its arguments change
+    berthing_batch.evaluate_cases(grid)
+    blocks = {f: {field_of[col]: grid[col][sel] for col in field_of}
+              for f, sel in groups.items()}
+
+    return ScenarioPlan(labels, index, grid, groups, types, blocks)
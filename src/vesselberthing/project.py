@@ -0,0 +1,213 @@
+"""This module keeps a berthing project in memory between edits. Each result
+row depends on one vessel, berth, load case, fender and corner protection
+eccentricity; when one of those inputs is changed only the affected
+(vessel, berth, load case) rows are recomputed, and only the fender groups
+whose rows changed are reassembled, rewritten and replotted.
+
+    prj = BerthingProject(vessels, berths, loadcases, fender_dict, cp_e_dict)
+    prj.results()
+    prj.set_berth('Surface Berth 1', [64.0, 'Typical Pneumatic', 'sheltered', 1.0])
+    prj.results()       # only Surface Berth 1 rows are recomputed
+"""
+import copy
+import os
+
+from . import berthing_batch
+from . import catalog as ct
+from . import render as rd
+from . import results as rs
+from . import writers as wr
+
+class BerthingProject:
+    """Stateful berthing project with incremental recomputation."""
+
+    def __init__(self, vessels, berths, loadcases, fender_dict, cp_e_dict,
+                 vessel_library=None):
+        self.vessels = copy.deepcopy(vessels)
+        self.berths = copy.deepcopy(berths)
+        self.loadcases = copy.deepcopy(loadcases)
+        self.fender_dict = copy.deepcopy(fender_dict)
+        self.cp_e_dict = copy.deepcopy(cp_e_dict)
+        self.vessel_library = vessel_library
+
+        self._rows = {}             # (vessel, berth, load case) -> result row
+        self._tables = {}           # fender -> ResultTable
+        self._pending = []          # blocks of (pairs, load cases) to evaluate
+        self._dirty = set(fender_dict)      # fenders to reassemble
+        self._csv_dirty = set(fender_dict)  # fenders to rewrite
+        self._plot_dirty = True
+        self.evaluated = 0          # rows computed since creation
+        self._mark(self._pairs(), None)
+
+    # Dependency tracking
+    def _pairs(self, vessel=None, berth=None):
+        # (vessel, berth) pairs, optionally limited to a vessel or berth
+        return [(v, b) for v in self.vessels for b in self.vessels[v][2]
+                if (vessel is None or v == vessel) and (berth is None or b == berth)]
+
+    def _mark(self, pairs, loadcases):
+        # Queue (pairs x load cases) for recomputation; None means all
+        # load cases
+        if pairs:
+            self._pending.append((list(pairs), loadcases))
+
+    def _drop(self, pairs=None, loadcases=None, vessel=None):
+        # Remove stored rows matching the pairs / load cases / vessel
+        pairs = None if pairs is None else set(pairs)
+        loadcases = None if loadcases is None else set(loadcases)
+        for key in list(self._rows):
+            if ((pairs is None or key[:2] in pairs)
+                    and (loadcases is None or key[2] in loadcases)
+                    and (vessel is None or key[0] == vessel)):
+                self._dirty.add(self._rows.pop(key)['Fender Name'])
+
+    # Edits
+    def set_vessel(self, name, value):
+        if name in self.vessels:
+            self._drop(vessel=name)
+        self.vessels[name] = copy.deepcopy(value)
+        self._plot_dirty = True
+        self._mark(self._pairs(vessel=name), None)
+
+    def remove_vessel(self, name):
+        self._drop(vessel=name)
+        del self.vessels[name]
+        self._plot_dirty = True
+
+    def set_berth(self, name, value):
+        pairs = self._pairs(berth=name)
+        self._drop(pairs)
+        self.berths[name] = copy.deepcopy(value)
+        self._dirty.add(value[1])
+        self._mark(pairs, None)
+
+    def remove_berth(self, name):
+        self._drop(self._pairs(berth=name))
+        del self.berths[name]
+
+    def set_loadcase(self, name, value):
+        self._drop(loadcases=[name])
+        self.loadcases[name] = copy.deepcopy(value)
+        self._mark(self._pairs(), [name])
+
+    def remove_loadcase(self, name):
+        self._drop(loadcases=[name])
+        del self.loadcases[name]
+
+    def set_fender(self, name, value):
+        pairs = [p for p in self._pairs()
+                 if p[1] in self.berths and self.berths[p[1]][1] == name]
+        self._drop(pairs)
+        self.fender_dict[name] = copy.deepcopy(value)
+        self._dirty.add(name)
+        self._mark(pairs, None)
+
+    def set_cp_e(self, vessel, value):
+        self.cp_e_dict[vessel] = value
+        cp = [k for k in self.loadcases if self.loadcases[k][0] == 'Corner Protection']
+        pairs = self._pairs(vessel=vessel)
+        self._drop(pairs, cp)
+        self._mark(pairs, cp)
+
+    def update(self, vessels=None, berths=None, loadcases=None,
+               fender_dict=None, cp_e_dict=None):
+        # Apply whole edited dictionaries, recomputing only the entries
+        # that differ from the current project
+        def diff(new, old, setter, remover):
+            if new is None:
+                return
+            for key in list(old):
+                if key not in new and remover is not None:
+                    remover(key)
+            for key, val in new.items():
+                if key not in old or old[key] != val:
+                    setter(key, val)
+
+        diff(fender_dict, self.fender_dict, self.set_fender, None)
+        diff(berths, self.berths, self.set_berth, self.remove_berth)
+        diff(loadcases, self.loadcases, self.set_loadcase, self.remove_loadcase)
+        diff(cp_e_dict, self.cp_e_dict, self.set_cp_e, None)
+        diff(vessels, self.vessels, self.set_vessel, self.remove_vessel)
+
+    # Evaluation
+    def _evaluate(self):
+        vessel_library = self.vessel_library or ct.default_catalog().vessels
+        pending, self._pending = self._pending, []
+        for pairs, loadcases in pending:
+            pairs = [p for p in pairs if p[0] in self.vessels
+                     and p[1] in self.vessels[p[0]][2] and p[1] in self.berths]
+            if loadcases is None:
+                lcs = self.loadcases
+            else:
+                lcs = {k: self.loadcases[k] for k in loadcases if k in self.loadcases}
+            if not pairs or not lcs:
+                continue
+
+            sub_vessels = {}
+            for v, b in pairs:
+                sub_vessels.setdefault(v, [self.vessels[v][0], self.vessels[v][1], []])
+                if b not in sub_vessels[v][2]:
+                    sub_vessels[v][2].append(b)
+            grid = berthing_batch.evaluate_cases(berthing_batch.case_grid(
+                sub_vessels, self.berths, lcs, self.fender_dict,
+                self.cp_e_dict, vessel_library))
+            table = berthing_batch.result_table(grid)
+            for i, row in enumerate(table.data):
+                self._rows[(row['Vessel'], grid['berth'][i], row['Load Case'])] = row
+                self._dirty.add(row['Fender Name'])
+            self.evaluated += len(table)
+
+    def results(self):
+        """Return the berthing results as a dictionary of ResultTables keyed
+        by fender, recomputing only rows affected by edits."""
+        self._evaluate()
+        for fender in list(self._tables):
+            if fender not in self.fender_dict:
+                del self._tables[fender]
+        for fender in self._dirty:
+            if fender not in self.fender_dict:
+                continue
+            rows = [self._rows[(v, b, k)]
+                    for v in self.vessels for b in self.vessels[v][2]
+                    if b in self.berths and self.berths[b][1] == fender
+                    for k in self.loadcases if (v, b, k) in self._rows]
+            self._tables[fender] = rs.ResultTable.from_rows(rows)
+            self._csv_dirty.add(fender)
+        self._plot_dirty = self._plot_dirty or bool(self._dirty)
+        self._dirty = set()
+        return {f: self._tables.get(f, rs.ResultTable()) for f in self.fender_dict}
+
+    def changed_fenders(self):
+        # Fender groups changed since the last write_csv
+        self.results()
+        return set(self._csv_dirty)
+
+    # Outputs
+    def write_csv(self, output, per_fender=False):
+        """Write the results to CSV. With per_fender=True output is a folder
+        holding one '<fender>.csv' per fender group and only changed groups
+        are rewritten. Returns the paths written."""
+        res = self.results()
+        if not per_fender:
+            wr.write_results([res], output)
+            self._csv_dirty = set()
+            return [output]
+        os.makedirs(output, exist_ok=True)
+        written = []
+        for fender in sorted(self._csv_dirty & set(res)):
+            path = os.path.join(output, fender + '.csv')
+            wr.write_results([{fender: res[fender]}], path)
+            written.append(path)
+        self._csv_dirty = set()
+        return written
+
+    def plot(self, outdir='.', **kwargs):
+        """Redraw the charts of fender groups whose results changed (see
+        render.render_charts for the options)."""
+        res = self.results()
+        if not self._plot_dirty and os.path.exists(os.path.join(outdir, rd.manifest_name)):
+            return {'written': [], 'skipped': []}
+        vessel_library = self.vessel_library or ct.default_catalog().vessels
+        jobs = rd.chart_jobs(self.vessels, self.fender_dict, res, vessel_library)
+        self._plot_dirty = False
+        return rd.render_charts(jobs, outdir=outdir, skip_unchanged=True, **kwargs)
@@ -0,0 +1,171 @@
+"""This module renders the berthing charts drawn by plot_fndr_results.
+Each chart is described as a job (chart function, data and title) so that
+charts can be farmed out to a process pool, skipped when their inputs have
+not changed since the last run, or collected into one multi-page PDF.
+matplotlib is only imported by the process that draws the charts.
+"""
+import hashlib
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import instrument as ins
+from .functions import fndr_curves as fc
+from .functions import berthvel as bv
+
+# Record of the input hash behind each chart written to a folder
+manifest_name = '.chart_manifest.json'
+
+def chart_jobs(vessels, fender_dict, fndr_results, vessel_library):
+    # Describe the demand, fender and velocity charts of a project
+    jobs = []
+    for i in fender_dict.keys():
+        Eberth_arr = np.ascontiguousarray(fndr_results[i]['Energy'])
+        Rberth_arr = np.ascontiguousarray(fndr_results[i]['Reaction'])
+        Dberth_arr = np.ascontiguousarray(fndr_results[i]['Deflection'])
+
+        # Generate Fender Curves
+        fender_type = fender_dict[i][0]
+        E_rating = fender_dict[i][1]
+        R_rating = fender_dict[i][2]
+        D_curve = fender_dict[i][3]
+        E_curve = fc.Fenders[fender_type][0]*E_rating
+        R_curve = fc.Fenders[fender_type][1]*R_rating
+
+        jobs.append({'chart': 'ER_demand_curve',
+                     'args': (Dberth_arr, Eberth_arr, Rberth_arr, D_curve,
+                              E_curve, R_curve),
+                     'title': i + ' Fender Demand Curves'})
+        jobs.append({'chart': 'ER_curve',
+                     'args': (D_curve, E_curve, R_curve),
+                     'title': i + ' Fender Curves'})
+
+    disp = np.array([vessel_library[key]['Displacement'] for key in vessels])
+    vel = bv.velocity(disp, 'sheltered')
+    data = [[key, d, v] for key, d, v in zip(vessels, disp.tolist(), vel.tolist())]
+    jobs.append({'chart': 'vel_plt',
+                 'args': (data,),
+                 'title': 'Approach Velocity Perpendicular to Berth'})
+    return jobs
+
+def job_hash(job, dpi, fmt):
+    # Stable hash of everything that determines a chart's appearance. Each
+    # argument is pickled on its own, so the digest does not depend on
+    # which arguments happen to share objects (pickle memo references).
+    h = hashlib.sha256(pickle.dumps((job['chart'], job['title'], dpi, fmt)))
+    for arg in job['args']:
+        h.update(pickle.dumps(arg))
+    return h.hexdigest()
+
+def _draw(job, output, dpi):
+    with ins.stage('plot'):
+        from .functions import fndr_plot as plt
+        getattr(plt, job['chart'])(*job['args'], cht_title=job['title'],
+                                   output=output, dpi=dpi, reuse=True)
+
+def _render_batch(batch, dpi):
+    # Draw a list of (job, path) pairs in this process
+    for job, path in batch:
+        _draw(job, path, dpi)
+    return [path for job, path in batch]
+
+def _load_manifest(outdir):
+    try:
+        with open(os.path.join(outdir, manifest_name), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_manifest(outdir, manifest):
+    path = os.path.join(outdir, manifest_name)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+def cache_key(digest):
+    # Result cache key of a chart with the given job_hash
+    from .cache import make_key
+    return make_key('chart', digest)
+
+def _from_cache(cache, digest, path):
+    # Copy a cached chart to path; False on a miss
+    if cache is None:
+        return False
+    data = cache.get(cache_key(digest))
+    if data is None:
+        return False
+    with open(path, 'wb') as f:
+        f.write(data)
+    return True
+
+def _to_cache(cache, digest, path):
+    if cache is not None:
+        with open(path, 'rb') as f:
+            cache.put(cache_key(digest), f.read())
+
+def render_charts(jobs, outdir='.', fmt='png', dpi=300, workers=1,
+                  skip_unchanged=False, pdf_name='Berthing Charts.pdf',
+                  cache=None):
+    """Render chart jobs to outdir.
+
+    fmt='png' writes one file per chart named after its title; with
+    workers > 1 the charts are split across a process pool. fmt='pdf'
+    writes every chart as a page of one PDF (pdf_name). A lower dpi gives
+    quick preview images. With skip_unchanged=True, charts whose inputs
+    match the last run recorded in outdir are not redrawn. With a
+    cache.ResultCache, charts drawn before (in any folder) are copied from
+    the cache instead of being drawn.
+
+    Returns a dictionary with the 'written' and 'skipped' file paths."""
+    os.makedirs(outdir, exist_ok=True)
+    manifest = _load_manifest(outdir) if skip_unchanged else {}
+    written = []
+    skipped = []
+
+    if fmt == 'pdf':
+        path = os.path.join(outdir, pdf_name)
+        digest = hashlib.sha256(''.join(job_hash(j, dpi, fmt) for j in jobs)
+                                .encode()).hexdigest()
+        if skip_unchanged and manifest.get(pdf_name) == digest and os.path.exists(path):
+            return {'written': written, 'skipped': [path]}
+        if not _from_cache(cache, digest, path):
+            from matplotlib.backends.backend_pdf import PdfPages
+            with PdfPages(path) as pdf:
+                for job in jobs:
+                    _draw(job, pdf, dpi)
+            _to_cache(cache, digest, path)
+        written.append(path)
+        manifest[pdf_name] = digest
+    else:
+        pending = []
+        for job in jobs:
+            name = job['title'] + '.' + fmt
+            path = os.path.join(outdir, name)
+            digest = job_hash(job, dpi, fmt)
+            if skip_unchanged and manifest.get(name) == digest and os.path.exists(path):
+                skipped.append(path)
+                continue
+            manifest[name] = digest
+            if _from_cache(cache, digest, path):
+                written.append(path)
+                continue
+            pending.append((job, path))
+
+        if workers is None or workers > 1:
+            workers = min(workers or os.cpu_count() or 1, len(pending))
+        if workers > 1:
+            batches = [pending[i::workers] for i in range(workers)]
+            with ProcessPoolExecutor(workers) as pool:
+                for paths in pool.map(_render_batch, batches, [dpi] * workers):
+                    written.extend(paths)
+        else:
+            written.extend(_render_batch(pending, dpi))
+        for job, path in pending:
+            _to_cache(cache, job_hash(job, dpi, fmt), path)
+
+    if skip_unchanged:
+        _save_manifest(outdir, manifest)
+    return {'written': written, 'skipped': skipped}
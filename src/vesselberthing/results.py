@@ -0,0 +1,125 @@
+"""This module holds the result table returned by berthing_energy for each
+fender. Rows are stored in a NumPy structured array whose field names are
+the CSV column headers, so columns can be read by name without copying,
+filtered with boolean masks and concatenated across runs.
+"""
+import numpy as np
+
+# Result fields in output order:
+#           CSV Header                  Type
+fields = [('Vessel',                    object),
+          ('Load Case',                 object),
+          ('Berthing Condition',        object),
+          ('Acc. Factor',               float),
+          ('Berthing Configuration',    object),
+          ('Eccentricity',              object),
+          ('Water Depth',               float),
+          ('Displacement',              float),
+          ('Length',                    float),
+          ('Beam',                      float),
+          ('Draft',                     float),
+          ('CoG',                       float),
+          ('No. Fenders',               int),
+          ('Fender Name',               object),
+          ('Fender Type',               object),
+          ('Rated Energy',              float),
+          ('Rated Reaction',            float),
+          ('Rated Deflection',          float),
+          ('Vel',                       float),
+          ('Cbl',                       float),
+          ('k_r',                       float),
+          ('Cg',                        float),
+          ('Cd',                        float),
+          ('Cc',                        float),
+          ('Ce',                        float),
+          ('Cb',                        float),
+          ('Cm',                        float),
+          ('Eship',                     float),
+          ('Deflection',                float),
+          ('Energy',                    float),
+          ('Reaction',                  float)]
+
+result_dtype = np.dtype(fields)
+
+# Object fields holding numbers rather than text. The eccentricity is kept
+# as given (e.g. the integer 0 of broadside cases or a cp_e_dict value) so
+# it is written in the same form, and computed values are floats.
+numeric_objects = ('Eccentricity',)
+
+class ResultTable:
+    """Columnar berthing results for one fender group.
+
+    table['Energy'] returns the column as a view of the underlying array.
+    Indexing with a boolean mask, slice or index array returns a new
+    ResultTable. Iterating yields each row as a tuple in field order."""
+
+    __slots__ = ('data',)
+
+    def __init__(self, data=None, dtype=result_dtype):
+        if data is None:
+            data = np.zeros(0, dtype=dtype)
+        self.data = data
+
+    @classmethod
+    def from_rows(cls, rows, dtype=result_dtype):
+        # Build a table from a sequence of rows in field order
+        return cls(np.array([tuple(r) for r in rows], dtype=dtype))
+
+    @classmethod
+    def from_columns(cls, columns, dtype=result_dtype):
+        # Build a table from a dictionary of equal length columns keyed by
+        # field name
+        n = len(next(iter(columns.values()))) if columns else 0
+        data = np.zeros(n, dtype=dtype)
+        for name in dtype.names:
+            data[name] = columns[name]
+        return cls(data)
+
+    @property
+    def names(self):
+        return self.data.dtype.names
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.data.tolist())
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.data[key]
+        return ResultTable(self.data[key])
+
+    def __repr__(self):
+        return 'ResultTable({0} rows)'.format(len(self))
+
+    def rows(self):
+        # Return all rows as a list of tuples
+        return self.data.tolist()
+
+    def with_fields(self, **columns):
+        # Return a copy of the table with extra or replaced float columns.
+        # Keyword names are used as field names, e.g.
+        #   table.with_fields(**{'Reaction Max': r_max})
+        new = [(k, float) for k in columns if k not in self.names]
+        data = np.zeros(len(self), dtype=self.data.dtype.descr + new)
+        for name in self.names:
+            data[name] = self.data[name]
+        for name, col in columns.items():
+            data[name] = col
+        return ResultTable(data)
+
+def concat(tables):
+    # Concatenate result tables that share the same fields
+    tables = list(tables)
+    if not tables:
+        return ResultTable()
+    return ResultTable(np.concatenate([t.data for t in tables]))
+
+def concat_results(*results):
+    # Merge several berthing_energy result dictionaries fender by fender
+    merged = {}
+    for res in results:
+        for key, table in res.items():
+            merged.setdefault(key, []).append(table)
+    return {key: concat(tables) for key, tables in merged.items()}
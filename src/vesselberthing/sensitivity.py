@@ -0,0 +1,136 @@
+"""This module differentiates the berthing calculation. The partial
+derivatives of the fender energy, deflection and reaction of every case
+with respect to the vessel, site and fender inputs are propagated through
+the closed form expressions of berth_coeff, berthvel and the fender curves
+(chain rule, forward mode) in the same array pass as the results, instead
+of one finite difference run per input.
+
+    results = berthing_energy(vessels, berths, loadcases, fender_dict,
+                              cp_e_dict, None, sensitivity=True)
+    results['Typical Pneumatic']['dReaction/dDisplacement']
+
+Derivatives are per unit of each input (kip/LT, kip/ft, ...). The
+displacement derivative includes the change of the berthing velocity with
+displacement along the velocity curve; the velocity derivative holds the
+displacement fixed. Derivatives of the deflection are of the normalized
+deflection.
+"""
+import numpy as np
+
+from . import berthing_batch
+from . import catalog as ct
+from .functions import fndr_curves as fc
+
+# Inputs, named as the result columns they perturb
+inputs = ('Displacement', 'Length', 'Beam', 'Draft', 'CoG', 'Vel',
+          'Water Depth', 'Cc', 'Cg', 'Acc. Factor', 'Rated Energy',
+          'Rated Reaction')
+outputs = ('Energy', 'Deflection', 'Reaction')
+
+def _lin(*terms):
+    # Sum of coefficient x derivative dictionaries
+    out = {}
+    for c, d in terms:
+        for name, val in d.items():
+            out[name] = out[name] + c * val if name in out else c * val
+    return out
+
+def case_sensitivity(grid):
+    # Partial derivatives of the fender energy, deflection and reaction of
+    # every row of an evaluated case grid (berthing_batch.evaluate_cases)
+    # Definitions:
+    #   grid    = Evaluated case grid
+    #   result  = {output: {input: array}}, see outputs and inputs
+    M, L, B, D, CG = grid['M'], grid['L'], grid['B'], grid['D'], grid['CG']
+    wd, a, config = grid['wdepth'], grid['a'], grid['config']
+    V, Cbl, k_r, Ce, Cb = grid['V'], grid['Cbl'], grid['k_r'], grid['Ce'], grid['Cb']
+    Cm, Eship, Efndr = grid['Cm'], grid['Eship'], grid['Efndr']
+    ones = np.ones_like(M)
+
+    # Independent inputs
+    dM, dL, dB, dD, dCG = ({n: ones} for n in inputs[:5])
+    dwd, dCc, dCg, dABF = ({n: ones} for n in inputs[6:10])
+
+    # Berthing velocity along the velocity curve, vel = a * M**b
+    dV = {'Vel': ones, 'Displacement': grid['vel_b'] * V / M}
+
+    # Block coefficient, radius of gyration and eccentricity
+    dCbl = _lin((Cbl / M, dM), (-Cbl / L, dL), (-Cbl / B, dB), (-Cbl / D, dD))
+    dk = _lin((0.19 * L, dCbl), (0.19 * Cbl + 0.11, dL))
+    s_fq = np.where(config == 'Forward Quarter Point', np.sign(CG - L / 4), 0.0)
+    s_rq = np.where(config == 'Rear Quarter Point', np.sign(3 * L / 4 - CG), 0.0)
+    da = _lin((s_fq - s_rq, dCG), (-s_fq / 4 + 3 * s_rq / 4, dL))
+    den = (a**2 + k_r**2)**2
+    dCe = _lin((2 * k_r * a**2 / den, dk), (-2 * a * k_r**2 / den, da))
+
+    # Berthing factor Cb = Ce x Cg x Cd x Cc
+    Cd, Cc, Cg = grid['Cd'], grid['Cc'], grid['Cg']
+    dCb = _lin((Cg * Cd * Cc, dCe), (Ce * Cd * Cc, dCg), (Ce * Cg * Cd, dCc))
+
+    # Virtual mass coefficient
+    r = D / wd
+    dr = _lin((1 / wd, dD), (-D / wd**2, dwd))
+    dCm_sub = _lin((1.74 * 3.5 * r**2.5, dr))
+    F = np.minimum(1.5 * Cb, 0.9)
+    dF = _lin((np.where(1.5 * Cb < 0.9, 1.5, 0.0), dCb))
+    G = 12.4 * (D / B)**0.3 - 50 * (D / L)
+    dG = _lin((12.4 * 0.3 * (D / B)**-0.7 / B - 50 / L, dD),
+              (-12.4 * 0.3 * (D / B)**0.3 / B, dB), (50 * D / L**2, dL))
+    Cm0 = 1.3 + 1.5 * (D / B)
+    dCm0 = _lin((1.5 / B, dD), (-1.5 * D / B**2, dB))
+    dCm1 = _lin((G, dF), (F, dG))
+    dCm_srf = _lin((1 - r**3.5, dCm0), (r**3.5, dCm1),
+                   ((F * G - Cm0) * 3.5 * r**2.5, dr))
+    sub = grid['sub'].astype(float)
+    dCm = _lin((sub, dCm_sub), (1 - sub, dCm_srf))
+
+    # Ship and fender energy
+    dEship = _lin((Eship / M, dM), (2 * Eship / V, dV))
+    c = 1.1 / grid['nfndr']
+    ABF = grid['ABF']
+    dE = _lin((c * Cm * Cb * Eship, dABF), (c * ABF * Cb * Eship, dCm),
+              (c * ABF * Cm * Eship, dCb), (c * ABF * Cm * Cb, dEship))
+
+    # Deflection and reaction through the fender curves: E_n = E(D_n),
+    # so dD_n = dE_n / E'(D_n)
+    E_r, R_r = grid['E_rating'], grid['R_rating']
+    Dn = grid['Deflection']
+    slope = np.empty_like(Dn)
+    R_n = np.empty_like(Dn)
+    dR_n = np.empty_like(Dn)
+    for fndr in set(grid['fender_type']):
+        sel = grid['fender_type'] == fndr
+        E_curve, R_curve = fc.Fenders[fndr]
+        slope[sel] = E_curve.deriv()(Dn[sel])
+        R_n[sel] = R_curve(Dn[sel])
+        dR_n[sel] = R_curve.deriv()(Dn[sel])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dEn = _lin((1 / E_r, dE), (-Efndr / E_r**2, {'Rated Energy': ones}))
+        dDn = _lin((1 / slope, dEn))
+    dR = _lin((R_r * dR_n, dDn), (R_n, {'Rated Reaction': ones}))
+
+    result = {}
+    for name, d in zip(outputs, (dE, dDn, dR)):
+        result[name] = {i: d.get(i, np.zeros_like(M)) for i in inputs}
+    return result
+
+def sensitivity_columns(grid):
+    # Derivative columns of an evaluated case grid, keyed 'dOutput/dInput'
+    sens = case_sensitivity(grid)
+    return {'d' + o + '/d' + i: sens[o][i] for o in outputs for i in inputs}
+
+def berthing_sensitivity(vessels, berths, loadcases, fender_dict, cp_e_dict,
+                         vessel_library=None):
+    """berthing_energy results with the derivative of each output with
+    respect to each input added as 'dOutput/dInput' columns (e.g.
+    'dEnergy/dVel'). Returns the same dictionary of ResultTables keyed by
+    fender."""
+    if vessel_library is None:
+        vessel_library = ct.default_catalog().vessels
+    grid = berthing_batch.evaluate_cases(berthing_batch.case_grid(
+        vessels, berths, loadcases, fender_dict, cp_e_dict, vessel_library))
+    table = berthing_batch.result_table(grid).with_fields(**sensitivity_columns(grid))
+    results = {}
+    for i in fender_dict.keys():
+        results[i] = table[grid['loc_fndr_key'] == i]
+    return results
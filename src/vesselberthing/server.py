@@ -0,0 +1,348 @@
+"""Long-running local calculation server. The catalogs and fender curve
+inverses are loaded once at start-up, and concurrent requests are grouped
+into batches: requests arriving within max_latency seconds of each other
+(up to max_batch of them) have their case grids concatenated and evaluated
+in one array pass, then split back into per-request results.
+
+The server speaks plain HTTP/1.1 on localhost or on a Unix socket:
+
+    vesselberthing-server --port 8765
+    vesselberthing-server --unix /tmp/vesselberthing.sock
+
+    POST /berthing      project JSON (the keys of a project file: vessels,
+                        berths, loadcases, fenders, cp_e) -> results
+    GET  /health        -> {"status": "ok"}
+    GET  /stats         -> request and batch counts
+
+Results are JSON keyed by fender name, as row records (format=records,
+the default) or column lists (format=columns); format=arrow returns an
+Arrow IPC file with every row (requires pyarrow). The format is given as
+a query parameter or a "format" key in the request body.
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import socket
+import stat
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from . import berthing_batch
+from . import catalog as ct
+from . import instrument as ins
+from . import plan as pl
+from . import results as rs
+from . import writers as wr
+from .cli import project_keys
+from .functions import fndr_curves as fc
+
+formats = ('records', 'columns', 'arrow')
+reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found'}
+
+def warm(vessel_library=None):
+    # Load the catalog and build the inverse table of every fender curve
+    if vessel_library is None:
+        vessel_library = ct.default_catalog().vessels
+    for name in ct.default_catalog().curves:
+        fc.Fenders[name]
+    for fndr in list(fc.Fenders):
+        fc.curve_inverse(fndr)
+    return vessel_library
+
+def evaluate_batch(projects, vessel_library):
+    """Evaluate several projects (dictionaries of berthing_energy
+    arguments) in one pass. Returns one result dictionary of ResultTables
+    per project, or the exception raised for it."""
+    out = [None] * len(projects)
+    grids = []
+    for i, p in enumerate(projects):
+        try:
+            errors = pl.validate(p['vessels'], p['berths'], p['loadcases'],
+                                 p['fender_dict'], p['cp_e_dict'], vessel_library)
+            if errors:
+                raise ValueError('Invalid project:\n  ' + '\n  '.join(errors))
+            grids.append((i, berthing_batch.case_grid(
+                p['vessels'], p['berths'], p['loadcases'], p['fender_dict'],
+                p['cp_e_dict'], vessel_library)))
+        except Exception as err:
+            out[i] = err
+    if not grids:
+        return out
+
+    # One evaluation of the concatenated grids; if any case fails (e.g. a
+    # demand above the fender curve) the projects are evaluated one by one
+    # so only the failing ones report the error
+    sizes = [len(g['key']) for _, g in grids]
+    try:
+        merged = {k: np.concatenate([g[k] for _, g in grids]) for k in grids[0][1]}
+        parts = np.split(berthing_batch.result_table(
+            berthing_batch.evaluate_cases(merged)).data, np.cumsum(sizes)[:-1])
+    except Exception:
+        parts = []
+        for _, g in grids:
+            try:
+                parts.append(berthing_batch.result_table(
+                    berthing_batch.evaluate_cases(g)).data)
+            except Exception as err:
+                parts.append(err)
+
+    for (i, g), data in zip(grids, parts):
+        if isinstance(data, Exception):
+            out[i] = data
+            continue
+        out[i] = {f: rs.ResultTable(data[g['loc_fndr_key'] == f])
+                  for f in projects[i]['fender_dict']}
+    return out
+
+def _clean(values):
+    # JSON-safe list of a result column (NaN -> null)
+    values = values.tolist()
+    if values and isinstance(values[0], float):
+        return [None if math.isnan(v) else v for v in values]
+    return values
+
+def encode(results, fmt='records'):
+    # Encode a results dictionary as (content type, body bytes)
+    match fmt:
+        case 'records':
+            body = {f: [dict(zip(t.names, row)) for row in
+                        zip(*(_clean(t[n]) for n in t.names))] for f, t in results.items()}
+        case 'columns':
+            body = {f: {n: _clean(t[n]) for n in t.names} for f, t in results.items()}
+        case 'arrow':
+            buf = io.BytesIO()
+            with wr.ArrowSink(buf, 'feather') as sink:
+                sink.write(results)
+            return 'application/vnd.apache.arrow.file', buf.getvalue()
+        case _:
+            raise ValueError('Unknown result format: ' + str(fmt))
+    return 'application/json', json.dumps({'results': body}).encode()
+
+class BerthingServer:
+    """Request batching calculation server (see module docstring)."""
+
+    def __init__(self, max_batch=64, max_latency=0.005, vessel_library=None):
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.vessel_library = warm(vessel_library)
+        self.queue = None
+        self.pool = ThreadPoolExecutor(1)
+        self.started = time.time()
+        self.stats = {'requests': 0, 'errors': 0, 'batches': 0, 'largest batch': 0}
+
+    async def submit(self, project):
+        # Queue a project for the next batch and wait for its results
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((project, future))
+        return await future
+
+    async def _batcher(self):
+        # Collect queued requests into batches and evaluate them in the
+        # worker thread, so new requests keep arriving meanwhile
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_latency
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.stats['batches'] += 1
+            self.stats['largest batch'] = max(self.stats['largest batch'], len(batch))
+            ins.count('server batches')
+            ins.count('server requests', len(batch))
+            try:
+                out = await loop.run_in_executor(
+                    self.pool, evaluate_batch, [p for p, _ in batch], self.vessel_library)
+            except Exception as err:
+                out = [err] * len(batch)
+            for (_, future), res in zip(batch, out):
+                if not future.done():
+                    if isinstance(res, Exception):
+                        future.set_exception(res)
+                    else:
+                        future.set_result(res)
+
+    async def _respond(self, method, target, body):
+        # Route one request; returns (status, content type, body bytes)
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        match (method, url.path):
+            case ('GET', '/health'):
+                return 200, 'application/json', b'{"status": "ok"}'
+            case ('GET', '/stats'):
+                stats = dict(self.stats, uptime=time.time() - self.started,
+                             max_batch=self.max_batch, max_latency=self.max_latency)
+                return 200, 'application/json', json.dumps(stats).encode()
+            case ('POST', '/berthing'):
+                self.stats['requests'] += 1
+                try:
+                    data = json.loads(body or b'{}')
+                    fmt = query.get('format', data.get('format', 'records'))
+                    if fmt not in formats:
+                        raise ValueError('Unknown result format: ' + str(fmt))
+                    missing = [k for k in project_keys if k not in data]
+                    if missing:
+                        raise ValueError('Project is missing ' + ', '.join(missing))
+                    project = {arg: data[key] for key, arg in project_keys.items()}
+                    results = await self.submit(project)
+                    return (200,) + encode(results, fmt)
+                except Exception as err:
+                    self.stats['errors'] += 1
+                    return 400, 'application/json', json.dumps({'error': str(err)}).encode()
+        return 404, 'application/json', b'{"error": "not found"}'
+
+    async def _read_request(self, reader):
+        # Read one request; returns (method, target, version, headers,
+        # body), or None at the end of the connection. A malformed request
+        # line, header or Content-Length raises ValueError.
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            raise ValueError('Malformed request line: ' + repr(line.strip().decode('latin-1')))
+        method, target, version = parts
+        headers = {}
+        while True:
+            h = await reader.readline()
+            if h in (b'\r\n', b'\n', b''):
+                break
+            name, sep, value = h.decode('latin-1').partition(':')
+            if not sep or not name.strip() or name != name.strip():
+                raise ValueError('Malformed header: ' + repr(h.strip().decode('latin-1')))
+            headers[name.lower()] = value.strip()
+        length = headers.get('content-length', '0')
+        if not length.isdigit():
+            raise ValueError('Invalid Content-Length: ' + repr(length))
+        body = await reader.readexactly(int(length))
+        return method, target, version, headers, body
+
+    async def handle(self, reader, writer):
+        # Serve HTTP/1.1 requests on one connection (keep-alive). A
+        # malformed request gets a 400 reply and the connection is closed.
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except ValueError as err:
+                    payload = json.dumps({'error': str(err)}).encode()
+                    await self._reply(writer, 400, 'application/json', payload, True)
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+
+                status, ctype, payload = await self._respond(method.upper(), target, body)
+                close = (headers.get('connection', '').lower() == 'close'
+                         or version == 'HTTP/1.0')
+                await self._reply(writer, status, ctype, payload, close)
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _reply(self, writer, status, ctype, payload, close):
+        writer.write('HTTP/1.1 {0} {1}\r\nContent-Type: {2}\r\n'
+                     'Content-Length: {3}\r\nConnection: {4}\r\n\r\n'
+                     .format(status, reasons[status], ctype, len(payload),
+                             'close' if close else 'keep-alive').encode())
+        writer.write(payload)
+        await writer.drain()
+
+    async def serve(self, host='127.0.0.1', port=8765, path=None, ready=None):
+        """Serve until cancelled, on a Unix socket if path is given,
+        otherwise on host:port. ready, if given, is an asyncio.Event set
+        once the server is listening.
+
+        An existing file at path is only replaced if it is a stale socket
+        (nothing accepts connections on it); any other file raises
+        FileExistsError and a live socket raises OSError. On exit the
+        socket is removed only if it is still the one this server
+        created."""
+        created = None
+        if path is not None:
+            clear_socket(path)
+            server = await asyncio.start_unix_server(self.handle, path)
+            st = os.lstat(path)
+            created = (st.st_dev, st.st_ino)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        self.queue = asyncio.Queue()
+        batcher = asyncio.create_task(self._batcher())
+        try:
+            async with server:
+                if ready is not None:
+                    ready.set()
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if created is not None:
+                try:
+                    st = os.lstat(path)
+                except FileNotFoundError:
+                    pass
+                else:
+                    if (st.st_dev, st.st_ino) == created:
+                        os.remove(path)
+
+def clear_socket(path):
+    # Remove a stale Unix socket left at path by a server that did not
+    # exit cleanly. Anything else at path is left alone and raises.
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError('{0} exists and is not a socket'.format(path))
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.remove(path)
+        return
+    finally:
+        probe.close()
+    raise OSError('A server is already listening on {0}'.format(path))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='vesselberthing-server',
+        description='Serve berthing energy calculations over local HTTP.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='TCP port')
+    parser.add_argument('--unix', default=None, help='listen on this Unix socket instead')
+    parser.add_argument('--max-batch', type=int, default=64,
+                        help='largest number of requests evaluated together')
+    parser.add_argument('--max-latency', type=float, default=5.0,
+                        help='time to wait for more requests to batch (ms)')
+    parser.add_argument('--catalog', default=None,
+                        help='compiled catalog folder to use (Catalog.compile)')
+    args = parser.parse_args(argv)
+
+    if args.catalog:
+        ct.set_default_catalog(ct.Catalog.from_compiled(args.catalog))
+    server = BerthingServer(args.max_batch, args.max_latency / 1000)
+    where = args.unix or '{0}:{1}'.format(args.host, args.port)
+    print('vesselberthing server listening on ' + where, file=sys.stderr)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""This module runs parametric sweeps of the berthing calculation over water
+level, mudline, configuration factor (Cc), geometry factor (Cg) and abnormal
+berthing factor (ABF). The terms that do not depend on these parameters
+(block coefficient, radius of gyration, velocity, ship energy and
+eccentricity coefficient) are computed once per vessel and berth, and the
+sweep grid is evaluated by broadcasting. Results are returned as labeled
+arrays of shape (vessel, berth, load case, *sweep axes).
+"""
+import numpy as np
+
+from . import berthing_batch
+from . import catalog as ct
+from .functions import berth_coeff as bc
+from .functions import fndr_curves as fc
+
+# Sweep parameters and what they replace:
+#   water_level = load case water level (ft)
+#   mudline     = berth mudline elevation (ft)
+#   Cc          = berth configuration factor
+#   Cg          = load case geometry factor
+#   ABF         = load case abnormal berthing factor
+sweep_params = ('water_level', 'mudline', 'Cc', 'Cg', 'ABF')
+
+class SweepResult:
+    """Labeled result cube of a sweep.
+
+    dims names each axis, coords gives the labels (or swept values) along
+    each axis and data holds 'Energy', 'Deflection', 'Reaction', 'Cm' and
+    'Cb' arrays. Combinations that are not evaluated (vessel not using the
+    berth, Corner Protection / MV rule, or energy above the fender curve
+    for Deflection and Reaction) are NaN."""
+
+    def __init__(self, dims, coords, data):
+        self.dims = dims
+        self.coords = coords
+        self.data = data
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+    @property
+    def shape(self):
+        return tuple(len(self.coords[d]) for d in self.dims)
+
+    def sel(self, name, **labels):
+        # Select by label, e.g. res.sel('Energy', vessel='DDG-51', Cc=0.9)
+        index = []
+        for d in self.dims:
+            if d in labels:
+                index.append(list(self.coords[d]).index(labels[d]))
+            else:
+                index.append(slice(None))
+        return self.data[name][tuple(index)]
+
+    def governing(self, name, over=('vessel', 'loadcase')):
+        # Maximum of a result over the named dimensions, ignoring NaN
+        axes = tuple(self.dims.index(d) for d in over)
+        with np.errstate(invalid='ignore'):
+            return np.nanmax(self.data[name], axis=axes)
+
+class BerthingSweep:
+    """Sweep of one project definition. The case grid and the per-vessel,
+    per-berth invariants are built once; run() can then be called for any
+    number of sweep grids."""
+
+    def __init__(self, vessels, berths, loadcases, fender_dict, cp_e_dict,
+                 vessel_library=None):
+        if vessel_library is None:
+            vessel_library = ct.default_catalog().vessels
+        grid = berthing_batch.case_grid(vessels, berths, loadcases,
+                                        fender_dict, cp_e_dict, vessel_library)
+        inv = berthing_batch.case_energy(grid)
+        self.grid = grid
+        self.invariants = {'Eship': inv['Eship'], 'Ce': inv['Ce']}
+        self.labels = {'vessel': list(vessels),
+                       'berth': list(berths),
+                       'loadcase': list(loadcases)}
+        self.index = (
+            np.array([self.labels['vessel'].index(v) for v in grid['key']], dtype=int),
+            np.array([self.labels['berth'].index(b) for b in grid['berth']], dtype=int),
+            np.array([self.labels['loadcase'].index(k) for k in grid['k']], dtype=int))
+
+    def run(self, **axes):
+        """Evaluate the sweep grid given as keyword arrays, e.g.
+        run(water_level=np.arange(95, 105, 0.5), Cc=[0.9, 1.0])."""
+        for name in axes:
+            if name not in sweep_params:
+                raise ValueError('Cannot sweep ' + repr(name) + '; choose from '
+                                 + ', '.join(sweep_params))
+        names = list(axes)
+        values = [np.asarray(axes[n], dtype=float) for n in names]
+        nd = len(names)
+        g = self.grid
+
+        def row(x):
+            return x.reshape((-1,) + (1,) * nd)
+
+        def axis(i):
+            shape = [1] * (nd + 1)
+            shape[i + 1] = len(values[i])
+            return values[i].reshape(shape)
+
+        p = {n: axis(i) for i, n in enumerate(names)}
+        wl = p.get('water_level', row(g['wl']))
+        mudline = p.get('mudline', row(g['mudline']))
+        Cc = p.get('Cc', row(g['Cc']))
+        Cg = p.get('Cg', row(g['Cg']))
+        ABF = p.get('ABF', row(g['ABF']))
+
+        L, B, D = row(g['L']), row(g['B']), row(g['D'])
+        wdepth = wl - mudline
+        Cb = row(self.invariants['Ce']) * Cg * row(g['Cd']) * Cc
+        Cm = np.where(row(g['sub']), bc.Cm(L, B, D, Cb, wdepth, True),
+                                     bc.Cm(L, B, D, Cb, wdepth, False))
+        Efndr = ABF * Cm * Cb * row(self.invariants['Eship']) / row(g['nfndr']) * 1.1
+
+        sweep_shape = tuple(len(v) for v in values)
+        rows = len(g['M'])
+        Cb = np.broadcast_to(Cb, (rows,) + sweep_shape)
+        Cm = np.broadcast_to(Cm, (rows,) + sweep_shape)
+        Efndr = np.broadcast_to(Efndr, (rows,) + sweep_shape)
+
+        Deflection = np.full(Efndr.shape, np.nan)
+        Reaction = np.full(Efndr.shape, np.nan)
+        for fndr in set(g['fender_type']):
+            sel = g['fender_type'] == fndr
+            E_n = Efndr[sel] / row(g['E_rating'][sel])
+            over = E_n > fc.curve_inverse(fndr)[1][-1]
+            Dn = fc.fender_deflection(E_n, fndr, clip=True)
+            Rn = fc.Fenders[fndr][1](Dn) * row(g['R_rating'][sel])
+            Deflection[sel] = np.where(over, np.nan, Dn)
+            Reaction[sel] = np.where(over, np.nan, Rn)
+
+        dims = ('vessel', 'berth', 'loadcase') + tuple(names)
+        coords = dict(self.labels)
+        coords.update({n: v for n, v in zip(names, values)})
+        cube_shape = tuple(len(coords[d]) for d in dims)
+        data = {}
+        for name, vals in (('Energy', Efndr), ('Deflection', Deflection),
+                           ('Reaction', Reaction), ('Cm', Cm), ('Cb', Cb)):
+            cube = np.full(cube_shape, np.nan)
+            cube[self.index] = vals
+            data[name] = cube
+        return SweepResult(dims, coords, data)
+
+def berthing_sweep(vessels, berths, loadcases, fender_dict, cp_e_dict,
+                   vessel_library=None, **axes):
+    """Evaluate a sweep grid for one project definition (see BerthingSweep).
+    Returns a SweepResult."""
+    return BerthingSweep(vessels, berths, loadcases, fender_dict, cp_e_dict,
+                         vessel_library).run(**axes)
@@ -0,0 +1,275 @@
+"""This module calibrates the berthing velocity curves to recorded berthing
+logs. Log files (CSV, one row per measured approach) are read in buffered
+blocks of rows, so files of any size are processed in bounded memory, and
+each block is reduced into running statistics per exposure:
+
+  * the least squares fit of log(velocity) on log(displacement), kept as
+    mergeable moments, giving a site power law vel = a * disp**b and the
+    lognormal scatter about it, and
+  * fixed-bin velocity histograms per displacement band, giving the
+    empirical velocity distribution of each band.
+
+The calibrated curves are berthing conditions that berths can use in
+place of the UFC charts. curves() returns their coefficients for the
+[velocity] table of a project file (see cli), which every run of the
+project loads, including command line pool workers:
+
+    cal = calibrate_velocity(['2019.csv', '2020.csv'], workers=2)
+    cal.curves(quantile=0.95)   # {'site sheltered': (a, b), ...}
+
+register() adds them to berthvel.vel_coeff of the current process only,
+for berthing_energy calls made from the same script:
+
+    cal.register(quantile=0.95)
+    berths['Surface Berth 1'][2] = 'site sheltered'
+"""
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from statistics import NormalDist
+
+import numpy as np
+
+from . import histogram as hg
+from . import instrument as ins
+from .functions import berthvel as bv
+
+# Log file columns read for each quantity
+default_columns = {'displacement': 'Displacement',      # LT
+                   'velocity':     'Velocity',          # ft/s
+                   'exposure':     'Condition'}         # e.g. sheltered
+
+# Default histogram edges: displacement bands (LT) and velocity bins (ft/s)
+disp_edges = np.geomspace(100.0, 300000.0, 25)
+vel_edges = np.linspace(0.0, 3.0, 301)
+
+def _floats(values):
+    # Convert a column of strings to floats, NaN where not numeric
+    try:
+        return np.array(values, dtype=float)
+    except ValueError:
+        out = np.empty(len(values))
+        for i, v in enumerate(values):
+            try:
+                out[i] = float(v)
+            except ValueError:
+                out[i] = np.nan
+        return out
+
+def iter_log_chunks(path, columns=default_columns, chunk_rows=100000, scale=None):
+    # Yield the rows of a berthing log in blocks as dictionaries of
+    # 'displacement', 'velocity' (float arrays) and 'exposure' (object
+    # array, lower case). Rows with a missing or non-positive value are
+    # dropped; each block also reports the number of 'skipped' rows.
+    # Definitions:
+    #   path    = CSV file with a header row
+    #   columns = Header of each quantity (see default_columns)
+    #   scale   = Optional factors converting the logged displacement and
+    #             velocity to LT and ft/s, e.g. {'velocity': 3.28084}
+    scale = scale or {}
+    with open(path, newline='', buffering=1 << 20) as f:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader)]
+        missing = [c for c in columns.values() if c not in header]
+        if missing:
+            raise ValueError(path + ' has no column(s) ' + ', '.join(missing))
+        idx = [header.index(columns[k]) for k in ('displacement', 'velocity', 'exposure')]
+        width = max(idx) + 1
+
+        def block(rows):
+            short = sum(1 for r in rows if len(r) < width)
+            if short:
+                rows = [r for r in rows if len(r) >= width]
+            disp = _floats([r[idx[0]] for r in rows]) * scale.get('displacement', 1.0)
+            vel = _floats([r[idx[1]] for r in rows]) * scale.get('velocity', 1.0)
+            exposure = np.array([r[idx[2]].strip().lower() for r in rows], dtype=object)
+            ok = (disp > 0) & (vel > 0) & (exposure != '')
+            return {'displacement': disp[ok], 'velocity': vel[ok],
+                    'exposure': exposure[ok],
+                    'skipped': short + int(np.count_nonzero(~ok))}
+
+        while True:
+            rows = list(islice(reader, chunk_rows))
+            if not rows:
+                break
+            yield block(rows)
+
+class VelocityCalibration:
+    """Running velocity statistics per exposure, built with update() from
+    blocks of log rows and combined across files or workers with merge().
+    The fitted power laws are available at any time."""
+
+    def __init__(self, disp_edges=disp_edges, vel_edges=vel_edges):
+        self.disp_edges = np.asarray(disp_edges, dtype=float)
+        self.vel_edges = np.asarray(vel_edges, dtype=float)
+        self.moments = {}       # exposure -> [n, mean x, mean y, Sxx, Sxy, Syy]
+        self.counts = {}        # exposure -> (displacement band, velocity bin)
+        self.skipped = 0
+
+    def update(self, disp, vel, exposure):
+        """Fold measured displacements (LT), velocities (ft/s) and exposure
+        labels into the statistics. Returns self."""
+        disp = np.asarray(disp, dtype=float)
+        vel = np.asarray(vel, dtype=float)
+        exposure = np.asarray(exposure, dtype=object)
+        n_band = len(self.disp_edges) - 1
+        for cond in set(exposure.tolist()):
+            sel = exposure == cond
+            x = np.log(disp[sel])
+            y = np.log(vel[sel])
+            dx = x - x.mean()
+            dy = y - y.mean()
+            part = [len(x), x.mean(), y.mean(), dx @ dx, dx @ dy, dy @ dy]
+            self.moments[cond] = self._combine(self.moments.get(cond), part)
+
+            band = np.clip(np.searchsorted(self.disp_edges, disp[sel], side='right') - 1,
+                           0, n_band - 1)
+            counts = self.counts.setdefault(
+                cond, np.zeros((n_band, len(self.vel_edges)), dtype=np.int64))
+            for b in np.unique(band):
+                counts[b] += hg.bin_counts(vel[sel][band == b], self.vel_edges)
+        if ins.enabled:
+            ins.count('velocity records', len(disp))
+        return self
+
+    @staticmethod
+    def _combine(a, b):
+        # Pooled count, means and co-moments of two groups
+        if a is None:
+            return list(b)
+        n = a[0] + b[0]
+        dx = b[1] - a[1]
+        dy = b[2] - a[2]
+        w = a[0] * b[0] / n
+        return [n, a[1] + dx * b[0] / n, a[2] + dy * b[0] / n,
+                a[3] + b[3] + dx * dx * w, a[4] + b[4] + dx * dy * w,
+                a[5] + b[5] + dy * dy * w]
+
+    def merge(self, other):
+        """Combine the statistics of another calibration with the same
+        histogram edges. Returns self."""
+        if (not np.array_equal(other.disp_edges, self.disp_edges)
+                or not np.array_equal(other.vel_edges, self.vel_edges)):
+            raise ValueError('Cannot merge calibrations with different bins')
+        for cond, m in other.moments.items():
+            self.moments[cond] = self._combine(self.moments.get(cond), m)
+            if cond in self.counts:
+                self.counts[cond] = self.counts[cond] + other.counts[cond]
+            else:
+                self.counts[cond] = other.counts[cond].copy()
+        self.skipped += other.skipped
+        return self
+
+    def fit(self, cond):
+        # Power law fit of one exposure: {'a', 'b', 'sigma', 'n'} with
+        # vel = a * disp**b the median velocity and sigma the standard
+        # deviation of log(velocity) about it. NaN with fewer than three
+        # records or a single displacement.
+        n, mx, my, sxx, sxy, syy = self.moments[cond]
+        if n < 3 or sxx <= 0:
+            return {'a': np.nan, 'b': np.nan, 'sigma': np.nan, 'n': n}
+        b = sxy / sxx
+        sigma = np.sqrt(max(syy - b * sxy, 0.0) / (n - 2))
+        return {'a': float(np.exp(my - b * mx)), 'b': float(b),
+                'sigma': float(sigma), 'n': n}
+
+    def vel_coeff(self, quantile=0.5):
+        # Power curve coefficients (a, b) of every fitted exposure at the
+        # given quantile of the lognormal scatter, in berthvel.vel_coeff
+        # form
+        z = NormalDist().inv_cdf(quantile)
+        coeff = {}
+        for cond in sorted(self.moments):
+            f = self.fit(cond)
+            if not np.isnan(f['b']):
+                coeff[cond] = (f['a'] * np.exp(z * f['sigma']), f['b'])
+        return coeff
+
+    def velocity(self, disp, cond, quantile=0.5):
+        # Calibrated velocity (ft/s) for displacements (LT)
+        a, b = self.vel_coeff(quantile)[cond]
+        return a * np.asarray(disp, dtype=float)**b
+
+    def curves(self, quantile=0.95, prefix='site '):
+        """Calibrated curves at the given quantile as (a, b) keyed by
+        prefix + exposure (e.g. 'site sheltered'), for the [velocity]
+        table of a project file or berthvel.load_vel_coeff."""
+        return {prefix + cond: (float(a), float(b))
+                for cond, (a, b) in self.vel_coeff(quantile).items()}
+
+    def register(self, quantile=0.95, prefix='site '):
+        """Add curves(quantile, prefix) to berthvel.vel_coeff and return
+        the registered names. Only the current process sees them: the
+        command line runner and pool workers do not, so give them in the
+        project's [velocity] table there."""
+        coeff = self.curves(quantile, prefix)
+        bv.load_vel_coeff(coeff)
+        return list(coeff)
+
+    def band_percentiles(self, cond, percentiles=(50, 90, 95, 99)):
+        # Empirical velocity percentiles (ft/s) of each displacement band,
+        # NaN for bands without records. Velocities above the last
+        # histogram edge are reported at that edge.
+        counts = self.counts[cond]
+        out = {}
+        for q in percentiles:
+            out[q] = np.array([hg.percentile(self.vel_edges, c, q, self.vel_edges[-1])
+                               if c.sum() else np.nan for c in counts])
+        return {'displacement': np.sqrt(self.disp_edges[:-1] * self.disp_edges[1:]),
+                'records': counts.sum(axis=1), 'percentiles': out}
+
+    def save(self, path):
+        # Write the statistics to a JSON file
+        data = {'disp_edges': self.disp_edges.tolist(),
+                'vel_edges': self.vel_edges.tolist(),
+                'skipped': self.skipped,
+                'moments': {c: [float(v) for v in m] for c, m in self.moments.items()},
+                'counts': {c: v.tolist() for c, v in self.counts.items()}}
+        with open(path, 'w') as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path):
+        # Read statistics written by save()
+        with open(path, 'r') as f:
+            data = json.load(f)
+        cal = cls(data['disp_edges'], data['vel_edges'])
+        cal.skipped = data['skipped']
+        cal.moments = {c: [int(m[0])] + m[1:] for c, m in data['moments'].items()}
+        cal.counts = {c: np.array(v, dtype=np.int64) for c, v in data['counts'].items()}
+        return cal
+
+def _calibrate_file(args):
+    # Statistics of one log file, for the process pool
+    path, columns, chunk_rows, scale, d_edges, v_edges = args
+    cal = VelocityCalibration(d_edges, v_edges)
+    for chunk in iter_log_chunks(path, columns, chunk_rows, scale):
+        cal.update(chunk['displacement'], chunk['velocity'], chunk['exposure'])
+        cal.skipped += chunk['skipped']
+    return cal
+
+def calibrate_velocity(paths, columns=default_columns, chunk_rows=100000,
+                       scale=None, disp_edges=disp_edges, vel_edges=vel_edges,
+                       workers=1):
+    """Stream berthing log files into a VelocityCalibration. Files are read
+    in blocks of chunk_rows rows (see iter_log_chunks); with workers > 1
+    (None for every CPU) they are processed in a process pool and the
+    statistics merged in file order."""
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    args = [(p, columns, chunk_rows, scale, disp_edges, vel_edges) for p in paths]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(args)))
+
+    cal = VelocityCalibration(disp_edges, vel_edges)
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            parts = list(pool.map(_calibrate_file, args))
+    else:
+        parts = map(_calibrate_file, args)
+    for part in parts:
+        cal.merge(part)
+    return cal
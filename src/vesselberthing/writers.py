@@ -0,0 +1,133 @@
+"""This module writes berthing results to disk a block at a time. Results may
+be a single berthing_energy dictionary or the chunks yielded by
+iter_berthing_energy; only one chunk is held in memory at once.
+
+CSV output is always available. Parquet and Feather output require the
+optional pyarrow package.
+"""
+import csv
+import os
+
+import numpy as np
+
+from . import instrument as ins
+from . import results as rs
+
+class CSVSink:
+    """Buffered CSV writer for result chunks. The header is taken from the
+    first table written. Values are written as stored, so eccentricities
+    keep the form they were given in (see results.numeric_objects)."""
+
+    def __init__(self, output, buffer_size=1 << 20):
+        self.output = output
+        self.f = open(output, 'w', newline='', buffering=buffer_size)
+        self.writer = csv.writer(self.f)
+        self.names = None
+        self.rows = 0
+        self.bytes = 0
+
+    def write(self, chunk):
+        # Write every table of a results dictionary
+        for table in chunk.values():
+            if self.names is None:
+                self.names = table.names
+                self.writer.writerow(self.names)
+            self.writer.writerows(table.rows())
+            self.rows += len(table)
+
+    def close(self):
+        if self.names is None:
+            self.writer.writerow([name for name, _ in rs.fields])
+        self.f.flush()
+        self.bytes = self.f.tell()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ArrowSink:
+    """Columnar writer for result chunks using pyarrow. Each chunk is
+    written as one Parquet row group or Feather (Arrow IPC) record batch.
+    output is a file path or a writable binary file object."""
+
+    def __init__(self, output, fmt='parquet'):
+        try:
+            import pyarrow as pa
+        except ImportError as err:
+            raise ImportError('Parquet/Feather output requires pyarrow '
+                              '(pip install pyarrow)') from err
+        self.pa = pa
+        self.output = output
+        self.fmt = fmt
+        self.writer = None
+        self.rows = 0
+        self.bytes = 0
+
+    def _batch(self, table):
+        cols = {}
+        for name in table.names:
+            col = table[name]
+            if name in rs.numeric_objects:
+                cols[name] = self.pa.array(col.astype(float))
+            elif col.dtype == object:
+                cols[name] = self.pa.array(col.tolist(), type=self.pa.string())
+            else:
+                cols[name] = self.pa.array(np.ascontiguousarray(col))
+        return self.pa.record_batch(list(cols.values()), names=list(cols))
+
+    def write(self, chunk):
+        for table in chunk.values():
+            batch = self._batch(table)
+            if self.writer is None:
+                if self.fmt == 'parquet':
+                    import pyarrow.parquet as pq
+                    self.writer = pq.ParquetWriter(self.output, batch.schema)
+                else:
+                    self.writer = self.pa.ipc.new_file(self.output, batch.schema)
+            if self.fmt == 'parquet':
+                self.writer.write_table(self.pa.Table.from_batches([batch]))
+            else:
+                self.writer.write_batch(batch)
+            self.rows += len(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            if isinstance(self.output, (str, os.PathLike)):
+                self.bytes = os.path.getsize(self.output)
+            else:
+                self.bytes = self.output.tell()     # file object, e.g. BytesIO
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_sink(output, fmt=None):
+    # Open a sink for the output path. The format is taken from the file
+    # extension unless given: 'csv', 'parquet' or 'feather'.
+    if fmt is None:
+        ext = os.path.splitext(output)[1].lower()
+        fmt = {'.parquet': 'parquet', '.pq': 'parquet',
+               '.feather': 'feather', '.arrow': 'feather'}.get(ext, 'csv')
+    match fmt:
+        case 'csv':
+            return CSVSink(output)
+        case 'parquet' | 'feather':
+            return ArrowSink(output, fmt)
+    raise ValueError('Unknown output format: ' + str(fmt))
+
+def write_results(chunks, output, fmt=None):
+    # Stream result chunks to a file and return the number of rows written.
+    # Rows are written in chunk order, grouped by fender within each chunk.
+    with ins.stage('write'):
+        with open_sink(output, fmt) as sink:
+            for chunk in chunks:
+                sink.write(chunk)
+    ins.count('rows written', sink.rows)
+    ins.count('bytes written', sink.bytes)
+    return sink.rows
@@ -10,7 +10,7 @@ dependancies, please contact Aaron Fortier (afortier@moffattnichol.com).
 '''
 import sys
 import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..\\src')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
 
 import vesselberthing.berthing_energy as mb
 
@@ -0,0 +1,33 @@
+import os
+
+import numpy as np
+import pytest
+
+from vesselberthing.cli import load_project
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLE = os.path.join(HERE, '11173-03 Project.toml')
+
+
+@pytest.fixture(scope='session')
+def sample_project():
+    # The berthing_energy arguments of the sample project
+    project = load_project(SAMPLE)
+    return {k: project[k] for k in ('vessels', 'berths', 'loadcases',
+                                    'fender_dict', 'cp_e_dict')}
+
+
+def assert_tables_close(a, b, rtol=1e-9, atol=1e-12):
+    # Compare two result dictionaries fender by fender: same fenders, same
+    # rows in the same order, text columns equal, numbers within tolerance
+    assert list(a) == list(b)
+    for fender in a:
+        ta, tb = a[fender], b[fender]
+        assert len(ta) == len(tb), fender
+        for name in ta.names:
+            ca, cb = ta[name], tb[name]
+            if ca.dtype == object:
+                assert ca.tolist() == cb.tolist(), (fender, name)
+            else:
+                np.testing.assert_allclose(ca, cb, rtol=rtol, atol=atol,
+                                           err_msg=fender + ': ' + name)
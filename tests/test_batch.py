@@ -0,0 +1,131 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from vesselberthing import berthing_energy as mb
+from vesselberthing import plan as pl
+from vesselberthing import results as rs
+from vesselberthing.cache import ResultCache
+
+from .conftest import assert_tables_close
+
+
+def test_batch_matches_loop(sample_project):
+    loop = mb.berthing_energy(**sample_project, output=None)
+    batch = mb.berthing_energy(**sample_project, output=None, batch=True)
+    assert sum(len(t) for t in loop.values()) == 126
+    assert_tables_close(loop, batch)
+
+
+def test_iter_matches_batch(sample_project):
+    batch = mb.berthing_energy(**sample_project, output=None, batch=True)
+    chunks = list(mb.iter_berthing_energy(**sample_project, chunk_size=10))
+    assert len(chunks) > 1
+    merged = rs.concat_results(*chunks)
+    assert_tables_close(batch, {f: merged[f] for f in batch})
+
+
+def test_plan_matches_batch(sample_project):
+    batch = mb.berthing_energy(**sample_project, output=None, batch=True)
+    plan = pl.compile_plan(*sample_project.values())
+    assert_tables_close(batch, plan.run())
+
+
+def test_plan_overrides_match_batch(sample_project):
+    # Replacing the configuration factor in the plan is the same as
+    # editing the berths
+    plan = pl.compile_plan(*sample_project.values())
+    berths = {k: v[:3] + [0.9] for k, v in sample_project['berths'].items()}
+    edited = mb.berthing_energy(**dict(sample_project, berths=berths),
+                                output=None, batch=True)
+    assert_tables_close(edited, plan.run(Cc=0.9))
+
+
+def test_option_modes_keep_nominal_columns(sample_project):
+    batch = mb.berthing_energy(**sample_project, output=None, batch=True)
+    for options in ({'sensitivity': True}, {'bounds': True}):
+        res = mb.berthing_energy(**sample_project, output=None, **options)
+        nominal = {f: rs.ResultTable(np.asarray(t.data[list(rs.result_dtype.names)],
+                                                dtype=rs.result_dtype))
+                   for f, t in res.items()}
+        assert_tables_close(batch, nominal)
+
+
+def test_plan_partial_override_matches_batch(sample_project):
+    # Only the rows of the edited load case are solved again
+    plan = pl.compile_plan(*sample_project.values())
+    loadcases = dict(sample_project['loadcases'])
+    name = next(iter(loadcases))
+    loadcases[name] = loadcases[name][:3] + [loadcases[name][3] + 1.0]
+    edited = mb.berthing_energy(**dict(sample_project, loadcases=loadcases),
+                                output=None, batch=True)
+    wl = plan.expand('loadcase', {k: v[3] for k, v in loadcases.items()})
+    assert_tables_close(edited, plan.run(wl=wl))
+
+
+def test_plan_scalar_velocity(sample_project):
+    plan = pl.compile_plan(*sample_project.values())
+    for f, t in plan.run(V=0.3).items():
+        assert np.all(t['Vel'] == 0.3)
+
+
+def test_plan_is_immutable(sample_project):
+    plan = pl.compile_plan(*sample_project.values())
+    nominal = plan.run()
+    for mapping in (plan.grid, plan.labels, plan.index, plan.groups,
+                    plan.types, plan.blocks):
+        with pytest.raises(TypeError):
+            mapping['M'] = None
+    fender = next(iter(plan.blocks))
+    with pytest.raises(TypeError):
+        plan.blocks[fender]['Cc'] = None
+    with pytest.raises(ValueError):
+        plan.grid['M'][0] = 1.0
+    with pytest.raises(AttributeError):
+        plan.grid = {}
+    with pytest.raises(ValueError, match='Cannot replace'):
+        plan.run(Efndr=1.0)
+    assert_tables_close(nominal, plan.run(), rtol=0, atol=0)
+
+
+def test_plan_pickles_frozen(sample_project):
+    plan = pl.compile_plan(*sample_project.values())
+    copy = pickle.loads(pickle.dumps(plan))
+    with pytest.raises(TypeError):
+        copy.grid['M'] = None
+    assert not copy.grid['M'].flags.writeable
+    assert_tables_close(plan.run(Cc=0.9), copy.run(Cc=0.9), rtol=0, atol=0)
+
+
+@pytest.mark.parametrize('options', [
+    {'bounds': True, 'cache': 'cache'},
+    {'lines': {}, 'sensitivity': True},
+    {'sensitivity': True, 'bounds': True},
+    {'lines': {}, 'cache': 'cache'},
+])
+def test_combined_options_are_rejected(sample_project, tmp_path, options):
+    if 'cache' in options:
+        options = dict(options, cache=ResultCache(str(tmp_path / 'cache')))
+    with pytest.raises(ValueError, match='cannot combine'):
+        mb.berthing_energy(**sample_project, output=None, **options)
+
+
+def test_batch_with_cache_is_accepted(sample_project, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    batch = mb.berthing_energy(**sample_project, output=None, batch=True)
+    res = mb.berthing_energy(**sample_project, output=None, batch=True, cache=cache)
+    assert cache.misses > 0
+    assert_tables_close(batch, res, rtol=0, atol=0)
+
+
+def test_plan_abf_override_matches_batch(sample_project):
+    # Replacing the accidental berthing factor relabels the cases as well
+    plan = pl.compile_plan(*sample_project.values())
+    loadcases = {k: [v[0], 1.5] + v[2:] for k, v in sample_project['loadcases'].items()}
+    edited = mb.berthing_energy(**dict(sample_project, loadcases=loadcases),
+                                output=None)
+    res = plan.run(ABF=1.5)
+    assert_tables_close(edited, res)
+    for t in res.values():
+        assert set(t['Berthing Condition']) <= {'Accidental'}
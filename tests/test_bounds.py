@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from vesselberthing import berthing_energy as mb
+from vesselberthing import bounds as bd
+from vesselberthing.functions import fndr_curves as fc
+
+
+@pytest.fixture(scope='module')
+def default_bounds(sample_project):
+    return mb.berthing_energy(**sample_project, output=None, bounds=True)
+
+
+def test_nominal_lies_within_bounds(sample_project, default_bounds):
+    batch = mb.berthing_energy(**sample_project, output=None, batch=True)
+    assert list(default_bounds) == list(batch)
+    for fender, table in default_bounds.items():
+        for name in ('Deflection', 'Reaction'):
+            np.testing.assert_array_equal(table[name], batch[fender][name])
+            lo, hi = table[name + ' Min'], table[name + ' Max']
+            assert np.all(np.isfinite(lo) & np.isfinite(hi)), fender
+            assert np.all(lo <= table[name]), (fender, name)
+            assert np.all(table[name] <= hi), (fender, name)
+
+
+def test_default_tolerance_widens_as_the_factor_table(default_bounds):
+    (E_min, E_max), (R_min, R_max) = bd.factor_range(bd.default_factors)
+    assert (E_min, E_max) == (R_min, R_max) == (0.9, 1.1)
+    for fender, table in default_bounds.items():
+        fndr = table['Fender Type'][0]
+        E_n = table['Energy'] / table['Rated Energy']
+
+        # Deflection on the softest and stiffest energy curves
+        np.testing.assert_allclose(table['Deflection Max'],
+                                   fc.fender_deflection(E_n / E_min, fndr), rtol=1e-12)
+        np.testing.assert_allclose(table['Deflection Min'],
+                                   fc.fender_deflection(E_n / E_max, fndr), rtol=1e-12)
+
+        # Reaction range over that deflection range, scaled by the factors
+        R_lo, R_hi = bd.curve_range(fndr, table['Deflection Min'], table['Deflection Max'])
+        np.testing.assert_allclose(table['Reaction Max'],
+                                   R_hi * table['Rated Reaction'] * R_max, rtol=1e-12)
+        np.testing.assert_allclose(table['Reaction Min'],
+                                   R_lo * table['Rated Reaction'] * R_min, rtol=1e-12)
+        assert np.all(table['Reaction Max'] >= table['Reaction'] * R_max * (1 - 1e-12))
+        assert np.all(table['Reaction Min'] <= table['Reaction'] * R_min * (1 + 1e-12))
+
+
+def test_factor_tables_set_the_width(sample_project, default_bounds):
+    fndrs = {v[0] for v in sample_project['fender_dict'].values()}
+    exact = mb.berthing_energy(**sample_project, output=None,
+                               bounds={f: {'tolerance': (1.0, 1.0)} for f in fndrs})
+    wide = mb.berthing_energy(**sample_project, output=None,
+                              bounds={f: {'tolerance': (0.9, 1.1),
+                                          'temperature': (0.95, 1.05)} for f in fndrs})
+    for fender, table in default_bounds.items():
+        for name in ('Deflection', 'Reaction'):
+            nominal = table[name]
+            np.testing.assert_allclose(exact[fender][name + ' Min'], nominal, rtol=1e-12)
+            np.testing.assert_allclose(exact[fender][name + ' Max'], nominal, rtol=1e-12)
+            assert np.all(wide[fender][name + ' Min'] <= table[name + ' Min'])
+            assert np.all(wide[fender][name + ' Max'] >= table[name + ' Max'])
@@ -0,0 +1,101 @@
+import pickle
+
+import numpy as np
+
+from vesselberthing import berthing_energy as mb
+from vesselberthing import results as rs
+from vesselberthing.cache import ResultCache
+from vesselberthing.functions import berthvel as bv
+
+from .conftest import assert_tables_close
+
+
+def test_cache_miss_then_hit(sample_project, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    batch = mb.berthing_energy(**sample_project, output=None, batch=True)
+
+    first = mb.berthing_energy(**sample_project, output=None, cache=cache)
+    blocks = cache.misses
+    assert blocks > 0 and cache.hits == 0 and cache.writes == blocks
+    assert_tables_close(batch, first, rtol=0, atol=0)
+
+    second = mb.berthing_energy(**sample_project, output=None, cache=cache)
+    assert cache.hits == blocks and cache.misses == blocks
+    assert cache.writes == blocks
+    assert_tables_close(batch, second, rtol=0, atol=0)
+
+
+def test_changed_berth_misses(sample_project, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    mb.berthing_energy(**sample_project, output=None, cache=cache)
+    misses = cache.misses
+
+    # Only the blocks at the edited berth are recomputed
+    berths = dict(sample_project['berths'])
+    berths['Surface Berth 2'] = berths['Surface Berth 2'][:3] + [0.9]
+    project = dict(sample_project, berths=berths)
+    res = mb.berthing_energy(**project, output=None, cache=cache)
+    edited = sum('Surface Berth 2' in v[2] for v in project['vessels'].values())
+    assert cache.misses == misses + edited
+    assert_tables_close(mb.berthing_energy(**project, output=None, batch=True), res)
+
+
+def test_eviction_keeps_size_bound(sample_project, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), max_bytes=20000)
+    mb.berthing_energy(**sample_project, output=None, cache=cache)
+    assert cache.size() <= 20000
+    assert cache.evictions > 0
+
+
+def test_blocks_are_stored_without_pickle(sample_project, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    mb.berthing_energy(**sample_project, output=None, cache=cache)
+    for _, _, path in cache._entries():
+        with open(path, 'rb') as f:
+            arr = np.load(f, allow_pickle=False)
+        assert arr.dtype.names == rs.result_dtype.names
+
+
+def test_pickled_entry_is_not_loaded(sample_project, tmp_path):
+    # A pickle planted in the cache folder is never unpickled; the block is
+    # recomputed and the entry replaced
+    cache = ResultCache(str(tmp_path / 'cache'))
+    ref = mb.berthing_energy(**sample_project, output=None, cache=cache)
+    entries = [e[2] for e in cache._entries()]
+    for path in entries:
+        with open(path, 'wb') as f:
+            f.write(pickle.dumps(Exploit()))
+    res = mb.berthing_energy(**sample_project, output=None, cache=cache)
+    assert not Exploit.called
+    assert_tables_close(ref, res, rtol=0, atol=0)
+    assert cache.writes == 2 * len(entries)
+
+
+class Exploit:
+    called = False
+
+    def __reduce__(self):
+        return (Exploit._run, ())
+
+    @staticmethod
+    def _run():
+        Exploit.called = True
+
+
+def test_registered_velocity_curve_misses(sample_project, tmp_path):
+    # Replacing the coefficients of a berthing condition (e.g. a registered
+    # velocity calibration) must not return blocks of the old curve
+    cache = ResultCache(str(tmp_path / 'cache'))
+    before = mb.berthing_energy(**sample_project, output=None, cache=cache)
+    saved = dict(bv.vel_coeff)
+    try:
+        a, b = bv.vel_coeff['sheltered']
+        bv.load_vel_coeff({'sheltered': (a * 1.2, b)})
+        after = mb.berthing_energy(**sample_project, output=None, cache=cache)
+        fresh = mb.berthing_energy(**sample_project, output=None, batch=True)
+    finally:
+        bv.vel_coeff.clear()
+        bv.vel_coeff.update(saved)
+    assert_tables_close(fresh, after)
+    for f in before:
+        np.testing.assert_allclose(after[f]['Vel'], before[f]['Vel'] * 1.2, rtol=1e-12)
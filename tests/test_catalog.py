@@ -0,0 +1,50 @@
+import json
+
+import numpy as np
+
+from vesselberthing import catalog as ct
+
+
+def test_compiled_catalog_matches_json(tmp_path):
+    json_cat = ct.Catalog()
+    compiled = ct.Catalog.from_compiled(json_cat.compile(str(tmp_path / 'catalog')))
+
+    assert isinstance(compiled.vessel_table, np.memmap)
+    assert dict(compiled.vessels) == json_cat.vessels
+    for cls in {v['Vessel Class'] for v in json_cat.vessels.values()}:
+        assert compiled.by_class(cls) == json_cat.by_class(cls)
+    for low, high in ((0.0, np.inf), (5000.0, 50000.0), (1e9, 2e9)):
+        assert compiled.by_displacement(low, high) == json_cat.by_displacement(low, high)
+
+    groups = {g: v for g, v in json_cat.fenders.items() if g in ct.fender_groups}
+    assert compiled.fenders == groups
+    for fndr in set(ct.fender_groups.values()):
+        np.testing.assert_array_equal(compiled.by_fender_type(fndr),
+                                      json_cat.by_fender_type(fndr))
+
+
+def test_by_displacement_is_sorted_and_bounded():
+    cat = ct.Catalog()
+    names = cat.by_displacement(5000.0, 50000.0)
+    disp = [cat.vessels[n]['Displacement'] for n in names]
+    assert disp == sorted(disp)
+    assert all(5000.0 <= d <= 50000.0 for d in disp)
+    assert len(cat.by_displacement()) == len(cat.vessels)
+
+
+def test_integer_fields_stay_integers(tmp_path):
+    vessels = {'A': {'Vessel Class': 'X', 'Displacement': 1000.0, 'Berths': 2},
+               'B': {'Vessel Class': 'X', 'Displacement': 2000.0}}
+    fenders = {'Pneumatic Fenders': {'P1': {'Height': 3, 'Length': 6, 'E_rated': 100.0}}}
+    vessel_path = tmp_path / 'Vessels.json'
+    fender_path = tmp_path / 'fenders.json'
+    vessel_path.write_text(json.dumps(vessels))
+    fender_path.write_text(json.dumps(fenders))
+
+    json_cat = ct.Catalog(str(vessel_path), str(fender_path))
+    compiled = ct.Catalog.from_compiled(json_cat.compile(str(tmp_path / 'catalog')))
+    assert dict(compiled.vessels) == vessels
+    assert type(compiled.vessels['A']['Berths']) is int
+    assert 'Berths' not in compiled.vessels['B']
+    assert compiled.fenders == fenders
+    assert type(compiled.fenders['Pneumatic Fenders']['P1']['Height']) is int
@@ -0,0 +1,77 @@
+import json
+import os
+
+from vesselberthing import berthing_energy as mb
+from vesselberthing import cli
+
+from .conftest import SAMPLE
+
+try:
+    import tomllib
+except ImportError:
+    import tomli as tomllib
+
+
+def write_projects(tmp_path):
+    # The sample project and a JSON copy with two vessels fewer
+    with open(SAMPLE, 'rb') as f:
+        raw = tomllib.load(f)
+    raw['name'] = 'wharf-b'
+    for v in ('SSN-688', 'LCS-2'):
+        del raw['vessels'][v]
+        raw['cp_e'].pop(v, None)
+    second = tmp_path / 'wharf-b.json'
+    second.write_text(json.dumps(raw))
+    return [SAMPLE, str(second)]
+
+
+def expected_csv(path, tmp_path):
+    project = cli.load_project(path)
+    results = mb.berthing_energy(project['vessels'], project['berths'],
+                                 project['loadcases'], project['fender_dict'],
+                                 project['cp_e_dict'], None, batch=True)
+    out = str(tmp_path / (project['name'] + '.csv'))
+    mb.print_fndr_csv(results, out)
+    with open(out) as f:
+        return project['name'], project['output']['csv'], f.read()
+
+
+def run(paths, outdir, cache, summary):
+    code = cli.main(paths + ['--outdir', str(outdir), '--workers', '2', '--cache',
+                             str(cache), '--no-charts', '--summary', str(summary)])
+    with open(summary) as f:
+        return code, json.load(f)['projects']
+
+
+def test_main_runs_projects_and_reuses_cache(tmp_path, capsys):
+    paths = write_projects(tmp_path)
+    cache = tmp_path / 'cache'
+
+    code, first = run(paths, tmp_path / 'out', cache, tmp_path / 'first.json')
+    assert code == 0
+    assert [s['ok'] for s in first] == [True, True]
+    for path, s in zip(paths, first):
+        name, csv, text = expected_csv(path, tmp_path)
+        assert s['name'] == name
+        with open(os.path.join(tmp_path, 'out', name, csv)) as f:
+            assert f.read() == text
+        assert s['cache']['hits'] == 0 and s['cache']['misses'] > 0
+
+    code, second = run(paths, tmp_path / 'rerun', cache, tmp_path / 'second.json')
+    assert code == 0
+    for s, f in zip(second, first):
+        assert s['rows'] == f['rows']
+        assert s['cache']['misses'] == 0
+        assert s['cache']['hits'] == f['cache']['misses']
+    assert '2 projects, 0 failed' in capsys.readouterr().out
+
+
+def test_main_reports_failed_project(tmp_path, capsys):
+    bad = tmp_path / 'bad.json'
+    bad.write_text(json.dumps({'name': 'bad', 'vessels': {}}))
+    code = cli.main([SAMPLE, str(bad), '--outdir', str(tmp_path), '--workers', '2',
+                     '--no-charts'])
+    assert code == 1
+    out = capsys.readouterr().out
+    assert '2 projects, 1 failed' in out
+    assert str(bad) in out
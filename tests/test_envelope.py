@@ -0,0 +1,41 @@
+import numpy as np
+
+from vesselberthing import berthing_energy as mb
+from vesselberthing import envelope as ev
+from vesselberthing import results as rs
+
+
+def test_top_k_keeps_table_order_on_ties():
+    vals = np.array([1.0, 3.0, 2.0, 3.0, np.nan, 3.0, 2.0])
+    data = np.zeros(len(vals), dtype=rs.result_dtype)
+    data['Energy'] = vals
+    data['Vessel'] = ['v{0}'.format(i) for i in range(len(vals))]
+    table = rs.ResultTable(data)
+    for k, expected in ((1, ['v1']), (2, ['v1', 'v3']), (4, ['v1', 'v3', 'v5', 'v2']),
+                        (7, ['v1', 'v3', 'v5', 'v2', 'v6', 'v0', 'v4'])):
+        assert ev._top(table, 'Energy', k)['Vessel'].tolist() == expected
+
+
+def test_envelope_independent_of_chunking(sample_project):
+    # Many loadcases give equal Energy (e.g. LAT/HAT pairs), so ties at the
+    # k-th row must resolve the same way for every chunk size
+    full = mb.berthing_energy(**sample_project, output=None, batch=True)
+    ref = ev.Envelope(k=5).update(full)
+    for chunk_size in (1, 7, 30):
+        env = ev.Envelope(k=5)
+        for chunk in mb.iter_berthing_energy(**sample_project, chunk_size=chunk_size):
+            env.update(chunk)
+        for fender in ref.tables:
+            for m in ev.metrics:
+                a, b = ref[fender][m], env[fender][m]
+                assert a['Vessel'].tolist() == b['Vessel'].tolist()
+                assert a['Load Case'].tolist() == b['Load Case'].tolist()
+
+
+def test_envelope_matches_sorted_table(sample_project):
+    full = mb.berthing_energy(**sample_project, output=None, batch=True)
+    env = ev.berthing_envelope(*sample_project.values(), k=3)
+    for fender, table in full.items():
+        for m in ev.metrics:
+            expected = np.sort(table[m])[::-1][:3]
+            np.testing.assert_allclose(env[fender][m][m], expected, rtol=1e-12)
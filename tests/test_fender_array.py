@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from vesselberthing import berthing_energy as mb
+from vesselberthing import fender_array as fa
+
+
+def lines_for(project, yaw):
+    return {b: [40.0, yaw] for b in project['berths']}
+
+
+def test_no_yaw_matches_even_split(sample_project):
+    batch = mb.berthing_energy(**sample_project, output=None, batch=True)
+    res = mb.berthing_energy(**sample_project, output=None,
+                             lines=lines_for(sample_project, 0.0))
+    for f in batch:
+        np.testing.assert_allclose(res[f]['Energy'], batch[f]['Energy'], rtol=1e-9)
+        np.testing.assert_allclose(res[f]['Reaction'], batch[f]['Reaction'], rtol=1e-9)
+
+
+def test_eccentric_impacts_are_point_contacts(sample_project):
+    # Quarter point and corner protection rows keep the single fender
+    # model for any yaw; only broadside rows share the energy
+    batch = mb.berthing_energy(**sample_project, output=None, batch=True)
+    res = mb.berthing_energy(**sample_project, output=None,
+                             lines=lines_for(sample_project, 3.0))
+    for f, table in res.items():
+        point = table['Berthing Configuration'] != 'Broadside'
+        assert np.all(table['Fenders in Contact'][point] == 1)
+        np.testing.assert_allclose(table['Energy'][point], batch[f]['Energy'][point],
+                                   rtol=1e-12)
+        broadside = ~point
+        assert np.all(table['Energy'][broadside] >= batch[f]['Energy'][broadside] * (1 - 1e-9))
+
+
+def test_share_energy_reports_non_convergence():
+    gaps = np.array([[0.0, 0.01, 0.05]])
+    args = ('pneumatic', np.array([400.0]), gaps, 1339.0, 678.0, 8.0)
+    res = fa.share_energy(*args)
+    assert res['Energy'].sum() == pytest.approx(400.0, rel=1e-10)
+    with pytest.raises(ValueError, match='did not converge'):
+        fa.share_energy(*args, max_iter=1)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from vesselberthing import catalog as ct
+from vesselberthing import fender_select as fs
+from vesselberthing.functions import fndr_curves as fc
+
+
+def candidate(name, E, R, cost=None):
+    return {'Name': name, 'E_rated': E, 'R_rated': R, 'D_rated': 0.6,
+            'cost': E if cost is None else cost}
+
+
+def test_selection_covers_demand_with_least_reaction(sample_project):
+    demands = fs.fender_demands(**sample_project)
+    selection = fs.select_fenders(**sample_project, cost='R_rated')
+    checked = 0
+    for g, sel in selection.items():
+        fndr = sample_project['fender_dict'][g][0]
+        cand = ct.default_catalog().by_fender_type(fndr)
+        E_max = demands[g].max()
+        adequate = cand[cand['E_rated'] >= E_max]
+        if len(adequate) == 0:
+            assert sel is None
+            continue
+        checked += 1
+        assert sel['E_rated'] >= E_max
+        assert sel['Energy'] == E_max
+        assert sel['R_rated'] == adequate['R_rated'].min()
+        # Governing reaction over every demand (the MV curve peaks before
+        # the largest energy), deflection at the largest energy
+        D, R = fc.fender_reaction_arr(np.unique(demands[g]), sel['E_rated'],
+                                      sel['R_rated'], fndr)
+        assert sel['Reaction'] == pytest.approx(R.max(), rel=1e-9)
+        assert sel['Deflection'] == pytest.approx(D[-1], abs=1e-9)
+    assert checked > 0
+
+
+def test_dominated_candidates_are_pruned(sample_project):
+    E = np.array([2000.0, 1900.0, 4000.0, 4000.0])
+    R = np.array([900.0, 950.0, 1500.0, 1400.0])
+    c = np.array([1.0, 2.0, 3.0, 3.0])
+    # 1 is beaten by 0 everywhere, 2 by 3 on reaction at the same cost
+    np.testing.assert_array_equal(fs.pareto(E, R, c), [True, False, False, True])
+
+    cands = [candidate(str(i), e, r, k) for i, (e, r, k) in enumerate(zip(E, R, c))]
+    sel = fs.select_fenders(**sample_project, candidates=cands, cost='cost',
+                            groups=['Typical Pneumatic'])['Typical Pneumatic']
+    assert sel['candidates'] == 4
+    assert sel['checked'] == 2
+    assert sel['Name'] == '0'
+
+
+def test_impossible_demand_returns_none(sample_project):
+    small = [candidate('tiny', 10.0, 20.0), candidate('small', 50.0, 40.0)]
+    sel = fs.select_fenders(**sample_project, candidates=small,
+                            groups=['Typical Pneumatic'])
+    assert sel == {'Typical Pneumatic': None}
+
+    # Enough energy but no candidate within the allowed reaction
+    big = [candidate('big', 5000.0, 2000.0)]
+    sel = fs.select_fenders(**sample_project, candidates=big, R_allow=1.0,
+                            groups=['Typical Pneumatic'])
+    assert sel == {'Typical Pneumatic': None}
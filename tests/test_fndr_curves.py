@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from vesselberthing.functions import fndr_curves as fc
+
+
+def root_solve(E_n, fndr):
+    # Deflection from the roots of the energy polynomial, as fender_reaction
+    # solved it before the inverse tables
+    D = None
+    for r in (fc.Fenders[fndr][0] - E_n).roots():
+        if abs(r.imag) < 1e-9 and 0 <= r.real <= fc.D_limit:
+            D = r.real
+    return D
+
+
+@pytest.mark.parametrize('fndr', ['pneumatic', 'hydropneumatic', 'MV'])
+def test_inverse_matches_root_solve(fndr):
+    E_max = fc.curve_inverse(fndr)[1][-1]
+    for E_n in np.linspace(0.01, 0.99, 50) * E_max:
+        D_root = root_solve(E_n, fndr)
+        D, R = fc.fender_reaction(E_n * 1000.0, 1000.0, 500.0, fndr)
+        assert D == pytest.approx(D_root, abs=1e-12)
+        assert R == pytest.approx(fc.Fenders[fndr][1](D_root) * 500.0, rel=1e-10)
+
+
+@pytest.mark.parametrize('fndr', ['pneumatic', 'hydropneumatic', 'MV', 'unit fender'])
+def test_scalar_matches_array(fndr):
+    E_n = np.linspace(0, 0.99, 200) * fc.curve_inverse(fndr)[1][-1]
+    D_arr, R_arr = fc.fender_reaction_arr(E_n * 800.0, 800.0, 300.0, fndr)
+    for x, D, R in zip(E_n * 800.0, D_arr, R_arr):
+        D_s, R_s = fc.fender_reaction(float(x), 800.0, 300.0, fndr)
+        assert D_s == pytest.approx(D, abs=1e-13)
+        assert R_s == pytest.approx(R, rel=1e-12, abs=1e-12)
+
+
+def test_demand_above_curve_raises():
+    with pytest.raises(ValueError, match='exceeds the pneumatic fender curve'):
+        fc.fender_reaction(20000.0, 1339.0, 678.0, 'pneumatic')
+    with pytest.raises(ValueError, match='Negative'):
+        fc.fender_reaction(-1.0, 1339.0, 678.0, 'pneumatic')
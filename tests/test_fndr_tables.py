@@ -0,0 +1,57 @@
+import json
+
+import numpy as np
+import pytest
+
+from vesselberthing import catalog as ct
+from vesselberthing.functions import fndr_curves as fc
+from vesselberthing.functions import fndr_tables as ft
+
+# Cell fender table with a buckling (falling then rising) reaction
+POINTS = {'Deflection': [0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6],
+          'Energy': [0.0, 0.04, 0.15, 0.33, 0.52, 0.74, 1.0],
+          'Reaction': [0.0, 0.55, 0.9, 1.0, 0.93, 0.95, 1.2]}
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    with open(ct.fender_file) as f:
+        fenders = json.load(f)
+    fenders[ct.curve_key] = {'test cell': POINTS}
+    path = tmp_path / 'fenders.json'
+    path.write_text(json.dumps(fenders))
+    return ct.Catalog(ct.vessel_file, str(path))
+
+
+def assert_monotone_between_points(curve, x, y):
+    for i in range(len(x) - 1):
+        d = np.linspace(x[i], x[i + 1], 201)
+        v = curve(d)
+        step = np.diff(v) * np.sign(y[i + 1] - y[i])
+        assert np.all(step >= -1e-12), i
+        assert v.min() >= min(y[i], y[i + 1]) - 1e-12
+        assert v.max() <= max(y[i], y[i + 1]) + 1e-12
+
+
+def test_catalog_curve_passes_through_points(catalog, tmp_path):
+    compiled = ct.Catalog.from_compiled(catalog.compile(str(tmp_path / 'catalog')))
+    for cat in (catalog, compiled):
+        assert cat.curves == {'test cell': POINTS}
+        E, R = ft.curve_pair(cat.curves['test cell'])
+        x = POINTS['Deflection']
+        np.testing.assert_allclose(E(x), POINTS['Energy'], rtol=0, atol=1e-15)
+        np.testing.assert_allclose(R(x), POINTS['Reaction'], rtol=0, atol=1e-15)
+        assert_monotone_between_points(E, x, POINTS['Energy'])
+        assert_monotone_between_points(R, x, POINTS['Reaction'])
+
+
+def test_registered_curve_inverts_the_table(catalog, monkeypatch):
+    monkeypatch.setitem(fc.Fenders, 'test cell', None)
+    fc.load_curves(catalog.curves)
+    E, R = fc.Fenders['test cell']
+    assert isinstance(E, ft.TabularCurve)
+
+    # The rated scaling is applied to the tabulated points
+    assert (E * 2000.0)(0.3) == pytest.approx(0.33 * 2000.0, rel=1e-15)
+    D = fc.fender_deflection(POINTS['Energy'][1:], 'test cell')
+    np.testing.assert_allclose(D, POINTS['Deflection'][1:], rtol=0, atol=1e-12)
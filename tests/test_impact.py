@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from vesselberthing import berthing_energy as mb
+from vesselberthing import impact as im
+
+
+@pytest.fixture(scope='module')
+def sample_results(sample_project):
+    return mb.berthing_energy(**sample_project, output=None, batch=True)
+
+
+def test_undamped_peak_matches_static_deflection(sample_results):
+    dynamic = im.impact_results(sample_results, steps=400)
+    assert list(dynamic) == list(sample_results)
+    for name, table in dynamic.items():
+        np.testing.assert_allclose(table['Dyn Deflection'], table['Deflection'],
+                                   rtol=0, atol=2e-6, err_msg=name)
+        # The peak along the loading path is at least the static reaction
+        assert np.all(table['Dyn Reaction'] >= table['Reaction'] * (1 - 1e-5)), name
+        assert np.all(table['Time to Peak'] > 0), name
+        assert np.all(table['Contact Duration'] > table['Time to Peak']), name
+
+
+def test_damping_lowers_the_peak_deflection(sample_results):
+    table = sample_results['Typical Pneumatic']
+    row = table.data[np.argmax(table['Energy'])]
+    E_r, R_r, D_r = row['Rated Energy'], row['Rated Reaction'], row['Rated Deflection']
+    H = im.fender_height('pneumatic', E_r, R_r, D_r)
+    mass = 2 * row['Energy'] / row['Vel']**2
+
+    zeta = np.array([0.0, 0.05, 0.1, 0.2, 0.4])
+    res = im.simulate_impact('pneumatic', mass, row['Vel'], E_r, R_r, H, zeta)
+    peak = res['Peak Deflection']
+    assert peak[0] == pytest.approx(row['Deflection'], abs=1e-5)
+    assert np.all(np.diff(peak) < 0)
@@ -0,0 +1,42 @@
+import pytest
+
+from vesselberthing import berthing_energy as mb
+from vesselberthing import instrument as ins
+
+
+@pytest.mark.parametrize('batch', [False, True])
+def test_profile_records_stages_and_counts(sample_project, batch):
+    calls = []
+    with ins.profile(hook=lambda *a: calls.append(a)) as rep:
+        results = mb.berthing_energy(**sample_project, output=None, batch=batch)
+    n = sum(len(t) for t in results.values())
+
+    assert rep['counters']['cases'] == n == 126
+    assert rep['counters']['deflection solves'] == n
+    assert rep['stages']['berthing_energy']['calls'] == 1
+    if batch:
+        for name in ('case grid', 'coefficients', 'fender solve'):
+            assert rep['stages'][name]['calls'] == 1
+    for name, rec in rep['stages'].items():
+        assert 0 <= rec['seconds'] <= rep['stages']['berthing_energy']['seconds'], name
+    assert ('count', 'cases', n) in calls
+    assert not ins.enabled
+    assert not ins._hooks
+
+
+def test_nothing_recorded_when_disabled(sample_project):
+    calls = []
+
+    def hook(*a):
+        calls.append(a)
+
+    ins.reset()
+    ins.add_hook(hook)
+    try:
+        mb.berthing_energy(**sample_project, output=None, batch=True)
+        mb.berthing_energy(**sample_project, output=None)
+    finally:
+        ins.remove_hook(hook)
+    assert not ins.enabled
+    assert ins.report() == {'stages': {}, 'counters': {}}
+    assert calls == []
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from vesselberthing import histogram as hg
+from vesselberthing import montecarlo as mc
+
+
+def run(project, **kw):
+    kw = dict(dict(n_samples=200, chunk_size=5000, n_bins=200, workers=1), **kw)
+    return mc.berthing_montecarlo(*project.values(), **kw)
+
+
+def curves(res):
+    return {f: {m: (r[m]['exceedance'], r[m]['percentiles'], r[m]['max'])
+                for m in mc.metrics} for f, r in res.items()}
+
+
+def assert_same(a, b):
+    assert list(a) == list(b)
+    for f in a:
+        for m in mc.metrics:
+            np.testing.assert_array_equal(a[f][m][0], b[f][m][0])
+            assert a[f][m][1] == b[f][m][1]
+            assert a[f][m][2] == b[f][m][2]
+
+
+def test_same_seed_is_reproducible(sample_project):
+    assert_same(curves(run(sample_project, seed=7)), curves(run(sample_project, seed=7)))
+
+
+def test_workers_do_not_change_results(sample_project):
+    # Each chunk has its own seed, so the pool gives the serial result
+    serial = run(sample_project, seed=11)
+    pooled = run(sample_project, seed=11, workers=2)
+    assert_same(curves(serial), curves(pooled))
+
+
+def test_different_seeds_differ(sample_project):
+    a = run(sample_project, seed=1)
+    b = run(sample_project, seed=2)
+    assert any(a[f]['Energy']['max'] != b[f]['Energy']['max'] for f in a)
+
+
+def test_sample_counts(sample_project):
+    res = run(sample_project, seed=3)
+    for f, r in res.items():
+        assert r['samples'] % 200 == 0
+        assert r['Energy']['exceedance'][0] == 1.0
+        assert np.all(np.diff(r['Energy']['exceedance']) <= 0)
+
+
+def test_invalid_samples_are_reported(sample_project):
+    # Water levels sampled below the mudline give no energy; they are
+    # counted instead of failing the run
+    res = run(sample_project, seed=5, dists={'water_level': ('uniform', -60.0, 0.0)})
+    assert any(r['invalid'] > 0 for r in res.values())
+    for r in res.values():
+        assert (r['samples'] + r['invalid']) % 200 == 0
+        assert np.isfinite(r['Energy']['max'])
+
+
+def test_bin_rejects_unbinnable_samples():
+    edges = np.linspace(0, 1, 11)
+    counts = hg.bin_counts(np.array([0.0, 0.5, 2.0]), edges)
+    assert counts.sum() == 3 and counts[-1] == 1
+    with pytest.raises(ValueError, match='NaN or below'):
+        hg.bin_counts(np.array([0.5, np.nan]), edges)
+    with pytest.raises(ValueError, match='NaN or below'):
+        hg.bin_counts(np.array([-0.1]), edges)
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from vesselberthing import mooring as mr
+
+LIBRARY = {'V': {'Length Overall': 500.0, 'Breadth': 60.0, 'Draft': 20.0,
+                 'Displacement': 10000.0, 'Lateral Windage': 20000.0,
+                 'Frontal Windage': 3000.0}}
+
+
+def test_beam_loads_match_hand_calculation():
+    # Keel at the mudline (water depth = draft), so the transverse current
+    # coefficient is C_1 = 3.2
+    res = mr.mooring_loads({'V': [2, False, ['B']]}, {'B': [0.0]}, [20.0],
+                           wind_speeds=[50.0], current_speeds=[2.0],
+                           headings=[90.0], vessel_library=LIBRARY)
+    at = dict(vessel='V', berth='B', heading=90.0, wind=50.0, current=2.0,
+              water_level=20.0)
+
+    # q = 0.5 x 0.00237 x (50 x 1.68781)² = 8.439 psf
+    # Fy = q x 20000 ft² x 0.92 = 155.28 kip
+    assert res.sel('Fy Wind', **at) == pytest.approx(155.2828, rel=1e-6)
+    # Fy = 0.5 x 1.99 x (2 x 1.68781)² x 500 x 20 x 3.2 = 362.81 kip
+    assert res.sel('Fy Current', **at) == pytest.approx(362.8108, rel=1e-6)
+    assert res.sel('Fy', **at) == pytest.approx(155.2828 + 362.8108, rel=1e-6)
+    assert res.sel('Mxy', **at) == pytest.approx(0.0, abs=1e-9)
+    assert res.sel('Fx', **at) == pytest.approx(0.0, abs=1e-9)
+
+
+@pytest.fixture(scope='module')
+def sample_loads(sample_project):
+    return mr.mooring_loads(sample_project['vessels'], sample_project['berths'],
+                            sample_project['loadcases'], wind_speeds=[35.0, 64.0],
+                            current_speeds=[0.5, 2.0])
+
+
+def test_mirrored_headings_are_symmetric(sample_loads):
+    axis = sample_loads.dims.index('heading')
+    headings = sample_loads.coords['heading']
+    mirror = [list(headings).index((360.0 - h) % 360.0) for h in headings]
+    for name in mr.outputs:
+        vals = sample_loads[name]
+        flipped = np.take(vals, mirror, axis=axis)
+        sign = 1 if name.startswith('Fx') else -1
+        np.testing.assert_allclose(flipped, sign * vals, rtol=1e-12, atol=1e-9,
+                                   err_msg=name)
+
+
+def test_governing_heading_is_the_largest(sample_loads):
+    axis = sample_loads.dims.index('heading')
+    headings = sample_loads.coords['heading']
+    for name in ('Fy', 'Mxy', 'Fx'):
+        vals = sample_loads[name]
+        gov, heading = mr.governing_heading(sample_loads, name)
+        assert gov.shape == vals.shape[:axis] + vals.shape[axis + 1:]
+
+        missing = np.isnan(gov)
+        assert np.array_equal(missing, np.all(np.isnan(vals), axis=axis))
+        assert np.all(np.isnan(heading[missing]))
+        np.testing.assert_array_equal(np.abs(gov[~missing]),
+                                      np.fmax.reduce(np.abs(vals), axis=axis)[~missing])
+
+        # The value is the output at the reported heading
+        i = np.searchsorted(headings, heading[~missing])
+        at = np.take_along_axis(np.moveaxis(vals, axis, -1)[~missing], i[:, None], 1)
+        np.testing.assert_array_equal(at[:, 0], gov[~missing])
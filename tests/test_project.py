@@ -0,0 +1,62 @@
+import numpy as np
+
+from vesselberthing import berthing_energy as mb
+from vesselberthing.project import BerthingProject
+
+from .conftest import assert_tables_close
+
+
+def rerun(prj):
+    return mb.berthing_energy(prj.vessels, prj.berths, prj.loadcases,
+                              prj.fender_dict, prj.cp_e_dict, None, batch=True)
+
+
+def rows_of(results, vessels):
+    return sum(int(np.isin(t['Vessel'], vessels).sum()) for t in results.values())
+
+
+def assert_same_csv(prj, tmp_path):
+    prj.write_csv(str(tmp_path / 'project.csv'))
+    mb.print_fndr_csv(rerun(prj), str(tmp_path / 'full.csv'))
+    with open(tmp_path / 'project.csv') as a, open(tmp_path / 'full.csv') as b:
+        assert a.read() == b.read()
+
+
+def test_initial_results_match_batch(sample_project, tmp_path):
+    prj = BerthingProject(**sample_project)
+    assert_tables_close(rerun(prj), prj.results(), rtol=0, atol=0)
+    assert prj.evaluated == 126
+    assert_same_csv(prj, tmp_path)
+
+
+def test_berth_edit_recomputes_its_rows(sample_project, tmp_path):
+    prj = BerthingProject(**sample_project)
+    prj.results()
+    berth = list(prj.berths['Surface Berth 2'])
+    berth[0] = 63.5
+    prj.set_berth('Surface Berth 2', berth)
+    res = prj.results()
+
+    full = rerun(prj)
+    users = [v for v, entry in prj.vessels.items() if 'Surface Berth 2' in entry[2]]
+    edited = rows_of({'Typical Pneumatic': full['Typical Pneumatic']}, users)
+    assert edited > 0
+    assert prj.evaluated == 126 + edited
+    assert_tables_close(full, res, rtol=0, atol=0)
+    assert_same_csv(prj, tmp_path)
+
+
+def test_vessel_edit_recomputes_its_rows(sample_project, tmp_path):
+    prj = BerthingProject(**sample_project)
+    prj.results()
+    prj.set_vessel('DDG-51', [4] + prj.vessels['DDG-51'][1:])
+    res = prj.results()
+
+    full = rerun(prj)
+    assert prj.evaluated == 126 + rows_of(full, ['DDG-51'])
+    assert_tables_close(full, res, rtol=0, atol=0)
+    assert_same_csv(prj, tmp_path)
+
+    # Nothing left to recompute
+    prj.results()
+    assert prj.evaluated == 126 + rows_of(full, ['DDG-51'])
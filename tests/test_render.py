@@ -0,0 +1,72 @@
+import os
+import re
+
+import pytest
+
+from vesselberthing import berthing_energy as mb
+from vesselberthing import results as rs
+
+pytest.importorskip('matplotlib')
+
+
+@pytest.fixture(scope='module')
+def sample_results(sample_project):
+    return mb.berthing_energy(**sample_project, output=None, batch=True)
+
+
+def plot(project, results, outdir, **kw):
+    return mb.plot_fndr_results(project['vessels'], project['fender_dict'], results,
+                                outdir=str(outdir), dpi=20, **kw)
+
+
+def test_unchanged_charts_are_skipped(sample_project, sample_results, tmp_path):
+    first = plot(sample_project, sample_results, tmp_path, skip_unchanged=True)
+    n = 2 * len(sample_project['fender_dict']) + 1
+    assert len(first['written']) == n and not first['skipped']
+    assert all(os.path.exists(p) for p in first['written'])
+
+    second = plot(sample_project, sample_results, tmp_path, skip_unchanged=True)
+    assert not second['written']
+    assert sorted(second['skipped']) == sorted(first['written'])
+
+
+def test_changed_fender_redraws_its_chart(sample_project, sample_results, tmp_path):
+    plot(sample_project, sample_results, tmp_path, skip_unchanged=True)
+
+    # New demands on one fender redraw its demand chart only
+    fender = next(iter(sample_results))
+    table = sample_results[fender]
+    changed = dict(sample_results)
+    changed[fender] = rs.ResultTable(table.data.copy())
+    changed[fender].data['Energy'] *= 1.1
+    res = plot(sample_project, changed, tmp_path, skip_unchanged=True)
+    assert [os.path.basename(p) for p in res['written']] == [
+        fender + ' Fender Demand Curves.png']
+
+    # A new rating redraws both charts of that fender
+    fender_dict = dict(sample_project['fender_dict'])
+    fender_dict[fender] = [fender_dict[fender][0], fender_dict[fender][1] * 1.2] \
+        + fender_dict[fender][2:]
+    project = dict(sample_project, fender_dict=fender_dict)
+    res = plot(project, changed, tmp_path, skip_unchanged=True)
+    assert sorted(os.path.basename(p) for p in res['written']) == [
+        fender + ' Fender Curves.png', fender + ' Fender Demand Curves.png']
+
+
+def test_pdf_collects_every_chart(sample_project, sample_results, tmp_path):
+    res = plot(sample_project, sample_results, tmp_path, fmt='pdf', skip_unchanged=True)
+    [path] = res['written']
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data.startswith(b'%PDF')
+    pages = len(re.findall(rb'/Type /Page\b(?!s)', data))
+    assert pages == 2 * len(sample_project['fender_dict']) + 1
+    again = plot(sample_project, sample_results, tmp_path, fmt='pdf', skip_unchanged=True)
+    assert again == {'written': [], 'skipped': [path]}
+
+
+def test_workers_write_the_same_charts(sample_project, sample_results, tmp_path):
+    serial = plot(sample_project, sample_results, tmp_path / 'serial')
+    pooled = plot(sample_project, sample_results, tmp_path / 'pooled', workers=2)
+    assert sorted(map(os.path.basename, serial['written'])) \
+        == sorted(map(os.path.basename, pooled['written']))
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from vesselberthing import catalog as ct
+from vesselberthing import sensitivity as sn
+
+
+def perturbed(library, name, step):
+    # Vessel library with one field of every vessel moved by step x value
+    return {v: dict(entry, **{name: entry[name] * (1 + step)})
+            for v, entry in library.items()}
+
+
+@pytest.mark.parametrize('name', ['Displacement', 'Draft', 'CoG'])
+def test_derivatives_match_central_differences(sample_project, name):
+    library = ct.default_catalog().vessels
+    base = sn.berthing_sensitivity(**sample_project, vessel_library=library)
+    h = 1e-5
+    up = sn.berthing_sensitivity(**sample_project,
+                                 vessel_library=perturbed(library, name, h))
+    down = sn.berthing_sensitivity(**sample_project,
+                                   vessel_library=perturbed(library, name, -h))
+
+    checked = 0
+    for fender, table in base.items():
+        step = 2 * h * table[name]
+        for output in sn.outputs:
+            fd = (up[fender][output] - down[fender][output]) / step
+            exact = table['d' + output + '/d' + name]
+            # Zero derivatives (e.g. CoG of broadside cases) are checked
+            # against the output scale
+            atol = 1e-9 * np.abs(table[output]).max() / np.abs(table[name]).min()
+            np.testing.assert_allclose(exact, fd, rtol=1e-5, atol=atol,
+                                       err_msg=fender + ': d' + output + '/d' + name)
+            checked += int(np.count_nonzero(exact))
+    assert checked > 0
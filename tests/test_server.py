@@ -0,0 +1,94 @@
+import asyncio
+import json
+import os
+import socket
+
+import pytest
+
+from vesselberthing import server as sv
+
+
+def socket_path(tmp_path):
+    # Unix socket paths are limited to about 100 characters
+    path = str(tmp_path / 'vb.sock')
+    if len(path) > 100:
+        pytest.skip('temporary path too long for a Unix socket')
+    return path
+
+
+async def exchange(path, raw):
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write(raw)
+    await writer.drain()
+    reply = await reader.read()
+    writer.close()
+    head, _, body = reply.partition(b'\r\n\r\n')
+    return head.split(b'\r\n')[0].decode(), body
+
+
+async def serve_and(path, requests):
+    server = sv.BerthingServer()
+    ready = asyncio.Event()
+    task = asyncio.create_task(server.serve(path=path, ready=ready))
+    await asyncio.wait_for(ready.wait(), 5)
+    try:
+        return [await exchange(path, raw) for raw in requests]
+    finally:
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+
+@pytest.mark.parametrize('raw', [
+    b'garbage\r\n\r\n',
+    b'GET /health\r\n\r\n',
+    b'GET /health HTTP/1.1\r\nno colon here\r\n\r\n',
+    b'POST /berthing HTTP/1.1\r\nContent-Length: ten\r\n\r\n',
+])
+def test_malformed_request_gets_400(tmp_path, raw):
+    path = socket_path(tmp_path)
+    [(status, body)] = asyncio.run(serve_and(path, [raw]))
+    assert status == 'HTTP/1.1 400 Bad Request'
+    assert 'error' in json.loads(body)
+
+
+def test_health_and_socket_removed(tmp_path):
+    path = socket_path(tmp_path)
+    [(status, body)] = asyncio.run(serve_and(
+        path, [b'GET /health HTTP/1.1\r\nConnection: close\r\n\r\n']))
+    assert status == 'HTTP/1.1 200 OK'
+    assert json.loads(body) == {'status': 'ok'}
+    assert not os.path.exists(path)
+
+
+def test_existing_file_is_not_removed(tmp_path):
+    path = socket_path(tmp_path)
+    with open(path, 'w') as f:
+        f.write('keep me')
+    with pytest.raises(FileExistsError):
+        asyncio.run(sv.BerthingServer().serve(path=path))
+    with open(path) as f:
+        assert f.read() == 'keep me'
+
+
+def test_stale_socket_is_replaced(tmp_path):
+    path = socket_path(tmp_path)
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    [(status, _)] = asyncio.run(serve_and(
+        path, [b'GET /health HTTP/1.1\r\nConnection: close\r\n\r\n']))
+    assert status == 'HTTP/1.1 200 OK'
+
+
+def test_live_socket_is_refused(tmp_path):
+    path = socket_path(tmp_path)
+    live = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    live.bind(path)
+    live.listen()
+    try:
+        with pytest.raises(OSError, match='already listening'):
+            asyncio.run(sv.BerthingServer().serve(path=path))
+        assert os.path.exists(path)
+    finally:
+        live.close()
@@ -0,0 +1,60 @@
+import numpy as np
+
+from vesselberthing import berthing_energy as mb
+from vesselberthing import sweep as sw
+
+# Load cases sharing ABF 1.0, Cg 0.95 and water level 99.49; every berth
+# of the sample project has Cc 1.0
+CASES = ('Op_LAT_FQp', 'Op_LAT_RQp')
+AXES = {'water_level': [99.49, 101.0], 'Cc': [1.0, 0.9], 'Cg': [0.95, 1.0],
+        'ABF': [1.0, 1.5]}
+
+
+def project(sample_project):
+    loadcases = {k: sample_project['loadcases'][k] for k in CASES}
+    return dict(sample_project, loadcases=loadcases)
+
+
+def assert_cube_matches(res, point, proj, results):
+    # Compare the cube at one sweep point with berthing_energy results
+    found = 0
+    for v, (_, _, berth_list) in proj['vessels'].items():
+        for b in berth_list:
+            fender = proj['berths'][b][1]
+            table = results[fender]
+            for k in proj['loadcases']:
+                rows = table[(table['Vessel'] == v) & (table['Load Case'] == k)]
+                at = dict(point, vessel=v, berth=b, loadcase=k)
+                if len(rows) == 0:
+                    assert np.isnan(res.sel('Energy', **at))
+                    continue
+                found += 1
+                for name, field in (('Energy', 'Energy'), ('Deflection', 'Deflection'),
+                                    ('Reaction', 'Reaction'), ('Cm', 'Cm'), ('Cb', 'Cb')):
+                    np.testing.assert_allclose(res.sel(name, **at), rows[field][0],
+                                               rtol=1e-9, err_msg=name)
+    assert found == sum(len(t) for t in results.values())
+
+
+def test_nominal_point_matches_batch(sample_project):
+    proj = project(sample_project)
+    res = sw.berthing_sweep(**proj, **AXES)
+    assert res.dims == ('vessel', 'berth', 'loadcase') + tuple(AXES)
+    assert res.shape == (len(proj['vessels']), len(proj['berths']), len(CASES), 2, 2, 2, 2)
+    batch = mb.berthing_energy(**proj, output=None, batch=True)
+    point = {name: vals[0] for name, vals in AXES.items()}
+    assert_cube_matches(res, point, proj, batch)
+
+
+def test_swept_point_matches_loop(sample_project):
+    proj = project(sample_project)
+    res = sw.berthing_sweep(**proj, **AXES)
+    point = {name: vals[1] for name, vals in AXES.items()}
+
+    # The same inputs given directly to the per-case loop
+    loadcases = {k: [lc[0], point['ABF'], point['Cg'], point['water_level']]
+                 for k, lc in proj['loadcases'].items()}
+    berths = {b: v[:3] + [point['Cc']] for b, v in proj['berths'].items()}
+    edited = dict(proj, loadcases=loadcases, berths=berths)
+    loop = mb.berthing_energy(**edited, output=None)
+    assert_cube_matches(res, point, edited, loop)
@@ -0,0 +1,92 @@
+import csv
+import os
+
+import numpy as np
+import pytest
+
+from vesselberthing import cli
+from vesselberthing import velocity_logs as vl
+from vesselberthing.functions import berthvel as bv
+
+A, B, SIGMA = 3.5, -0.27, 0.1
+
+
+def write_log(path, n=6000, seed=0):
+    # Synthetic berthing log: vel = A * disp**B with lognormal scatter,
+    # plus a few unusable rows
+    rng = np.random.default_rng(seed)
+    disp = np.exp(rng.uniform(np.log(500.0), np.log(100000.0), n))
+    vel = A * disp**B * np.exp(rng.normal(0.0, SIGMA, n))
+    with open(path, 'w', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(['Displacement', 'Velocity', 'Condition'])
+        for d, v in zip(disp, vel):
+            w.writerow([repr(float(d)), repr(float(v)), 'Sheltered'])
+        w.writerow(['', '0.3', 'sheltered'])
+        w.writerow(['1000', '-1', 'sheltered'])
+    return str(path)
+
+
+def test_fit_recovers_power_law(tmp_path):
+    cal = vl.calibrate_velocity(write_log(tmp_path / 'log.csv'))
+    f = cal.fit('sheltered')
+    assert f['n'] == 6000 and cal.skipped == 2
+    assert f['a'] == pytest.approx(A, rel=0.05)
+    assert f['b'] == pytest.approx(B, abs=0.005)
+    assert f['sigma'] == pytest.approx(SIGMA, rel=0.05)
+
+
+def test_chunked_merge_equals_single_pass(tmp_path):
+    paths = [write_log(tmp_path / 'a.csv', seed=1), write_log(tmp_path / 'b.csv', seed=2)]
+    whole = vl.calibrate_velocity(paths, chunk_rows=10**6)
+    chunked = vl.calibrate_velocity(paths, chunk_rows=700)
+    assert whole.skipped == chunked.skipped == 4
+    np.testing.assert_allclose(chunked.moments['sheltered'], whole.moments['sheltered'],
+                               rtol=1e-9, atol=1e-9)
+    np.testing.assert_array_equal(chunked.counts['sheltered'], whole.counts['sheltered'])
+
+    # Calibrating the files separately and merging gives the same again
+    merged = vl.calibrate_velocity(paths[0]).merge(vl.calibrate_velocity(paths[1]))
+    np.testing.assert_allclose(merged.moments['sheltered'], whole.moments['sheltered'],
+                               rtol=1e-9, atol=1e-9)
+    np.testing.assert_array_equal(merged.counts['sheltered'], whole.counts['sheltered'])
+
+
+def test_curves_do_not_change_vel_coeff(tmp_path):
+    cal = vl.calibrate_velocity(write_log(tmp_path / 'log.csv'))
+    before = dict(bv.vel_coeff)
+    curves = cal.curves(quantile=0.5)
+    assert list(curves) == ['site sheltered']
+    assert bv.vel_coeff == before
+    a, b = curves['site sheltered']
+    assert (a, b) == pytest.approx((cal.fit('sheltered')['a'], cal.fit('sheltered')['b']))
+
+
+def test_project_velocity_table(tmp_path):
+    # A project's [velocity] curves are used for its run and not kept
+    here = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(here, '11173-03 Project.toml')) as f:
+        text = f.read()
+    text = text.replace('"sheltered"', '"site sheltered"')
+    text += '\n[velocity]\n"site sheltered" = [4.1172, -0.289]\n'
+    path = tmp_path / 'site.toml'
+    path.write_text(text)
+
+    before = dict(bv.vel_coeff)
+    site = cli.run_project(str(path), str(tmp_path / 'out'), charts=False)
+    assert site['ok'], site['error']
+    assert bv.vel_coeff == before
+
+    # The same curve as 'sheltered' gives the sample project's CSV
+    sample = cli.run_project(os.path.join(here, '11173-03 Project.toml'),
+                             str(tmp_path / 'ref'), charts=False)
+    with open(site['files'][0]) as a, open(sample['files'][0]) as b:
+        assert a.read().replace('site sheltered', 'sheltered') == b.read()
+
+
+def test_project_velocity_must_be_pairs(tmp_path):
+    path = tmp_path / 'bad.json'
+    path.write_text('{"vessels": {}, "berths": {}, "loadcases": {}, "fenders": {},'
+                    ' "cp_e": {}, "velocity": {"site": [1.0]}}')
+    with pytest.raises(ValueError, match='must be'):
+        cli.load_project(str(path))
@@ -0,0 +1,97 @@
+import csv
+
+import numpy as np
+import pytest
+
+from vesselberthing import berthing_energy as mb
+from vesselberthing import results as rs
+from vesselberthing.cache import ResultCache
+
+
+def read_csv(path):
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))
+    return rows[0], rows[1:]
+
+
+def test_csv_round_trip(sample_project, tmp_path):
+    results = mb.berthing_energy(**sample_project, output=None, batch=True)
+    out = tmp_path / 'results.csv'
+    mb.print_fndr_csv(results, str(out))
+
+    header, rows = read_csv(out)
+    assert header == [name for name, _ in rs.fields]
+    table = rs.concat(results.values())
+    assert len(rows) == len(table)
+
+    # Text and given values are written as is; floats are written exactly
+    # (repr)
+    columns = list(zip(*rows))
+    for i, (name, typ) in enumerate(rs.fields):
+        col = table[name]
+        if typ is object:
+            assert list(columns[i]) == [str(v) for v in col.tolist()], name
+        else:
+            np.testing.assert_array_equal(np.array(columns[i], dtype=float), col,
+                                          err_msg=name)
+
+
+def test_csv_of_chunks_matches_whole(sample_project, tmp_path):
+    whole = mb.berthing_energy(**sample_project, output=None, batch=True)
+    chunks = mb.iter_berthing_energy(**sample_project, chunk_size=10)
+    mb.print_fndr_csv(whole, str(tmp_path / 'whole.csv'))
+    mb.print_fndr_csv(chunks, str(tmp_path / 'chunks.csv'))
+    a = sorted(read_csv(tmp_path / 'whole.csv')[1])
+    b = sorted(read_csv(tmp_path / 'chunks.csv')[1])
+    assert len(a) == len(b)
+    for ra, rb in zip(a, b):
+        for (name, typ), x, y in zip(rs.fields, ra, rb):
+            if typ is object:
+                assert x == y, name
+            else:
+                assert np.isclose(float(x), float(y), rtol=1e-12), name
+
+
+def test_empty_results_write_header(tmp_path):
+    out = tmp_path / 'empty.csv'
+    mb.print_fndr_csv({}, str(out))
+    header, rows = read_csv(out)
+    assert header == [name for name, _ in rs.fields]
+    assert rows == []
+
+
+def eccentricity_column(project, tmp_path, **kw):
+    results = mb.berthing_energy(**project, output=None, **kw)
+    out = tmp_path / 'results.csv'
+    mb.print_fndr_csv(results, str(out))
+    header, rows = read_csv(out)
+    a = header.index('Eccentricity')
+    config = header.index('Berthing Configuration')
+    vessel = header.index('Vessel')
+    return [(row[config], row[vessel], row[a]) for row in rows]
+
+
+@pytest.mark.parametrize('options', [{}, {'batch': True}])
+def test_csv_keeps_given_eccentricity_type(sample_project, tmp_path, options):
+    # Eccentricities are written in the form they were given: the broadside
+    # 0 as an integer, cp_e values as int or float as in the project, and
+    # quarter point values as computed floats
+    cp_e = {v: float(e) for v, e in sample_project['cp_e_dict'].items()}
+    first = next(iter(cp_e))
+    cp_e[first] = 58
+    project = dict(sample_project, cp_e_dict=cp_e)
+    for config, vessel, a in eccentricity_column(project, tmp_path, **options):
+        if config == 'Broadside':
+            assert a == '0'
+        elif config == 'Corner Protection':
+            assert a == ('58' if vessel == first else repr(cp_e[vessel]))
+        else:
+            assert '.' in a
+
+
+def test_csv_of_cached_results_keeps_eccentricity(sample_project, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    batch = eccentricity_column(sample_project, tmp_path, batch=True)
+    eccentricity_column(sample_project, tmp_path, cache=cache)
+    assert eccentricity_column(sample_project, tmp_path, cache=cache) == batch
+    assert cache.hits > 0